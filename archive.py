@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+import sys
+import json
+import argparse
+from tasklib.backends import TaskWarriorException
+from taskwarrior_recurrence.backend import CachedTaskWarrior
+from taskwarrior_recurrence.index import open_index
+from taskwarrior_recurrence.archive import \
+    Archiver, load_summaries, DEFAULT_AGE
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Move the old completed and deleted children out of the '
+        'data files',
+    )
+    parser.add_argument('taskrc')
+    parser.add_argument('data')
+    parser.add_argument(
+        '--age',
+        default=DEFAULT_AGE,
+        help='Taskwarrior duration since the children were closed',
+    )
+    parser.add_argument(
+        '--summary',
+        action='store_true',
+        help="Print the summary of the archived children, don't archive",
+    )
+    args = parser.parse_args()
+
+    if args.summary:
+        json.dump(load_summaries(args.data), sys.stdout, indent=2)
+        print()
+        return
+
+    tw = CachedTaskWarrior(
+        taskrc_location=args.taskrc,
+        data_location=args.data,
+    )
+    try:
+        archived = Archiver(
+            tw,
+            args.data,
+            age=args.age,
+            index=open_index(args.data),
+        ).run()
+    except TaskWarriorException as error:
+        sys.exit(str(error))
+
+    for parent_uuid, count in sorted(archived.items()):
+        print('Archived {} children of {}'.format(count, parent_uuid))
+    print('Archived {} children of {} parents'.format(
+        sum(archived.values()),
+        len(archived),
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+'''Measures the time the on-exit hook adds to the taskwarrior commands that
+don't need recurrence work.
+
+Usage: python3 benchmarks/on_exit_overhead.py [runs]'''
+
+import os
+import sys
+import time
+import subprocess
+
+HOOK = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'taskwarrior_recurrence',
+    'on_exit.py',
+)
+
+SCENARIOS = [
+    ('python startup', [sys.executable, '-c', 'pass'], ''),
+    ('task list', None, ''),
+    ('task done, empty payload', None, ''),
+    (
+        'task done, non recurrent task',
+        None,
+        '{"uuid":"3f0a43d0-a713-4ebe-9e5c-b1facf49f078","status":"completed"}'
+        '\n',
+    ),
+]
+
+
+def hook_command(name):
+    command = name.split(',')[0].split(' ')[1]
+    return [
+        sys.executable,
+        HOOK,
+        'api:2',
+        'args:',
+        'command:{}'.format(command),
+        'rc:/dev/null',
+        'data:/dev/null',
+        'version:2.5.1',
+    ]
+
+
+def measure(command, payload, runs):
+    timings = []
+    for run in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, input=payload, universal_newlines=True)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.9)]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    for name, command, payload in SCENARIOS:
+        if command is None:
+            command = hook_command(name)
+        median, p90 = measure(command, payload, runs)
+        print('{:<32} median {:7.2f} ms  p90 {:7.2f} ms'.format(
+            name,
+            median * 1000,
+            p90 * 1000,
+        ))
+
+
+if __name__ == "__main__":
+    main()
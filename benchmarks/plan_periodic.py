@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+'''Measures separately the time spent planning and applying the children of
+a periodic task that has been overdue for a number of days, with each of the
+executors that change the data.
+
+It needs the `task` command. Usage: python3 benchmarks/plan_periodic.py
+[overdue days]'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import tasklib
+import datetime
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from taskwarrior_recurrence.main import ProcessRecurrentTask  # noqa: E402
+from taskwarrior_recurrence.plan import \
+    ImportExecutor, TaskExecutor  # noqa: E402
+
+PARENT_UUID = '012339c8-a8fe-41da-82db-a990f989237e'
+CHILD_UUID = '3f0a43d0-a713-4ebe-9e5c-b1facf49f078'
+
+
+def create_series(data_location, overdue_days):
+    '''Creates a daily periodic parent with a completed child due
+    overdue_days ago and returns the child'''
+
+    shutil.copyfile(
+        os.path.join(ROOT, 'tests', 'files', 'taskrc'),
+        os.path.join(data_location, 'taskrc'),
+    )
+    tw = tasklib.TaskWarrior(
+        taskrc_location=os.path.join(data_location, 'taskrc'),
+        data_location=data_location,
+    )
+    due = (
+        datetime.datetime.utcnow() - datetime.timedelta(days=overdue_days)
+    ).strftime('%Y%m%dT%H%M%SZ')
+
+    tasks = [
+        {
+            'uuid': PARENT_UUID,
+            'status': 'recurring',
+            'description': 'Benchmark periodic task',
+            'due': due,
+            'r': '1d',
+            'rtype': 'periodic',
+            'recur': '1d',
+            'rlastinstance': CHILD_UUID,
+        },
+        {
+            'uuid': CHILD_UUID,
+            'status': 'completed',
+            'description': 'Benchmark periodic task',
+            'due': due,
+            'end': due,
+            'r': '1d',
+            'rparent': PARENT_UUID,
+        },
+    ]
+    path = os.path.join(data_location, 'tasks.json')
+    with open(path, 'w') as f:
+        f.write('\n'.join(json.dumps(task) for task in tasks))
+    tw.execute_command(['import', path])
+    return tw.tasks.get(uuid=CHILD_UUID)
+
+
+def measure(executor_class, overdue_days):
+    data_location = tempfile.mkdtemp()
+    try:
+        child_task = create_series(data_location, overdue_days)
+        prt = ProcessRecurrentTask(child_task)
+
+        start = time.perf_counter()
+        plan = prt.plan_next_child()
+        planned = time.perf_counter()
+        executor_class(child_task.backend).execute(plan)
+        executed = time.perf_counter()
+    finally:
+        shutil.rmtree(data_location)
+
+    return len(plan.create), planned - start, executed - planned
+
+
+def main():
+    overdue_days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+
+    for executor_class in [TaskExecutor, ImportExecutor]:
+        children, plan_time, execute_time = measure(
+            executor_class,
+            overdue_days,
+        )
+        print('{:<16} {} children  plan {:8.2f} ms  execute {:8.2f} ms'.format(
+            executor_class.__name__,
+            children,
+            plan_time * 1000,
+            execute_time * 1000,
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+'''Measures the time to find the children of a parent scanning the data
+files of a taskwarrior 2 data location, on a synthetic completed.data with
+a number of completed tasks of other series.
+
+It doesn't need the `task` command. Usage: python3
+benchmarks/scan_children.py [completed tasks]'''
+
+import os
+import sys
+import time
+import uuid
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from taskwarrior_recurrence.datafile import scan_children  # noqa: E402
+
+PARENT_UUID = '012339c8-a8fe-41da-82db-a990f989237e'
+# One child of the measured parent every CHILD_EVERY tasks
+CHILD_EVERY = 1000
+
+
+def write_data_files(data_location, completed):
+    with open(os.path.join(data_location, 'pending.data'), 'w') as f:
+        f.write(
+            '[description:"Benchmark periodic task" r:"1d" rtype:"periodic" '
+            'status:"recurring" uuid:"{}"]\n'.format(PARENT_UUID)
+        )
+
+    with open(os.path.join(data_location, 'completed.data'), 'w') as f:
+        for number in range(completed):
+            if number % CHILD_EVERY == 0:
+                parent_uuid = PARENT_UUID
+            else:
+                parent_uuid = str(uuid.uuid4())
+            f.write(
+                '[description:"Completed task {0} with a long enough '
+                'description" due:"{1}" end:"{1}" entry:"{1}" '
+                'modified:"{1}" project:"benchmark" r:"1d" rparent:"{2}" '
+                'status:"completed" uuid:"{3}"]\n'.format(
+                    number,
+                    2000000000 + number * 86400,
+                    parent_uuid,
+                    uuid.uuid4(),
+                )
+            )
+
+
+def main():
+    completed = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    data_location = tempfile.mkdtemp()
+    try:
+        write_data_files(data_location, completed)
+        size = os.path.getsize(os.path.join(data_location, 'completed.data'))
+
+        start = time.perf_counter()
+        children = scan_children(data_location, PARENT_UUID)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(data_location)
+
+    print('{} children of {} tasks ({:.0f} MB) in {:.2f} ms'.format(
+        len(children),
+        completed,
+        size / 1024 / 1024,
+        elapsed * 1000,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+'''Measures how many completions of a chained and of a periodic recurrent
+task the recurrence logic processes per second against the in memory
+backend, without the cost of the `task` command.
+
+The current time is a FixedClock moved one occurrence forward on each
+completion, so every run replays the same years of recurrence.
+
+Usage: python3 benchmarks/simulated_completions.py [completions]'''
+
+import os
+import sys
+import time
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from taskwarrior_recurrence.main import ProcessRecurrentTask  # noqa: E402
+from taskwarrior_recurrence.clock import FixedClock  # noqa: E402
+from taskwarrior_recurrence.memory import InMemoryTaskWarrior  # noqa: E402
+
+PARENT_UUID = '012339c8-a8fe-41da-82db-a990f989237e'
+
+
+def simulate(rtype, completions):
+    tw = InMemoryTaskWarrior()
+    clock = FixedClock(tw.convert_datetime_string('20370708T000000Z'))
+    parent_task = tw.add_recurrent_task({
+        'uuid': PARENT_UUID,
+        'description': 'Benchmark {} task'.format(rtype),
+        'due': '20370708T010000Z',
+        'r': '1d',
+        'rtype': rtype,
+    }, clock=clock)
+    last_instance = parent_task['rlastinstance']
+
+    start = time.perf_counter()
+    for completion in range(completions):
+        clock.advance(datetime.timedelta(days=1))
+        tw.execute_command([last_instance, 'done'])
+        child_task = tw.tasks.get(uuid=last_instance)
+        prt = ProcessRecurrentTask(child_task, clock=clock)
+        prt.synthetize_next_child()
+        last_instance = prt._get_parent()['rlastinstance']
+    return time.perf_counter() - start
+
+
+def main():
+    completions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    for rtype in ['chained', 'periodic']:
+        elapsed = simulate(rtype, completions)
+        print('{}: {} completions in {:.2f} s, {:.0f} completions/s'.format(
+            rtype,
+            completions,
+            elapsed,
+            completions / elapsed,
+        ))
+
+
+if __name__ == "__main__":
+    main()
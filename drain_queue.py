@@ -0,0 +1,25 @@
+#!/usr/bin/python3
+import sys
+from taskwarrior_recurrence.backend import CachedTaskWarrior
+from taskwarrior_recurrence.index import open_index
+from taskwarrior_recurrence.lock import RecurrenceLock
+import taskwarrior_recurrence.deferred
+
+
+def main():
+
+    tw = CachedTaskWarrior(
+        taskrc_location=sys.argv[1],
+        data_location=sys.argv[2],
+    )
+    queue = taskwarrior_recurrence.deferred.DeferredQueue(sys.argv[2])
+    processed = queue.drain(
+        tw,
+        index=open_index(sys.argv[2]),
+        lock=RecurrenceLock(sys.argv[2]),
+    )
+    print('Processed {} deferred recurrence records'.format(processed))
+
+
+if __name__ == "__main__":
+    main()
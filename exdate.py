@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+import argparse
+from taskwarrior_recurrence.backend import CachedTaskWarrior
+from taskwarrior_recurrence.exdates import \
+    add_exdates, remove_exdates, format_exdates
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Skip occurrences of a periodic task',
+    )
+    parser.add_argument('taskrc')
+    parser.add_argument('data')
+    parser.add_argument('parent', help='Uuid of the periodic parent task')
+    parser.add_argument(
+        '--add',
+        nargs='+',
+        default=[],
+        help='Dates whose occurrence is skipped',
+    )
+    parser.add_argument(
+        '--remove',
+        nargs='+',
+        default=[],
+        help="Dates whose occurrence isn't skipped anymore",
+    )
+    args = parser.parse_args()
+
+    tw = CachedTaskWarrior(
+        taskrc_location=args.taskrc,
+        data_location=args.data,
+    )
+    parent_task = tw.tasks.get(uuid=args.parent)
+    value = parent_task['rexcept']
+
+    if args.add or args.remove:
+        value = add_exdates(
+            value,
+            [tw.convert_datetime_string(date) for date in args.add],
+        )
+        value = remove_exdates(
+            value,
+            [tw.convert_datetime_string(date) for date in args.remove],
+        )
+        # The hooks run so the on-exit hook updates the rspec of the children
+        tw.execute_command([args.parent, 'modify', 'rexcept:{}'.format(value)])
+
+    local_zone = parent_task['due'].tzinfo
+    for date in format_exdates(value, local_zone):
+        print(date.isoformat())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+import sys
+import json
+import argparse
+from taskwarrior_recurrence.fleet import \
+    Fleet, load_manifest, glob_locations, DEFAULT_TIMEOUT
+from taskwarrior_recurrence.repair import DEFAULT_CONCURRENCY
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Repair or check the recurrence of many data locations',
+    )
+    locations = parser.add_mutually_exclusive_group(required=True)
+    locations.add_argument(
+        '--manifest',
+        help='JSON list of objects with the taskrc and data keys',
+    )
+    locations.add_argument(
+        '--glob',
+        help='Pattern of the directories holding a .taskrc and a .task',
+    )
+    parser.add_argument(
+        '--check',
+        action='store_true',
+        help="Only report the broken parents, don't repair them",
+    )
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Check all the parents, not only the recently modified',
+    )
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help='Concurrent task exports of each data location',
+    )
+    args = parser.parse_args()
+
+    if args.manifest is not None:
+        pairs = load_manifest(args.manifest)
+    else:
+        pairs = glob_locations(args.glob)
+
+    summary = Fleet(
+        pairs,
+        workers=args.workers,
+        timeout=args.timeout,
+        check=args.check,
+        concurrency=args.concurrency,
+        full=args.full,
+    ).run()
+
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+    if summary['totals']['error'] or summary['totals']['timeout']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
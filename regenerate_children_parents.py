@@ -1,27 +1,66 @@
 #!/usr/bin/python3
-import sys
-import tasklib
+import argparse
+from taskwarrior_recurrence.backend import CachedTaskWarrior
+from taskwarrior_recurrence.export import export_uuids
+from taskwarrior_recurrence.table import TaskTable
+from taskwarrior_recurrence.watermark import Watermark
 
 
 def main():
 
-    tw = tasklib.TaskWarrior(
-        taskrc_location=sys.argv[1],
-        data_location=sys.argv[2],
+    parser = argparse.ArgumentParser(
+        description='Point the parents to their pending child',
     )
-    children_recurring_tasks = tw.tasks.filter(rparent__not=None)
+    parser.add_argument('taskrc')
+    parser.add_argument('data')
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Check all the children, not only the recently modified',
+    )
+    args = parser.parse_args()
+
+    tw = CachedTaskWarrior(
+        taskrc_location=args.taskrc,
+        data_location=args.data,
+    )
+    watermark = Watermark(args.data, 'children_parents')
+    watermark.start()
+    since = None if args.full else watermark.load()
+
+    if since is None:
+        children_recurring_tasks = TaskTable.from_export(
+            tw,
+            ['rparent.any:'],
+        )
+        parent_tasks = TaskTable.from_export(tw, ['status:recurring'])
+    else:
+        children_recurring_tasks = TaskTable.from_export(
+            tw,
+            ['rparent.any:', 'modified.after:{}'.format(since)],
+        )
+        parent_tasks = TaskTable.from_records(export_uuids(
+            tw,
+            [task['rparent'] for task in children_recurring_tasks],
+            ['status:recurring'],
+        ))
 
     for task in children_recurring_tasks:
         if task['status'] in ['completed', 'deleted', 'recurring']:
             continue
+        parent_row = parent_tasks.find(task['rparent'])
+        if parent_row is None or \
+                parent_row['rlastinstance'] == task['uuid']:
+            continue
         parent_task = tw.tasks.get(uuid=task['rparent'])
-        if parent_task['rlastinstance'] != task['uuid']:
-            print('Regenerating rlastinstance of {} - {}'.format(
-                parent_task['uuid'],
-                parent_task['description'],
-            ))
-            parent_task['rlastinstance'] = task['uuid']
-            parent_task.save()
+        print('Regenerating rlastinstance of {} - {}'.format(
+            parent_task['uuid'],
+            parent_task['description'],
+        ))
+        parent_task['rlastinstance'] = task['uuid']
+        parent_task.save()
+
+    watermark.save()
 
 
 if __name__ == "__main__":
@@ -1,30 +1,70 @@
 #!/usr/bin/python3
-import sys
-import tasklib
-import taskwarrior_recurrence.main
+import argparse
+from taskwarrior_recurrence.backend import CachedTaskWarrior
+from taskwarrior_recurrence.index import open_index
+from taskwarrior_recurrence.lock import RecurrenceLock
+from taskwarrior_recurrence.repair import RepairPipeline, DEFAULT_CONCURRENCY
+from taskwarrior_recurrence.watermark import Watermark
 
 
 def main():
 
-    tw = tasklib.TaskWarrior(
-        taskrc_location=sys.argv[1],
-        data_location=sys.argv[2],
+    parser = argparse.ArgumentParser(
+        description='Create the next child of the parents without one',
     )
-    recurring_tasks = tw.tasks.filter(status='recurring')
-
-    for task in recurring_tasks:
-        try:
-            child_task = tw.tasks.get(uuid=task['rlastinstance'])
-        except Exception:
-            import pdb; pdb.set_trace()  # XXX BREAKPOINT
-        if child_task['status'] == 'deleted' or \
-                child_task['status'] == 'completed':
-            print('Regenerating child of {} - {}'.format(
-                task['uuid'],
-                task['description'],
-            ))
-            prt = taskwarrior_recurrence.main.ProcessRecurrentTask(child_task)
-            task = prt.synthetize_next_child()
+    parser.add_argument('taskrc')
+    parser.add_argument('data')
+    parser.add_argument(
+        'concurrency',
+        type=int,
+        nargs='?',
+        default=DEFAULT_CONCURRENCY,
+    )
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Check all the parents, not only the recently modified',
+    )
+    args = parser.parse_args()
+
+    tw = CachedTaskWarrior(
+        taskrc_location=args.taskrc,
+        data_location=args.data,
+    )
+    watermark = Watermark(args.data, 'parent_children')
+    watermark.start()
+
+    report = RepairPipeline(
+        tw,
+        concurrency=args.concurrency,
+        index=open_index(args.data),
+        lock=RecurrenceLock(args.data),
+        since=None if args.full else watermark.load(),
+    ).run()
+
+    for parent_uuid, child_uuid in report.missing:
+        print('Parent {} has no last instance {}'.format(
+            parent_uuid,
+            child_uuid,
+        ))
+    for parent_uuid, description in report.repaired:
+        print('Regenerating child of {} - {}'.format(
+            parent_uuid,
+            description,
+        ))
+    for parent_uuid, error in report.failed:
+        print('Couldn\'t regenerate the child of {}: {}'.format(
+            parent_uuid,
+            error,
+        ))
+    print('Checked {} parents in {:.2f}s ({:.1f} parents/s)'.format(
+        report.parents,
+        report.elapsed,
+        report.throughput,
+    ))
+
+    if not report.failed:
+        watermark.save()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+#!/usr/bin/python3
+import sys
+from taskwarrior_recurrence.backend import CachedTaskWarrior
+from taskwarrior_recurrence.export import stream_export
+from taskwarrior_recurrence.index import RecurrenceIndex
+
+
+def main():
+
+    tw = CachedTaskWarrior(
+        taskrc_location=sys.argv[1],
+        data_location=sys.argv[2],
+    )
+    index = RecurrenceIndex(sys.argv[2])
+    index.reindex(
+        stream_export(tw, ['(', 'rparent.any:', 'or', 'rtype.any:', ')'])
+    )
+    index.close()
+    print('Indexed the recurrent tasks of {}'.format(sys.argv[2]))
+
+
+if __name__ == "__main__":
+    main()
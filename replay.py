@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+import argparse
+from taskwarrior_recurrence.recording import Replayer, read_trace, summarize
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Replay a trace of hook invocations against a copy of a '
+        'data location',
+    )
+    parser.add_argument('trace')
+    parser.add_argument('snapshot', help='Data location to replay against')
+    parser.add_argument(
+        '--taskrc',
+        help='Taskrc to use instead of the recorded one',
+    )
+    parser.add_argument(
+        '--invocations',
+        action='store_true',
+        help='Print the result of each invocation',
+    )
+    args = parser.parse_args()
+
+    results = Replayer(args.snapshot, args.taskrc).replay(
+        read_trace(args.trace)
+    )
+
+    if args.invocations:
+        for number, result in enumerate(results):
+            print('{:>6} {:<8} {:<8} recorded {:8.2f} ms  replayed {:8.2f} ms'
+                  '  task calls {:>3}'.format(
+                      number,
+                      result['hook'],
+                      result['command'] or '',
+                      result['recorded'] * 1000,
+                      result['replayed'] * 1000,
+                      result['task_calls'],
+                  ))
+
+    for hook, summary in summarize(results).items():
+        print('{} ({} invocations, {} exit code changes)'.format(
+            hook,
+            summary['invocations'],
+            summary['exit_mismatches'],
+        ))
+        for key in ['recorded', 'replayed']:
+            print('  {:<10} p50 {:8.2f} ms  p90 {:8.2f} ms  p99 {:8.2f} ms'
+                  '  max {:8.2f} ms'.format(
+                      key,
+                      summary[key]['p50'] * 1000,
+                      summary[key]['p90'] * 1000,
+                      summary[key]['p99'] * 1000,
+                      summary[key]['max'] * 1000,
+                  ))
+        print('  {:<10} p50 {:8} p90 {:8} max {:8} total {}'.format(
+            'task calls',
+            summary['task_calls']['p50'],
+            summary['task_calls']['p90'],
+            summary['task_calls']['max'],
+            summary['task_calls']['total'],
+        ))
+
+
+if __name__ == "__main__":
+    main()
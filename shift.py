@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+import argparse
+from taskwarrior_recurrence.backend import CachedTaskWarrior
+from taskwarrior_recurrence.clock import Clock
+from taskwarrior_recurrence.index import open_index
+from taskwarrior_recurrence.lock import RecurrenceLock
+from taskwarrior_recurrence.shift import SeriesShift
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Move a recurrent series and its pending children',
+    )
+    parser.add_argument('taskrc')
+    parser.add_argument('data')
+    parser.add_argument('parent', help='Uuid of the recurrent parent task')
+    parser.add_argument(
+        'due',
+        help='New due of the parent, as a taskwarrior date',
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help="Print the new dues of the tasks but don't change them",
+    )
+    args = parser.parse_args()
+
+    tw = CachedTaskWarrior(
+        taskrc_location=args.taskrc,
+        data_location=args.data,
+    )
+    shift = SeriesShift(
+        tw,
+        args.parent,
+        tw.convert_datetime_string(args.due),
+        index=open_index(args.data),
+        lock=RecurrenceLock(args.data),
+        clock=Clock(data_location=args.data),
+    )
+    if args.dry_run:
+        tasks = shift.plan()
+    else:
+        tasks = shift.run()
+
+    for data in tasks:
+        print('{} {} due:{} {}'.format(
+            data['uuid'],
+            data.get('status'),
+            data.get('due'),
+            data.get('description'),
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/python3
+import argparse
+from taskwarrior_recurrence.backend import CachedTaskWarrior
+from taskwarrior_recurrence.index import open_index
+from taskwarrior_recurrence.lock import RecurrenceLock
+from taskwarrior_recurrence.sweep import Sweeper
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Delete the expired children and create their successors',
+    )
+    parser.add_argument('taskrc')
+    parser.add_argument('data')
+    args = parser.parse_args()
+
+    tw = CachedTaskWarrior(
+        taskrc_location=args.taskrc,
+        data_location=args.data,
+    )
+    swept = Sweeper(
+        tw,
+        index=open_index(args.data),
+        lock=RecurrenceLock(args.data),
+    ).run()
+    print('Deleted {} expired children'.format(len(swept)))
+
+
+if __name__ == "__main__":
+    main()
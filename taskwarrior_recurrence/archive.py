@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+import os
+import re
+import gzip
+import json
+from tasklib.backends import TaskWarriorException
+
+try:
+    from export import stream_export, uuid_chunks
+except ImportError:
+    from .export import stream_export, uuid_chunks
+
+ARCHIVE_DIRECTORY = 'recurrence.archive'
+SUMMARY_FILE = 'summary.json'
+DEFAULT_AGE = '90d'
+# First taskwarrior version with the purge command
+PURGE_VERSION = (2, 6, 0)
+
+
+def archive_path(data_location, parent_uuid):
+    '''Returns the path of the gzip compressed JSON lines archive of the
+    children of the parent'''
+
+    return os.path.join(
+        data_location,
+        ARCHIVE_DIRECTORY,
+        '{}.jsonl.gz'.format(parent_uuid),
+    )
+
+
+def read_archive(data_location, parent_uuid):
+    '''Yields the archived children of the parent. A child archived twice,
+    because a previous run failed before removing it, is yielded once'''
+
+    path = archive_path(data_location, parent_uuid)
+    if not os.path.exists(path):
+        return
+
+    seen = set()
+    with gzip.open(path, 'rt') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            task = json.loads(line)
+            if task['uuid'] in seen:
+                continue
+            seen.add(task['uuid'])
+            yield task
+
+
+def load_summaries(data_location):
+    '''Returns the summary of the archived children of each parent'''
+
+    try:
+        with open(
+            os.path.join(data_location, ARCHIVE_DIRECTORY, SUMMARY_FILE)
+        ) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class Archiver():
+    '''Moves the completed and deleted children closed more than age ago,
+    a taskwarrior duration, out of the data files so they don't slow down
+    every `task` command.
+
+    The children are appended to a compressed archive file per parent,
+    and the counts and last completion of each parent are kept in a summary
+    file. The last instance of each parent is never archived, as the
+    recurrence needs it.
+
+    The children are removed with `task purge`, so it needs taskwarrior
+    2.6.0 or later'''
+
+    def __init__(self, tw, data_location, age=DEFAULT_AGE, index=None):
+        self.tw = tw
+        self.data_location = data_location
+        self.age = age
+        self.index = index
+
+    def run(self):
+        '''Archives the old children and returns the number archived of
+        each parent.
+
+        It raises TaskWarriorException before changing anything if the
+        version of taskwarrior can't purge them'''
+
+        self._check_version()
+        children = {}
+        for task in self._old_children():
+            children.setdefault(task['rparent'], []).append(task)
+        if not children:
+            return {}
+
+        os.makedirs(
+            os.path.join(self.data_location, ARCHIVE_DIRECTORY),
+            exist_ok=True,
+        )
+        # The archives are written before removing the tasks, so a failure
+        # can only duplicate a child in its archive, never lose it
+        for parent_uuid, tasks in children.items():
+            self._write_archive(parent_uuid, tasks)
+
+        tasks = [task for parent in children.values() for task in parent]
+        self._remove(tasks)
+        self._update_summaries(children)
+
+        return {
+            parent_uuid: len(tasks)
+            for parent_uuid, tasks in children.items()
+        }
+
+    def _check_version(self):
+        '''Checks that taskwarrior has the purge command. Without it the
+        completed children would be deleted and left in the data files'''
+
+        version = tuple(
+            int(part) for part in re.findall(r'\d+', self.tw.version)
+        )
+        if version[:3] < PURGE_VERSION:
+            raise TaskWarriorException(
+                'Archiving needs taskwarrior {} or later to purge the '
+                'children, found {}'.format(
+                    '.'.join(str(part) for part in PURGE_VERSION),
+                    self.tw.version,
+                )
+            )
+
+    def _old_children(self):
+        last_instances = {
+            task.get('rlastinstance')
+            for task in stream_export(
+                self.tw,
+                ['status:recurring'],
+                fields=['uuid', 'rlastinstance'],
+            )
+        }
+
+        for task in stream_export(
+            self.tw,
+            [
+                'rparent.any:',
+                '(', 'status:completed', 'or', 'status:deleted', ')',
+                'end.before:now-{}'.format(self.age),
+            ],
+            fields=None,
+        ):
+            if task['uuid'] not in last_instances:
+                yield task
+
+    def _write_archive(self, parent_uuid, tasks):
+        with gzip.open(archive_path(self.data_location, parent_uuid),
+                       'at') as f:
+            for task in tasks:
+                f.write(json.dumps(task, sort_keys=True) + '\n')
+
+    def _remove(self, tasks):
+        '''Removes the tasks from the data files, running a bulk `task
+        delete` of the completed ones and a bulk `task purge` of all of them
+        for each chunk of uuids'''
+
+        completed = [
+            task['uuid'] for task in tasks if task['status'] == 'completed'
+        ]
+        for chunk in uuid_chunks(completed):
+            self.tw.execute_command(
+                chunk + ['delete'],
+                config_override={'hooks': 'off'},
+            )
+        for chunk in uuid_chunks(task['uuid'] for task in tasks):
+            self.tw.execute_command(
+                chunk + ['purge'],
+                config_override={'hooks': 'off'},
+            )
+
+        if self.index is not None:
+            self.index.remove(task['uuid'] for task in tasks)
+
+    def _update_summaries(self, children):
+        summaries = load_summaries(self.data_location)
+        for parent_uuid, tasks in children.items():
+            summary = summaries.setdefault(
+                parent_uuid,
+                {'completed': 0, 'deleted': 0, 'last_end': None},
+            )
+            for task in tasks:
+                summary[task['status']] += 1
+                end = task.get('end')
+                if summary['last_end'] is None or \
+                        (end is not None and end > summary['last_end']):
+                    summary['last_end'] = end
+
+        path = os.path.join(
+            self.data_location,
+            ARCHIVE_DIRECTORY,
+            SUMMARY_FILE,
+        )
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(summaries, f, indent=2, sort_keys=True)
+        os.replace(temp_path, path)
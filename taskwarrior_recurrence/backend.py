@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+import os
+import json
+import shutil
+import tasklib
+from tasklib.task import ReadOnlyDictView
+
+CACHE_FILE = 'recurrence.backend'
+CONFIG_PREFIXES = ['uda.', 'dateformat', 'recurrence', 'json.', 'weekstart']
+
+
+class CachedTaskWarrior(tasklib.TaskWarrior):
+    '''TaskWarrior backend that stores the probed `task` version and the
+    configuration relevant to the recurrence in a cache file of the data
+    location.
+
+    The cache is keyed on the taskrc path, its modification time and the
+    modification time of the `task` binary, so the probes are only run again
+    when one of them changes'''
+
+    def __init__(
+        self,
+        data_location=None,
+        create=True,
+        taskrc_location='~/.taskrc',
+    ):
+        self._cache_path = None
+        self._cache = {}
+        self._cache_key = _cache_key(taskrc_location)
+
+        if data_location is not None and self._cache_key is not None:
+            data_location = os.path.expanduser(data_location)
+            if create and not os.path.exists(data_location):
+                os.makedirs(data_location)
+            self._cache_path = os.path.join(data_location, CACHE_FILE)
+            self._cache = self._load_cache()
+
+        super().__init__(
+            data_location=data_location,
+            create=create,
+            taskrc_location=taskrc_location,
+        )
+
+    def _get_version(self):
+        if 'version' not in self._cache:
+            self._cache['version'] = super()._get_version()
+            self._save_cache()
+        return self._cache['version']
+
+    @property
+    def config(self):
+        if self._config:
+            return self._config
+
+        if 'config' not in self._cache:
+            self._cache['config'] = {
+                key: value
+                for key, value in super().config.items()
+                if any(key.startswith(prefix) for prefix in CONFIG_PREFIXES)
+            }
+            self._save_cache()
+
+        self._config = ReadOnlyDictView(self._cache['config'])
+        return self._config
+
+    def _load_cache(self):
+        '''Returns the cached probes if they were stored with the current
+        key'''
+
+        try:
+            with open(self._cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if cache.get('key') != self._cache_key:
+            return {}
+        return cache
+
+    def _save_cache(self):
+        if self._cache_path is None:
+            return
+
+        self._cache['key'] = self._cache_key
+        temp_path = self._cache_path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(self._cache, f)
+            os.replace(temp_path, self._cache_path)
+        except OSError:
+            # The cache is an optimization, a read only data location
+            # shouldn't break the hooks
+            pass
+
+
+def _cache_key(taskrc_location):
+    '''Returns the key of the probes done with the taskrc, or None if it
+    can't be computed'''
+
+    binary = shutil.which('task')
+    if binary is None:
+        return None
+
+    taskrc_location = os.path.expanduser(taskrc_location)
+    try:
+        taskrc_mtime = os.stat(taskrc_location).st_mtime
+    except OSError:
+        taskrc_mtime = None
+
+    return [
+        taskrc_location,
+        taskrc_mtime,
+        os.stat(binary).st_mtime,
+    ]
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+import os
+import re
+import bisect
+import calendar
+import datetime
+
+try:
+    from clock import localize
+except ImportError:
+    from .clock import localize
+
+# Periods of r that `task calc` doesn't understand: every N business days,
+# and the last business day of every N months
+BUSINESS_DAYS = re.compile(r'^(\d*)bd$')
+LAST_BUSINESS_DAY = re.compile(r'^(\d*)lastbd$')
+# Business days of the week, from Monday to Sunday, like numpy's weekmask
+DEFAULT_WEEKMASK = '1111100'
+WEEKMASK_CONFIG = 'recurrence.busday.weekmask'
+HOLIDAYS_CONFIG = 'recurrence.busday.holidays'
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+# Calendars loaded by load_calendar, by configuration
+_calendars = {}
+
+
+def is_business_period(r):
+    '''Checks if r is one of the business day periods'''
+
+    return r is not None and (
+        BUSINESS_DAYS.match(r) is not None or
+        LAST_BUSINESS_DAY.match(r) is not None
+    )
+
+
+def parse_weekmask(value):
+    '''Returns the list of seven booleans of a weekmask, given as seven 0 or
+    1 characters or as the names of the business days, like "Mon Tue Wed"'''
+
+    value = value.strip()
+    if re.match(r'^[01]{7}$', value):
+        weekmask = [character == '1' for character in value]
+    else:
+        days = value.replace(',', ' ').split()
+        unknown = [day for day in days if day not in WEEKDAYS]
+        if unknown:
+            raise ValueError('Unknown week days: {}'.format(' '.join(unknown)))
+        weekmask = [day in days for day in WEEKDAYS]
+    if not any(weekmask):
+        raise ValueError('The weekmask has no business days')
+    return weekmask
+
+
+def read_holidays(path):
+    '''Returns the dates of the holidays file, one YYYY-MM-DD date per line.
+    Empty lines and the ones starting with # are ignored'''
+
+    holidays = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                holidays.append(datetime.date.fromisoformat(line))
+    return holidays
+
+
+class BusinessCalendar():
+    '''Business days of a weekmask without the holidays.
+
+    The offsets are computed jumping whole weeks, as each has the same number
+    of business days, and then subtracting the holidays in the range, found
+    with a binary search in their sorted ordinals. So finding an occurrence
+    years away costs the same as finding the next one'''
+
+    def __init__(self, weekmask=DEFAULT_WEEKMASK, holidays=()):
+        self.weekmask = parse_weekmask(weekmask)
+        self.per_week = sum(self.weekmask)
+        # Only the holidays that fall on business days change the offsets
+        self.holidays = sorted({
+            date.toordinal()
+            for date in holidays
+            if self.weekmask[date.weekday()]
+        })
+
+    def is_busday(self, date):
+        return self.weekmask[date.weekday()] and not self._holidays_in(
+            date.toordinal() - 1,
+            date.toordinal(),
+        )
+
+    def offset(self, date, count):
+        '''Returns the business day count business days after the date'''
+
+        result = self._weekmask_offset(date, count)
+        counted = date
+        while True:
+            # Each holiday in the range was counted as a business day
+            skipped = self._holidays_in(
+                counted.toordinal(),
+                result.toordinal(),
+            )
+            if not skipped:
+                return result
+            counted = result
+            result = self._weekmask_offset(result, skipped)
+
+    def count(self, start, end):
+        '''Returns the number of business days after the date start till the
+        date end, included'''
+
+        days = end.toordinal() - start.toordinal()
+        if days <= 0:
+            return 0
+        weeks, rest = divmod(days, 7)
+        count = weeks * self.per_week
+        date = start + datetime.timedelta(weeks=weeks)
+        for _ in range(rest):
+            date += datetime.timedelta(days=1)
+            if self.weekmask[date.weekday()]:
+                count += 1
+        return count - self._holidays_in(start.toordinal(), end.toordinal())
+
+    def last_busday(self, year, month):
+        '''Returns the last business day of the month'''
+
+        date = datetime.date(year, month, calendar.monthrange(year, month)[1])
+        while not self.is_busday(date):
+            date -= datetime.timedelta(days=1)
+        return date
+
+    def advance(self, due, r, iteration, zone):
+        '''Returns the due iteration business periods r after the aware
+        datetime due, at the same time of the day of the zone'''
+
+        local_due = due.astimezone(zone)
+        date = local_due.date()
+
+        match = BUSINESS_DAYS.match(r)
+        if match is not None:
+            date = self.offset(date, int(match.group(1) or 1) * iteration)
+        else:
+            match = LAST_BUSINESS_DAY.match(r)
+            months = date.month - 1 + int(match.group(1) or 1) * iteration
+            date = self.last_busday(
+                date.year + months // 12,
+                months % 12 + 1,
+            )
+
+        return localize(
+            datetime.datetime.combine(date, local_due.time().replace(
+                tzinfo=None,
+            )),
+            zone,
+        )
+
+    def iteration(self, due, r, occurrence_due, zone):
+        '''Returns the number of business periods r between the aware
+        datetimes due and occurrence_due, or None if occurrence_due isn't
+        a whole number of periods after due'''
+
+        date = due.astimezone(zone).date()
+        occurrence_date = occurrence_due.astimezone(zone).date()
+
+        match = BUSINESS_DAYS.match(r)
+        if match is not None:
+            periods = self.count(date, occurrence_date)
+        else:
+            match = LAST_BUSINESS_DAY.match(r)
+            periods = (occurrence_date.year - date.year) * 12 + \
+                occurrence_date.month - date.month
+
+        iteration, rest = divmod(periods, int(match.group(1) or 1))
+        if rest or iteration < 0:
+            return None
+        return iteration
+
+    def _weekmask_offset(self, date, count):
+        '''Returns the day count business days of the weekmask after the
+        date, ignoring the holidays'''
+
+        weeks, rest = divmod(count, self.per_week)
+        if rest == 0 and weeks > 0:
+            # The date may not be a business day, so the last week is walked
+            weeks -= 1
+            rest = self.per_week
+        date += datetime.timedelta(weeks=weeks)
+        while rest:
+            date += datetime.timedelta(days=1)
+            if self.weekmask[date.weekday()]:
+                rest -= 1
+        return date
+
+    def _holidays_in(self, start, end):
+        '''Returns the number of holidays with ordinals in (start, end]'''
+
+        return bisect.bisect_right(self.holidays, end) - \
+            bisect.bisect_right(self.holidays, start)
+
+
+def load_calendar(config):
+    '''Returns the BusinessCalendar of the weekmask and the holidays file set
+    in the taskwarrior configuration config. It's loaded once per process
+    while the holidays file isn't modified'''
+
+    weekmask = config.get(WEEKMASK_CONFIG) or DEFAULT_WEEKMASK
+    path = config.get(HOLIDAYS_CONFIG)
+    if path:
+        path = os.path.expanduser(path)
+        key = (weekmask, path, os.stat(path).st_mtime)
+    else:
+        key = (weekmask, None, None)
+
+    if key not in _calendars:
+        holidays = read_holidays(path) if path else []
+        _calendars[key] = BusinessCalendar(weekmask, holidays)
+    return _calendars[key]
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+import os
+import json
+import datetime
+
+ZONE_CACHE_FILE = 'recurrence.zone'
+LOCALTIME_FILE = '/etc/localtime'
+
+# Local zone of the process, resolved by the first call to get_local_zone
+_local_zone = None
+
+
+def localize(naive, zone):
+    '''Returns the naive datetime in zone, which can be either a pytz zone, as
+    returned by the old versions of tzlocal, or a zoneinfo zone'''
+
+    if hasattr(zone, 'localize'):
+        return zone.localize(naive)
+    return naive.replace(tzinfo=zone)
+
+
+def get_local_zone(cache_path=None):
+    '''Returns the local zone, resolved with tzlocal once per process.
+
+    If cache_path is given the name of the zone is stored there, keyed on the
+    TZ environmental variable and the /etc/localtime file, so the next
+    processes don't need to probe the system'''
+
+    global _local_zone
+
+    if _local_zone is not None:
+        return _local_zone
+
+    key = _zone_key()
+    if cache_path is not None:
+        _local_zone = _load_cached_zone(cache_path, key)
+        if _local_zone is not None:
+            return _local_zone
+
+    import tzlocal
+    _local_zone = tzlocal.get_localzone()
+
+    name = _zone_name(_local_zone)
+    if cache_path is not None and name is not None:
+        temp_path = cache_path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump({'key': key, 'name': name}, f)
+            os.replace(temp_path, cache_path)
+        except OSError:
+            # As the probes of the backend, it's resolved again next time
+            pass
+    return _local_zone
+
+
+def _zone_key():
+    try:
+        mtime = os.stat(LOCALTIME_FILE).st_mtime
+    except OSError:
+        mtime = None
+    return [
+        os.environ.get('TZ'),
+        os.path.realpath(LOCALTIME_FILE),
+        mtime,
+    ]
+
+
+def _zone_name(zone):
+    '''Returns the IANA name of a zoneinfo or pytz zone, or None if it has
+    none'''
+
+    return getattr(zone, 'key', None) or getattr(zone, 'zone', None)
+
+
+def _load_cached_zone(cache_path, key):
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get('key') != key:
+        return None
+
+    try:
+        import zoneinfo
+        return zoneinfo.ZoneInfo(cache['name'])
+    except ImportError:
+        import pytz
+        return pytz.timezone(cache['name'])
+    except (KeyError, ValueError):
+        return None
+
+
+class Clock():
+    '''Current time and local zone of the recurrence.
+
+    The zone is resolved once per process, and cached in the data location if
+    one is given'''
+
+    def __init__(self, zone=None, data_location=None):
+        if zone is None:
+            cache_path = None
+            if data_location is not None:
+                cache_path = os.path.join(data_location, ZONE_CACHE_FILE)
+            zone = get_local_zone(cache_path)
+        self.zone = zone
+
+    def now(self):
+        return datetime.datetime.now(self.zone)
+
+    def localize(self, naive):
+        return localize(naive, self.zone)
+
+
+class FixedClock(Clock):
+    '''Clock stopped at the aware datetime now, so the tests and the
+    benchmarks can replay the recurrence deterministically. It's moved with
+    set and advance'''
+
+    def __init__(self, now, zone=None):
+        super().__init__(zone=zone or now.tzinfo)
+        self._now = now
+
+    def now(self):
+        return self._now
+
+    def set(self, now):
+        self._now = now
+
+    def advance(self, delta):
+        self._now += delta
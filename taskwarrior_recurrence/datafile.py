@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+
+import os
+import re
+import mmap
+import json
+import datetime
+
+try:
+    from export import RECURRENCE_FIELDS
+except ImportError:
+    from .export import RECURRENCE_FIELDS
+
+# Files of a taskwarrior 2 data location, one task per line in the FF4
+# format: [name:"value" name:"value"]
+DATA_FILES = ['pending.data', 'completed.data']
+# Storage of taskwarrior 3. The files of taskwarrior 2 may still be there
+# after the upgrade, but they are no longer updated
+TASKCHAMPION_FILE = 'taskchampion.sqlite3'
+DATE_FORMAT = '%Y%m%dT%H%M%SZ'
+# Attributes stored as epoch seconds, converted to the `task export` format
+DATE_FIELDS = [
+    'due',
+    'end',
+    'entry',
+    'modified',
+    'rexpiry',
+    'scheduled',
+    'start',
+    'until',
+    'wait',
+]
+ATTRIBUTE = re.compile(rb'([^\s\[\]:"]+):"((?:[^"\\]|\\.)*)"')
+
+
+def data_location(tw):
+    '''Returns the data location of the tasklib backend tw, or None if it
+    isn't set'''
+
+    overrides = getattr(tw, 'overrides', None)
+    if not isinstance(overrides, dict):
+        return None
+    return overrides.get('data.location')
+
+
+def decode_value(value):
+    '''Decodes a value of a FF4 line: the brackets are replaced by &open; and
+    &close;, and the rest is escaped as a JSON string'''
+
+    value = value.decode('utf-8')
+    value = value.replace('&open;', '[').replace('&close;', ']')
+    value = value.replace('&dquot;', '"')
+    if '\\' not in value:
+        return value
+    try:
+        return json.loads('"{}"'.format(value), strict=False)
+    except ValueError:
+        # Written by an old taskwarrior that didn't escape the values
+        return value
+
+
+def parse_line(line, fields=RECURRENCE_FIELDS):
+    '''Returns a dictionary with the fields of the task of a FF4 line in the
+    format of `task export`. If fields is None the whole task is kept'''
+
+    data = {}
+    for name, value in ATTRIBUTE.findall(line):
+        name = name.decode('utf-8')
+        if fields is not None and name not in fields:
+            continue
+        value = decode_value(value)
+        if name in DATE_FIELDS:
+            value = datetime.datetime.fromtimestamp(
+                int(value),
+                datetime.timezone.utc,
+            ).strftime(DATE_FORMAT)
+        data[name] = value
+    return data
+
+
+def scan_children(location, parent_uuid=None, fields=RECURRENCE_FIELDS):
+    '''Returns the list of the children of the parent with uuid parent_uuid,
+    or of every parent if it's None, reading the data files of a taskwarrior 2
+    data location. Returns None if location doesn't hold taskwarrior 2 data
+    files, to fall back to `task export`'''
+
+    children = iter_children(location, parent_uuid, fields)
+    if children is None:
+        return None
+    return list(children)
+
+
+def iter_children(location, parent_uuid=None, fields=RECURRENCE_FIELDS):
+    '''Returns an iterator over the children of the parent with uuid
+    parent_uuid, or of every parent if it's None, as scan_children does, or
+    None if location doesn't hold taskwarrior 2 data files.
+
+    The files are memory mapped and searched for the rparent attribute, so
+    only the lines of the children are decoded, and each child is yielded as
+    it's decoded, so they're never held in memory at once'''
+
+    if location is None or \
+            os.path.exists(os.path.join(location, TASKCHAMPION_FILE)) or \
+            not os.path.exists(os.path.join(location, DATA_FILES[0])):
+        return None
+
+    needle = b'rparent:"'
+    if parent_uuid is not None:
+        needle += parent_uuid.encode('ascii') + b'"'
+    return _iter_children(location, needle, fields)
+
+
+def _iter_children(location, needle, fields):
+    # A task done since the last garbage collection is still in
+    # pending.data, so the last modified copy wins. Only the uuid and
+    # modified of the children are kept to find it, in a first pass
+    last_copies = {}
+    for name in DATA_FILES:
+        for line in _matching_lines(os.path.join(location, name), needle):
+            data = parse_line(line, ['uuid', 'modified'])
+            previous = last_copies.get(data['uuid'])
+            if previous is None or \
+                    data.get('modified', '') >= previous[0]:
+                last_copies[data['uuid']] = (data.get('modified', ''), name)
+
+    for name in DATA_FILES:
+        for line in _matching_lines(os.path.join(location, name), needle):
+            data = parse_line(line, None)
+            if last_copies.get(data['uuid']) != \
+                    (data.get('modified', ''), name):
+                continue
+            # A copy repeated in the same file is only yielded once
+            del last_copies[data['uuid']]
+            if fields is not None:
+                data = {
+                    field: data[field] for field in fields if field in data
+                }
+            yield data
+
+
+def _matching_lines(path, needle):
+    '''Yields the lines of the file at path with an attribute that starts
+    with needle'''
+
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+
+    with f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            return
+
+        with data:
+            position = data.find(needle)
+            while position != -1:
+                # Skip the attributes whose name ends with rparent
+                if data[position - 1:position] not in [b' ', b'[']:
+                    position = data.find(needle, position + 1)
+                    continue
+
+                start = data.rfind(b'\n', 0, position) + 1
+                end = data.find(b'\n', position)
+                if end == -1:
+                    end = len(data)
+                yield data[start:end]
+                position = data.find(needle, end)
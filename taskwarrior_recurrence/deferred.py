@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+import os
+import json
+import time
+import fcntl
+import contextlib
+
+QUEUE_FILE = 'recurrence.queue'
+QUEUE_LOCK_FILE = 'recurrence.queue.lock'
+BUDGET_VARIABLE = 'TASKWARRIOR_RECURRENCE_BUDGET'
+
+
+class BudgetExceeded(Exception):
+    '''Raised when a hook runs out of its time budget'''
+
+
+def hook_deadline(start=None):
+    '''Returns the epoch time at which the running hook has to stop working,
+    or None if no budget is configured.
+
+    The budget is read in seconds from the TASKWARRIOR_RECURRENCE_BUDGET
+    environmental variable'''
+
+    budget = os.environ.get(BUDGET_VARIABLE)
+    if budget is None or budget == '':
+        return None
+    if start is None:
+        start = time.time()
+    return start + float(budget)
+
+
+def check_deadline(deadline):
+    '''Raises BudgetExceeded if the deadline has passed'''
+
+    if deadline is not None and time.time() > deadline:
+        raise BudgetExceeded()
+
+
+class DeferredQueue():
+    '''Append-only queue of the recurrence work that didn't fit in the hook
+    budget.
+
+    Each line of the queue file is an intent record with the uuid of the
+    parent, the uuid of the completed child and its end and due dates.
+
+    The appends and the rewrites of the queue file hold a flock of the
+    recurrence.queue.lock file, so a record appended while the queue is
+    rewritten isn't lost. It's a lock of its own, as the RecurrenceLock is
+    held for the whole synthesis'''
+
+    def __init__(self, data_location):
+        self.path = os.path.join(data_location, QUEUE_FILE)
+        self.lock_path = os.path.join(data_location, QUEUE_LOCK_FILE)
+
+    def push(self, task):
+        '''Stores the intent of synthetizing the successor of task'''
+
+        record = {
+            'parent': task['rparent'],
+            'child': task['uuid'],
+            'end': _serialize_date(task['end']),
+            'due': _serialize_date(task['due']),
+        }
+        with self._locked():
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+
+    def records(self):
+        '''Returns the list of pending intent records'''
+
+        if not os.path.exists(self.path):
+            return []
+
+        records = []
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+        return records
+
+    def drain(self, tw, deadline=None, index=None, lock=None):
+        '''Processes the pending intent records till the queue is empty or
+        the deadline is reached. Returns the number of processed records.
+
+        Processing is idempotent, periodic tasks won't create existing
+        occurrences and chained tasks won't create a child if the parent
+        already has a pending one, so a record can be safely processed
+        twice if the hook is interrupted before the queue is rewritten'''
+
+        # Imported here to keep the hooks from loading tasklib when there's
+        # nothing to drain
+        import tasklib
+        try:
+            from main import ProcessRecurrentTask
+        except ImportError:
+            from .main import ProcessRecurrentTask
+
+        records = self.records()
+        processed = []
+
+        for record in records:
+            try:
+                check_deadline(deadline)
+                if not self._is_processed(tw, record):
+                    child_task = tw.tasks.get(uuid=record['child'])
+                    prt = ProcessRecurrentTask(
+                        child_task,
+                        deadline=deadline,
+                        index=index,
+                        lock=lock,
+                    )
+                    prt.synthetize_next_child()
+            except BudgetExceeded:
+                break
+            except tasklib.Task.DoesNotExist:
+                # The child or its parent were purged since the record was
+                # queued, for example by the archive, so it's dropped
+                pass
+            processed.append(record)
+
+        self._discard(processed)
+        return len(processed)
+
+    def _is_processed(self, tw, record):
+        '''Checks if the chained successor of the record already exists.
+
+        Chained series only have one pending child, so if there's one the
+        record was already processed. Periodic series are checked by
+        synthetize_next_periodic itself'''
+
+        parent_task = tw.tasks.get(uuid=record['parent'])
+        if parent_task['rtype'] != 'chained':
+            return False
+        pending_children = tw.tasks.filter(
+            rparent=record['parent'],
+            status='pending',
+        )
+        return len(pending_children) > 0
+
+    def _discard(self, processed):
+        '''Atomically removes the processed records from the queue.
+
+        The queue is read again holding the lock of the queue till it's
+        replaced, and the records are removed by their parent and child
+        instead of their position, so the records appended by other hooks
+        or left by another drain are kept'''
+
+        if not processed:
+            return
+        keys = {_record_key(record) for record in processed}
+
+        with self._locked():
+            records = [
+                record
+                for record in self.records()
+                if _record_key(record) not in keys
+            ]
+            if not records:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                for record in records:
+                    f.write(json.dumps(record, sort_keys=True) + '\n')
+            os.replace(temp_path, self.path)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        '''Holds the lock of the queue file in the with block'''
+
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _record_key(record):
+    return (record['parent'], record['child'])
+
+
+def _serialize_date(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    return value.isoformat()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+import bisect
+import datetime
+
+
+def day_start(date):
+    '''Returns the epoch of the start of the day of the aware datetime date,
+    in its own timezone'''
+
+    return int(date.replace(
+        hour=0,
+        minute=0,
+        second=0,
+        microsecond=0,
+    ).timestamp())
+
+
+def parse_exdates(value):
+    '''Returns the sorted list of epochs stored in the rexcept attribute of a
+    parent, a comma separated string'''
+
+    if not value:
+        return []
+    # Sorted again in case the attribute was edited by hand
+    return sorted({int(epoch) for epoch in value.split(',') if epoch})
+
+
+def encode_exdates(exdates):
+    return ','.join(str(epoch) for epoch in exdates)
+
+
+def is_excluded(exdates, due):
+    '''Checks with a binary search if the day of the datetime due is in the
+    sorted list of epochs exdates'''
+
+    if not exdates:
+        return False
+    epoch = day_start(due)
+    position = bisect.bisect_left(exdates, epoch)
+    return position < len(exdates) and exdates[position] == epoch
+
+
+def add_exdates(value, dates):
+    '''Returns the rexcept attribute value with the days of the datetimes of
+    dates added'''
+
+    exdates = parse_exdates(value)
+    for date in dates:
+        epoch = day_start(date)
+        position = bisect.bisect_left(exdates, epoch)
+        if position == len(exdates) or exdates[position] != epoch:
+            exdates.insert(position, epoch)
+    return encode_exdates(exdates)
+
+
+def remove_exdates(value, dates):
+    '''Returns the rexcept attribute value without the days of the datetimes
+    of dates'''
+
+    removed = {day_start(date) for date in dates}
+    return encode_exdates(
+        epoch for epoch in parse_exdates(value) if epoch not in removed
+    )
+
+
+def format_exdates(value, local_zone):
+    '''Returns the days of the rexcept attribute value as dates of the local
+    zone'''
+
+    return [
+        datetime.datetime.fromtimestamp(epoch, local_zone).date()
+        for epoch in parse_exdates(value)
+    ]
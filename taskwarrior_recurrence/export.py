@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+import json
+import tempfile
+import subprocess
+from tasklib.backends import TaskWarriorException
+
+RECURRENCE_FIELDS = [
+    'uuid',
+    'status',
+    'rparent',
+    'rlastinstance',
+    'due',
+    'end',
+    'r',
+    'rtype',
+    'rexpiry',
+]
+# Uuids exported by each `task export` run, to keep the command line short
+UUID_CHUNK = 100
+
+
+def parse_export_lines(lines, fields=RECURRENCE_FIELDS):
+    '''Yields a dictionary with the fields of each task of an iterable of
+    `task export` lines.
+
+    It understands both the `json.array=off` output, one task per line, and
+    the array output, where the tasks are surrounded by brackets and separated
+    by commas. If fields is None the whole task is kept'''
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip().strip(',')
+        if line in ['', '[', ']']:
+            continue
+        if line.startswith('['):
+            line = line[1:]
+        if line.endswith(']'):
+            line = line[:-1]
+        data = json.loads(line)
+        if fields is None:
+            yield data
+            continue
+        yield {field: data[field] for field in fields if field in data}
+
+
+def stream_export(tw, filter_args=[], fields=RECURRENCE_FIELDS):
+    '''Yields the tasks matching filter_args as they are written by
+    `task export`, keeping only the fields needed.
+
+    Unlike tw.tasks.filter, the export is never held in memory, so it can be
+    used on databases of any size'''
+
+    command_args = tw._get_command_args(['export'] + filter_args)
+
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            command_args,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+        )
+        try:
+            for task in parse_export_lines(process.stdout, fields):
+                yield task
+        finally:
+            process.stdout.close()
+            process.wait()
+
+        if process.returncode:
+            stderr.seek(0)
+            raise TaskWarriorException(
+                stderr.read().decode('utf-8').strip() +
+                '\nCommand used: ' + ' '.join(command_args)
+            )
+
+
+def uuid_chunks(uuids):
+    '''Yields the uuids in groups of UUID_CHUNK'''
+
+    uuids = sorted(set(uuids))
+    for start in range(0, len(uuids), UUID_CHUNK):
+        yield uuids[start:start + UUID_CHUNK]
+
+
+def export_uuids(tw, uuids, filter_args=[], fields=RECURRENCE_FIELDS):
+    '''Yields the tasks with the uuids that match filter_args'''
+
+    for chunk in uuid_chunks(uuids):
+        for task in stream_export(tw, filter_args + chunk, fields):
+            yield task
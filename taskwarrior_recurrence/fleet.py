@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+import os
+import glob
+import json
+import time
+import multiprocessing
+from multiprocessing.connection import wait
+
+try:
+    from backend import CachedTaskWarrior
+    from index import open_index
+    from lock import RecurrenceLock
+    from repair import RepairPipeline, DEFAULT_CONCURRENCY
+    from watermark import Watermark
+except ImportError:
+    from .backend import CachedTaskWarrior
+    from .index import open_index
+    from .lock import RecurrenceLock
+    from .repair import RepairPipeline, DEFAULT_CONCURRENCY
+    from .watermark import Watermark
+
+DEFAULT_TIMEOUT = 300
+REPORT_COUNTERS = ['parents', 'broken', 'missing', 'repaired', 'failed']
+
+
+def load_manifest(path):
+    '''Returns the (taskrc, data location) pairs of a JSON manifest, a list
+    of objects with the taskrc and data keys'''
+
+    with open(path) as f:
+        manifest = json.load(f)
+    return [
+        (
+            os.path.expanduser(location['taskrc']),
+            os.path.expanduser(location['data']),
+        )
+        for location in manifest
+    ]
+
+
+def glob_locations(pattern, taskrc='.taskrc', data='.task'):
+    '''Returns the (taskrc, data location) pairs of the directories matching
+    pattern, for example the home directories with /home/*'''
+
+    return [
+        (os.path.join(directory, taskrc), os.path.join(directory, data))
+        for directory in sorted(glob.glob(os.path.expanduser(pattern)))
+        if os.path.isdir(os.path.join(directory, data))
+    ]
+
+
+def process_location(taskrc, data_location, check, concurrency, full):
+    '''Repairs, or checks if check is True, one data location and returns
+    its RepairReport as a dictionary.
+
+    Unless full is True, only the parents modified since the last repair of
+    the location are checked'''
+
+    tw = CachedTaskWarrior(
+        taskrc_location=taskrc,
+        data_location=data_location,
+        create=False,
+    )
+    watermark = Watermark(data_location, 'parent_children')
+    watermark.start()
+
+    report = RepairPipeline(
+        tw,
+        concurrency=concurrency,
+        index=open_index(data_location),
+        lock=RecurrenceLock(data_location),
+        check=check,
+        since=None if full else watermark.load(),
+    ).run()
+
+    if not check and not report.failed:
+        watermark.save()
+    return report.as_dict()
+
+
+def _worker(connection, taskrc, data_location, check, concurrency, full):
+    try:
+        result = {
+            'status': 'ok',
+            'report': process_location(
+                taskrc,
+                data_location,
+                check,
+                concurrency,
+                full,
+            ),
+        }
+    except Exception as error:
+        result = {'status': 'error', 'error': str(error)}
+    connection.send(result)
+    connection.close()
+
+
+class Fleet():
+    '''Repairs or checks many data locations in parallel, with one worker
+    process per data location.
+
+    A location that takes longer than timeout seconds has its worker
+    terminated and is reported as timeout, the `task` command it may be
+    running finishes on its own'''
+
+    def __init__(
+        self,
+        locations,
+        workers=None,
+        timeout=DEFAULT_TIMEOUT,
+        check=False,
+        concurrency=DEFAULT_CONCURRENCY,
+        full=False,
+    ):
+        self.locations = locations
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.check = check
+        self.concurrency = concurrency
+        self.full = full
+
+    def run(self):
+        '''Processes the locations and returns the merged summary'''
+
+        start = time.time()
+        pending = list(self.locations)
+        running = {}
+        results = []
+
+        while pending or running:
+            while pending and len(running) < self.workers:
+                running.update(self._start(*pending.pop(0)))
+
+            deadline = min(worker['deadline'] for worker in running.values())
+            wait(
+                list(running.keys()),
+                timeout=max(deadline - time.time(), 0),
+            )
+
+            for connection in list(running.keys()):
+                result = self._poll(connection, running[connection])
+                if result is not None:
+                    del running[connection]
+                    results.append(result)
+
+        return summarize(results, time.time() - start)
+
+    def _start(self, taskrc, data_location):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=_worker,
+            args=(
+                sender,
+                taskrc,
+                data_location,
+                self.check,
+                self.concurrency,
+                self.full,
+            ),
+        )
+        process.start()
+        sender.close()
+        now = time.time()
+        return {
+            receiver: {
+                'process': process,
+                'taskrc': taskrc,
+                'data': data_location,
+                'start': now,
+                'deadline': now + self.timeout,
+            },
+        }
+
+    def _poll(self, connection, worker):
+        '''Returns the result of the worker, or None if it's still running'''
+
+        process = worker['process']
+        if connection.poll():
+            try:
+                result = connection.recv()
+            except EOFError:
+                result = {
+                    'status': 'error',
+                    'error': 'worker exited with code {}'.format(
+                        process.exitcode
+                    ),
+                }
+        elif time.time() >= worker['deadline']:
+            process.terminate()
+            result = {'status': 'timeout'}
+        else:
+            return None
+
+        connection.close()
+        process.join()
+        result['taskrc'] = worker['taskrc']
+        result['data'] = worker['data']
+        result['elapsed'] = time.time() - worker['start']
+        return result
+
+
+def summarize(results, elapsed):
+    '''Merges the results of the locations into one summary'''
+
+    totals = {
+        'locations': len(results),
+        'ok': 0,
+        'error': 0,
+        'timeout': 0,
+    }
+    for counter in REPORT_COUNTERS:
+        totals[counter] = 0
+
+    for result in results:
+        totals[result['status']] += 1
+        if result['status'] == 'ok':
+            for counter in REPORT_COUNTERS:
+                value = result['report'][counter]
+                if isinstance(value, list):
+                    value = len(value)
+                totals[counter] += value
+
+    return {
+        'elapsed': elapsed,
+        'totals': totals,
+        'locations': sorted(results, key=lambda result: result['data']),
+    }
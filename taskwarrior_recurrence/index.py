@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+
+import os
+import sqlite3
+import datetime
+
+try:
+    from table import parse_date, NULL_DATE
+except ImportError:
+    from .table import parse_date, NULL_DATE
+
+INDEX_FILE = 'recurrence.sqlite3'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS parents (
+    uuid TEXT PRIMARY KEY,
+    rtype TEXT,
+    r TEXT,
+    due INTEGER,
+    status TEXT,
+    rlastinstance TEXT,
+    modified INTEGER
+);
+CREATE TABLE IF NOT EXISTS children (
+    uuid TEXT PRIMARY KEY,
+    rparent TEXT NOT NULL,
+    due INTEGER,
+    status TEXT,
+    rexpiry INTEGER
+);
+CREATE INDEX IF NOT EXISTS children_rparent_due ON children (rparent, due);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+# Created once the columns added after the first release are migrated
+MIGRATED_SCHEMA = '''
+CREATE INDEX IF NOT EXISTS children_status_rexpiry
+    ON children (status, rexpiry);
+'''
+
+INDEXED_COLUMNS = {
+    'parents': ['rtype', 'r', 'due', 'status', 'rlastinstance', 'modified'],
+    'children': ['rparent', 'due', 'status', 'rexpiry'],
+}
+DATE_COLUMNS = ['due', 'rexpiry', 'modified']
+# Columns added after the first release, by table
+MIGRATED_COLUMNS = {
+    'parents': ['modified'],
+    'children': ['rexpiry'],
+}
+
+
+def epoch(value):
+    '''Converts a task date, either a datetime or an export string, to epoch
+    seconds'''
+
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return int(value.timestamp())
+    value = parse_date(value)
+    if value == NULL_DATE:
+        return None
+    return value
+
+
+def open_index(data_location):
+    '''Returns the index of the data location, or None if it hasn't been
+    created with reindex'''
+
+    if not os.path.exists(os.path.join(data_location, INDEX_FILE)):
+        return None
+    return RecurrenceIndex(data_location)
+
+
+class RecurrenceIndex():
+    '''SQLite index of the recurrent parents and their children stored in the
+    data location.
+
+    It's updated by the hooks with the tasks they receive and create. As the
+    data can change without the hooks knowing it, for example on a sync, the
+    index can be stale, and then it mustn't be trusted till it's rebuilt with
+    reindex. A new index is stale too'''
+
+    def __init__(self, data_location):
+        self.path = os.path.join(data_location, INDEX_FILE)
+        self.connection = sqlite3.connect(self.path, timeout=10)
+        self.connection.executescript(SCHEMA)
+        self._migrate()
+        self.connection.executescript(MIGRATED_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    @property
+    def stale(self):
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'indexed'"
+        ).fetchone()
+        return row is None or row[0] != '1'
+
+    def mark_stale(self):
+        with self.connection:
+            self._set_indexed(False)
+
+    def update(self, task):
+        '''Stores the recurrence fields of a parent or child task'''
+
+        with self.connection:
+            self._update(task)
+
+    def update_fields(self, task_uuid, fields):
+        '''Updates the indexed fields of an already indexed task'''
+
+        with self.connection:
+            for table, columns in INDEXED_COLUMNS.items():
+                for column in columns:
+                    if column not in fields:
+                        continue
+                    value = fields[column]
+                    if column in DATE_COLUMNS:
+                        value = epoch(value)
+                    self.connection.execute(
+                        'UPDATE {} SET {} = ? WHERE uuid = ?'.format(
+                            table,
+                            column,
+                        ),
+                        (value, task_uuid),
+                    )
+
+    def remove(self, task_uuids):
+        '''Removes the tasks with the uuids of the iterable task_uuids'''
+
+        with self.connection:
+            for task_uuid in task_uuids:
+                for table in INDEXED_COLUMNS:
+                    self.connection.execute(
+                        'DELETE FROM {} WHERE uuid = ?'.format(table),
+                        (task_uuid,),
+                    )
+
+    def reindex(self, tasks):
+        '''Rebuilds the index from an iterable of exported tasks'''
+
+        with self.connection:
+            self.connection.execute('DELETE FROM parents')
+            self.connection.execute('DELETE FROM children')
+            for task in tasks:
+                self._update(task)
+            self._set_indexed(True)
+
+    def occurrence_exists(self, parent_uuid, child_uuid, due):
+        '''Returns the uuid of the child of the parent with uuid child_uuid
+        or, failing that, due at due, or None if there's none'''
+
+        row = self.connection.execute(
+            'SELECT uuid FROM children WHERE uuid = ? '
+            'UNION ALL '
+            'SELECT uuid FROM children WHERE rparent = ? AND due = ? '
+            'LIMIT 1',
+            (child_uuid, parent_uuid, epoch(due)),
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def exists(self, task_uuid):
+        '''Checks if the child with uuid task_uuid is indexed'''
+
+        row = self.connection.execute(
+            'SELECT 1 FROM children WHERE uuid = ?',
+            (task_uuid,),
+        ).fetchone()
+        return row is not None
+
+    def children(self, parent_uuid, status=None):
+        '''Returns the uuids of the children of the parent sorted by due,
+        optionally filtered by a status or a list of them'''
+
+        query = 'SELECT uuid FROM children WHERE rparent = ?'
+        arguments = [parent_uuid]
+        if status is not None:
+            if isinstance(status, str):
+                status = [status]
+            query += ' AND status IN ({})'.format(
+                ', '.join('?' for _ in status)
+            )
+            arguments.extend(status)
+        query += ' ORDER BY due'
+        return [row[0] for row in self.connection.execute(query, arguments)]
+
+    def parent_modified(self, parent_uuid):
+        '''Returns the epoch of the modified of the indexed parent, or None
+        if it isn't indexed'''
+
+        row = self.connection.execute(
+            'SELECT modified FROM parents WHERE uuid = ?',
+            (parent_uuid,),
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def expired(self, now):
+        '''Returns the uuids of the pending children whose rexpiry is before
+        the epoch now'''
+
+        return [
+            row[0]
+            for row in self.connection.execute(
+                'SELECT uuid FROM children '
+                "WHERE status IN ('pending', 'waiting') AND rexpiry <= ?",
+                (now,),
+            )
+        ]
+
+    def _migrate(self):
+        '''Adds the columns missing from an index created by an older
+        version. It's marked stale, as they are empty till it's rebuilt'''
+
+        for table, migrated_columns in MIGRATED_COLUMNS.items():
+            columns = {
+                row[1]
+                for row in self.connection.execute(
+                    'PRAGMA table_info({})'.format(table)
+                )
+            }
+            for column in migrated_columns:
+                if column in columns:
+                    continue
+                with self.connection:
+                    self.connection.execute(
+                        'ALTER TABLE {} ADD COLUMN {} INTEGER'.format(
+                            table,
+                            column,
+                        )
+                    )
+                    self._set_indexed(False)
+
+    def _update(self, task):
+        if _get(task, 'rparent') is not None:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO children VALUES (?, ?, ?, ?, ?)',
+                (
+                    _get(task, 'uuid'),
+                    _get(task, 'rparent'),
+                    epoch(_get(task, 'due')),
+                    _get(task, 'status'),
+                    epoch(_get(task, 'rexpiry')),
+                ),
+            )
+        elif _get(task, 'rtype') is not None:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO parents '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    _get(task, 'uuid'),
+                    _get(task, 'rtype'),
+                    _get(task, 'r'),
+                    epoch(_get(task, 'due')),
+                    _get(task, 'status'),
+                    _get(task, 'rlastinstance'),
+                    epoch(_get(task, 'modified')),
+                ),
+            )
+
+    def _set_indexed(self, indexed):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('indexed', ?)",
+            ('1' if indexed else '0',),
+        )
+
+
+def _get(task, key):
+    '''Returns the key of a tasklib Task or of an exported task dictionary'''
+
+    if isinstance(task, dict):
+        return task.get(key)
+    return task[key]
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+import os
+import json
+import time
+import fcntl
+import contextlib
+
+try:
+    from deferred import BudgetExceeded
+except ImportError:
+    from .deferred import BudgetExceeded
+
+LOCK_FILE = 'recurrence.lock'
+STATS_FILE = 'recurrence.lockstats'
+# Seconds between the attempts to take a contended lock when there's a
+# deadline, as flock can't wait with a timeout
+POLL_INTERVAL = 0.01
+
+
+def load_stats(data_location):
+    '''Returns the contention statistics of the lock of the data location:
+    the times it has been taken, the times it was held by another process,
+    and the total and maximum seconds waited for it'''
+
+    try:
+        with open(os.path.join(data_location, STATS_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {
+            'acquisitions': 0,
+            'contended': 0,
+            'wait_total': 0,
+            'wait_max': 0,
+        }
+
+
+class RecurrenceLock():
+    '''Advisory lock of the recurrence work of a data location, so two hooks,
+    or a hook and a repair script, don't read the same parent and both
+    create its next child.
+
+    It's a flock of the recurrence.lock file of the data location, released
+    by the kernel if the process dies. It's reentrant within a process, and
+    each acquisition is counted in the statistics returned by load_stats'''
+
+    def __init__(self, data_location):
+        self.data_location = data_location
+        self.path = os.path.join(data_location, LOCK_FILE)
+        self._file = None
+
+    @contextlib.contextmanager
+    def hold(self, deadline=None):
+        '''Holds the lock in the with block. If the lock is held by another
+        process it waits for it, raising BudgetExceeded if deadline is
+        reached first'''
+
+        if self._file is not None:
+            yield
+            return
+
+        wait = self._acquire(deadline)
+        try:
+            yield
+        finally:
+            try:
+                self._record(wait)
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+                self._file.close()
+                self._file = None
+
+    def _acquire(self, deadline):
+        '''Takes the lock and returns the seconds waited for it, or None if it
+        wasn't held by another process'''
+
+        self._file = open(self.path, 'a')
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return None
+        except BlockingIOError:
+            pass
+
+        start = time.monotonic()
+        if deadline is None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            return time.monotonic() - start
+
+        while True:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return time.monotonic() - start
+            except BlockingIOError:
+                if time.time() > deadline:
+                    self._file.close()
+                    self._file = None
+                    raise BudgetExceeded()
+                time.sleep(POLL_INTERVAL)
+
+    def _record(self, wait):
+        '''Adds the acquisition to the statistics, which are written while
+        holding the lock so they aren't updated concurrently'''
+
+        stats = load_stats(self.data_location)
+        stats['acquisitions'] += 1
+        if wait is not None:
+            stats['contended'] += 1
+            stats['wait_total'] += wait
+            stats['wait_max'] = max(stats['wait_max'], wait)
+
+        path = os.path.join(self.data_location, STATS_FILE)
+        temp_path = path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(stats, f)
+            os.replace(temp_path, path)
+        except OSError:
+            # The statistics mustn't break the hooks
+            pass
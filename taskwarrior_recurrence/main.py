@@ -1,19 +1,170 @@
 #!/usr/bin/env python
 
-import tzlocal
+import json
+import uuid
 import tasklib
 import datetime
-from tasklib.task import Task
-from tasklib.backends import TaskWarriorException
+import contextlib
+
+try:
+    from busday import is_business_period, load_calendar
+    from clock import Clock
+    from datafile import scan_children, data_location
+    from deferred import check_deadline
+    from index import epoch
+    from plan import RecurrencePlan, TaskExecutor, import_tasks
+    from exdates import parse_exdates, is_excluded
+except ImportError:
+    from .busday import is_business_period, load_calendar
+    from .clock import Clock
+    from .datafile import scan_children, data_location
+    from .deferred import check_deadline
+    from .index import epoch
+    from .plan import RecurrencePlan, TaskExecutor, import_tasks
+    from .exdates import parse_exdates, is_excluded
+
+DATE_FORMAT = '%Y%m%dT%H%M%SZ'
+OFFSET_FIELDS = [('rwait', 'rwaitoffset'), ('rscheduled', 'rscheduledoffset')]
+SPEC_FIELDS = [
+    'status',
+    'rtype',
+    'r',
+    'due',
+    'rwaitoffset',
+    'rscheduledoffset',
+    'rexcept',
+    'rahead',
+    'runtil',
+    'modified',
+]
+SPEC_DATE_FIELDS = ['due']
+SPEC_OFFSET_FIELDS = ['rwaitoffset', 'rscheduledoffset']
+# Fields of the parent that only make sense on it, and reach the children
+# through their rspec
+PARENT_FIELDS = ['rexcept', 'rahead', 'runtil']
+# Fields of a child that belong to its own occurrence, and mustn't reach the
+# next child when it's copied from it
+INSTANCE_FIELDS = [
+    'start',
+    'wait',
+    'scheduled',
+    'annotations',
+    'depends',
+    'rexpiry',
+]
+# Fields of a parent that aren't copied to its living children when it
+# changes: the ones set by taskwarrior, the recurrence ones, which reach them
+# through their rspec, and the ones of each occurrence
+NON_TEMPLATE_FIELDS = [
+    'uuid',
+    'entry',
+    'modified',
+    'mask',
+    'id',
+    'urgency',
+    'status',
+    'due',
+    'end',
+    'recur',
+    'rtype',
+    'rparent',
+    'rspec',
+    'rlastinstance',
+    'rwait',
+    'rscheduled',
+] + [offset_field for _, offset_field in OFFSET_FIELDS] + \
+    PARENT_FIELDS + INSTANCE_FIELDS
+
+
+def occurrence_key(due):
+    '''Returns the string that identifies an occurrence due at due'''
+
+    if isinstance(due, datetime.datetime):
+        return due.astimezone(datetime.timezone.utc).strftime(DATE_FORMAT)
+    return str(due)
+
+
+def child_uuid(parent_uuid, occurrence):
+    '''Returns the uuid of the child of parent_uuid for the occurrence.
+
+    The uuid is deterministic so the same occurrence created on two synced
+    machines has the same uuid and is merged instead of duplicated'''
+
+    return str(uuid.uuid5(uuid.UUID(parent_uuid), occurrence))
+
+
+def encode_spec(task):
+    '''Encodes the recurrence fields of a parent task in the string stored in
+    the rspec attribute of its children'''
+
+    return ';'.join(
+        '' if task[field] is None else occurrence_key(task[field])
+        for field in SPEC_FIELDS
+    )
+
+
+class ParentSpec():
+    '''Recurrence fields of a parent task decoded from the rspec attribute of
+    one of its children, so the parent doesn't need to be queried'''
+
+    def __init__(self, parent_uuid, spec, local_zone):
+        self._data = {'uuid': parent_uuid, 'rspec': spec}
+        for field, value in zip(SPEC_FIELDS, spec.split(';')):
+            if value == '':
+                value = None
+            elif field in SPEC_DATE_FIELDS:
+                try:
+                    value = datetime.datetime.strptime(value, DATE_FORMAT)
+                    value = value.replace(
+                        tzinfo=datetime.timezone.utc
+                    ).astimezone(local_zone)
+                except ValueError:
+                    pass
+            elif field in SPEC_OFFSET_FIELDS:
+                value = int(value)
+            self._data[field] = value
 
+    def __getitem__(self, key):
+        return self._data.get(key)
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
 
-class ProcessRecurrentTask():
-    '''Process an incoming recurrent task'''
 
-    def __init__(self, task):
+class ProcessRecurrentTask():
+    '''Process an incoming recurrent task.
+
+    The plan_* methods decide the changes to do and store them in a
+    RecurrencePlan, and the rest of the methods apply them with the
+    executor, by default a TaskExecutor.
+
+    The current time and the local zone are taken from clock, by default a
+    Clock of the local zone of the process'''
+
+    def __init__(
+        self,
+        task,
+        deadline=None,
+        index=None,
+        executor=None,
+        lock=None,
+        clock=None,
+    ):
         self.task = task
         self.tw = task.backend
-        self.local_zone = tzlocal.get_localzone()
+        if clock is None:
+            clock = Clock()
+        self.clock = clock
+        self.local_zone = clock.zone
+        self.deadline = deadline
+        self.index = index
+        if executor is None:
+            executor = TaskExecutor(self.tw, index)
+        self.executor = executor
+        self.lock = lock
+        self._parent = None
+        self._occurrences = None
+        self._expiry = None
 
     def add_recurrent_task(self):
         '''Creates a new chained task and it's child it works both
@@ -23,104 +174,193 @@ class ProcessRecurrentTask():
             print('You need to specify the r and due parameters')
             raise KeyError('You need to specify the r and due parameters')
 
-        child_task = self._copy_task(pop=['rtype'])
+        self.task['status'] = "recurring"
+        self._update_offsets(self.task)
+
+        plan = RecurrencePlan()
+        child_task = self._copy_task(pop=['rtype'] + PARENT_FIELDS)
         child_task['rparent'] = self.task['uuid']
-        child_task.save()
+        child_task['rspec'] = encode_spec(self.task)
+        self._set_expiry(child_task, self.task)
+        self._plan_child(
+            plan,
+            child_task,
+            child_uuid(self.task['uuid'], occurrence_key(self.task['due'])),
+        )
+        last_instance = child_task['uuid']
+
+        # Fill the lookahead window at once. The parent is new, so none of
+        # its occurrences exist yet
+        if self.task['rtype'] == 'periodic' and \
+                self.task['rahead'] is not None and \
+                self.task['due'] <= self._horizon(self.task):
+            last_instance = self._plan_occurrences(
+                plan,
+                self.task,
+                child_task,
+                after=self.task['due'],
+                check=False,
+            )
+        self.executor.execute(plan)
 
         # Setup the recur type to r to hide the parent task under recurrence
         # tasks
         self.task['recur'] = self.task['r']
-        self.task['rlastinstance'] = child_task['uuid']
-        self.task['status'] = "recurring"
+        self.task['rlastinstance'] = last_instance
         return self.task
 
     def delete_child_task(self):
-        '''Deletes an existing child tasks'''
-        child_task = self.tw.tasks.get(uuid=self.task['rlastinstance'])
-        child_task.delete()
+        '''Deletes the pending and waiting children of the parent self.task,
+        all the lookahead window and not only its rlastinstance'''
+
+        plan = RecurrencePlan()
+        for task_uuid in self._live_children(self.task['uuid']):
+            plan.delete_task(task_uuid)
+        self.executor.execute(plan)
+
+    def propagate_spec(self):
+        '''Updates the living children of the parent self.task so they
+        reflect it, and its rwait and rscheduled offsets if they've changed.
+
+        The rspec of the children is set to its current recurrence fields,
+        and the rest of its fields, like the description, project or tags,
+        are copied to them, as the next child is copied from its
+        predecessor when the parent isn't queried. The children are replaced
+        with a single `task import` without hooks'''
+
+        changed_offsets = self._update_offsets(self.task, force=True)
+        if changed_offsets:
+            self.tw.execute_command(
+                [self.task['uuid'], 'modify'] + [
+                    '{}:{}'.format(field, '' if value is None else value)
+                    for field, value in sorted(changed_offsets.items())
+                ],
+                config_override={'hooks': 'off'},
+            )
+
+        template = {
+            field: value
+            for field, value in json.loads(self.task.export_data()).items()
+            if field not in NON_TEMPLATE_FIELDS
+        }
+        tasks = []
+        for child_task in self.tw.tasks.filter(
+            '( rparent:{} and ( status:pending or status:waiting ) )'
+            .format(self.task['uuid'])
+        ):
+            child_data = json.loads(child_task.export_data())
+            data = {
+                field: value
+                for field, value in child_data.items()
+                if field in NON_TEMPLATE_FIELDS
+            }
+            data.update(template)
+            data['rspec'] = encode_spec(self.task)
+            tasks.append(data)
+        if tasks:
+            import_tasks(self.tw, tasks, self.index)
 
     def synthetize_next_child(self):
-        '''Creates the next child task'''
+        '''Creates the next child task.
 
-        parent_task = self.tw.tasks.get(uuid=self.task['rparent'])
+        It raises BudgetExceeded if the deadline is reached before the work is
+        done, after applying the changes planned till then'''
 
-        if parent_task['rtype'] == 'chained':
-            self.synthetize_next_chained()
-        elif parent_task['rtype'] == 'periodic':
-            self.synthetize_next_periodic()
+        self._execute(self.plan_next_child)
 
     def synthetize_next_chained(self):
         '''Creates the next chained task and updates the parent task'''
 
-        parent_task = self.tw.tasks.get(uuid=self.task['rparent'])
+        self._execute(self.plan_next_chained)
 
-        if type(parent_task['rwait']) is str:
-            parent_task['rwait'] = self.tw.convert_datetime_string(
-                parent_task['rwait']
-            )
-        if type(parent_task['rscheduled']) is str:
-            parent_task['rscheduled'] = self.tw.convert_datetime_string(
-                parent_task['rscheduled']
-            )
+    def synthetize_next_periodic(self):
+        '''Creates the next periodic task and updates the parent task'''
+
+        self._execute(self.plan_next_periodic)
+
+    def plan_next_child(self, plan=None):
+        '''Plans the creation of the next child task and returns the plan.
+
+        The changes are added to plan if it's given, so the plans of many
+        tasks can be merged. It raises BudgetExceeded if the deadline is
+        reached'''
+
+        if plan is None:
+            plan = RecurrencePlan()
+
+        check_deadline(self.deadline)
+        parent_task = self._get_parent()
+
+        if parent_task['rtype'] == 'chained':
+            self.plan_next_chained(plan)
+        elif parent_task['rtype'] == 'periodic':
+            self.plan_next_periodic(plan)
+        return plan
+
+    def plan_next_chained(self, plan=None):
+        '''Plans the next chained task and the update of the parent task'''
+
+        if plan is None:
+            plan = RecurrencePlan()
+
+        parent_task = self._get_parent()
+        self._update_offsets(parent_task)
 
         if parent_task['status'] == 'deleted' or \
                 parent_task['status'] == 'completed':
-            return
+            return plan
+
+        # The successor of a chained child is identified by its predecessor, as
+        # its due depends on when the predecessor was completed. If it exists
+        # the completion was already processed, by a racing hook or a repair
+        next_task_uuid = child_uuid(
+            parent_task['uuid'],
+            'after:' + self.task['uuid'],
+        )
+        if self._task_exists(next_task_uuid):
+            return plan
 
-        next_task = self._copy_task(
-            pop=['due', 'recur', 'rlastinstance', 'status', 'end'],
-            task=parent_task,
+        next_task = self._copy_template(
+            pop=['due', 'recur', 'rlastinstance', 'status', 'end'] +
+            PARENT_FIELDS,
+            parent_task=parent_task,
         )
 
         next_task['r'] = parent_task['r']
         next_task['rparent'] = parent_task['uuid']
-        next_task['due'] = '{} + {}'.format(
-            self.task['end'].isoformat(),
-            next_task['r'],
-        )
-        if parent_task['rwait'] is not None:
-            next_task['wait'] = '{} - ({} - {})'.format(
-                    next_task['due'].isoformat(),
-                    parent_task['due'].isoformat(),
-                    parent_task['rwait'].isoformat(),
+        next_task['rspec'] = encode_spec(parent_task)
+        if is_business_period(parent_task['r']):
+            next_task['due'] = self._business_due(
+                self.task['end'],
+                parent_task['r'],
+                1,
             )
-        if parent_task['rscheduled'] is not None:
-            next_task['scheduled'] = '{} - ({} - {})'.format(
-                    next_task['due'].isoformat(),
-                    parent_task['due'].isoformat(),
-                    parent_task['rscheduled'].isoformat(),
+        else:
+            next_task['due'] = '{} + {}'.format(
+                self.task['end'].isoformat(),
+                next_task['r'],
             )
+        self._shift_dates(next_task, parent_task)
+        self._plan_child(plan, next_task, next_task_uuid)
 
-        try:
-            next_task.save()
-        except TaskWarriorException:
-            # This ugly fix is needed because when the new task is created
-            # as the data is not refreshed it tries to query an id that doesn't
-            # exist so we have to query for the previous
-            next_task._data['id'] -= 1
-            next_task.refresh()
+        self._plan_last_instance(plan, parent_task, next_task['uuid'])
+        return plan
 
-        parent_task['rlastinstance'] = next_task['uuid']
+    def plan_next_periodic(self, plan=None):
+        '''Plans the periodic tasks till the next one from now and the update
+        of the parent task'''
 
-        parent_task.save()
+        if plan is None:
+            plan = RecurrencePlan()
 
-    def synthetize_next_periodic(self):
-        '''Creates the next periodic task and updates the parent task'''
+        parent_task = self._get_parent()
+        self._update_offsets(parent_task)
 
-        parent_task = self.tw.tasks.get(uuid=self.task['rparent'])
-        if type(parent_task['rwait']) is str:
-            parent_task['rwait'] = self.tw.convert_datetime_string(
-                parent_task['rwait']
-            )
-        if type(parent_task['rscheduled']) is str:
-            parent_task['rscheduled'] = self.tw.convert_datetime_string(
-                parent_task['rscheduled']
-            )
         if parent_task['status'] == 'deleted' or \
                 parent_task['status'] == 'completed':
-            return
+            return plan
 
-        next_task_template = self._copy_task(
+        next_task_template = self._copy_template(
             pop=[
                 'due',
                 'recur',
@@ -129,64 +369,393 @@ class ProcessRecurrentTask():
                 'rscheduled',
                 'status',
                 'end',
-            ],
-            task=parent_task,
+            ] + PARENT_FIELDS,
+            parent_task=parent_task,
         )
 
         next_task_template['r'] = parent_task['r']
         next_task_template['rparent'] = parent_task['uuid']
+        next_task_template['rspec'] = encode_spec(parent_task)
+
+        # Without index the existing occurrences are loaded at once if the
+        # data files can be scanned, or with a single query if a lookahead
+        # window means checking many of them
+        if self.index is None or self.index.stale:
+            self._occurrences = self._load_occurrences(
+                parent_task,
+                query=parent_task['rahead'] is not None,
+            )
 
-        iteration = 1
+        last_instance = self._plan_occurrences(
+            plan,
+            parent_task,
+            next_task_template,
+            after=self.task['due'],
+        )
+        self._plan_last_instance(plan, parent_task, last_instance)
+        return plan
+
+    def _plan_occurrences(self, plan, parent_task, template, after,
+                          check=True):
+        '''Plans the occurrences of the periodic parent_task due after the
+        date after till the first one past the horizon, skipping the
+        excluded and the already expired ones and, if check is True, the
+        existing ones. Returns the uuid of the last occurrence'''
+
+        exdates = parse_exdates(parent_task['rexcept'])
+        now = self.clock.now()
+        horizon = self._horizon(parent_task, now)
+
+        iteration = self._first_iteration(parent_task, after)
         next_task = self._copy_task(
             pop=['due', 'recur', 'rlastinstance', 'status', 'end'],
-            task=next_task_template
+            task=template
         )
 
         while True:
-            next_task['due'] = '{} + {}*{}'.format(
-                parent_task['due'].isoformat(),
-                parent_task['r'],
-                iteration,
-            )
-            if next_task['due'] > self.task['due']:
-                try:
-                    self.tw.tasks.get(
-                        rparent=self.task['rparent'],
-                        due=next_task['due'].isoformat(),
+            next_task['due'] = self._occurrence_due(parent_task, iteration)
+            if next_task['due'] > after and \
+                    not is_excluded(exdates, next_task['due']):
+                occurrence = occurrence_key(next_task['due'])
+                next_task_uuid = child_uuid(parent_task['uuid'], occurrence)
+                existing_uuid = None
+                if check:
+                    existing_uuid = self._occurrence_exists(
+                        next_task_uuid,
+                        occurrence,
                     )
-                except Task.DoesNotExist:
-                    if parent_task['rwait'] is not None:
-                        next_task['wait'] = '{} - ({} - {})'.format(
-                                next_task['due'].isoformat(),
-                                parent_task['due'].isoformat(),
-                                parent_task['rwait'].isoformat(),
-                        )
-                    if parent_task['rscheduled'] is not None:
-                        next_task['scheduled'] = '{} - ({} - {})'.format(
-                                next_task['due'].isoformat(),
-                                parent_task['due'].isoformat(),
-                                parent_task['rscheduled'].isoformat(),
-                        )
-                    next_task.save()
-                if next_task['due'] > self.local_zone.localize(
-                    datetime.datetime.now()
-                ):
+                if existing_uuid is None:
+                    self._shift_dates(next_task, parent_task)
+                    if next_task['rexpiry'] is None or \
+                            next_task['rexpiry'] > occurrence_key(now):
+                        self._plan_child(plan, next_task, next_task_uuid)
+                    else:
+                        next_task._data['uuid'] = next_task_uuid
+                else:
+                    # A legacy child found by its due keeps its own uuid
+                    next_task._data['uuid'] = existing_uuid
+                if next_task['due'] > horizon:
                     break
-                next_task = self._copy_task(task=next_task_template)
+                check_deadline(self.deadline)
+                next_task = self._copy_task(task=template)
 
             iteration += 1
 
-        # try:
-        # next_task.save()
-        # except TaskWarriorException:
-        #     # This ugly fix is needed because when the new task is created
-        #    # as the data is not refreshed it tries to query an id that doesn't
-        #     # exist so we have to query for the previous
-        #     next_task._data['id'] -= 1
-        #     next_task.refresh()
-
-        parent_task['rlastinstance'] = next_task['uuid']
-        parent_task.save()
+        return next_task['uuid']
+
+    def _occurrence_due(self, parent_task, iteration):
+        '''Returns the due of the occurrence number iteration of the periodic
+        parent_task'''
+
+        if is_business_period(parent_task['r']):
+            return self._business_due(
+                parent_task['due'],
+                parent_task['r'],
+                iteration,
+            )
+        return self.tw.convert_datetime_string('{} + {}*{}'.format(
+            parent_task['due'].isoformat(),
+            parent_task['r'],
+            iteration,
+        ))
+
+    def _first_iteration(self, parent_task, after):
+        '''Returns the number of an occurrence of the periodic parent_task due
+        close to the date after but not past it, or 1, so the occurrences
+        before it aren't computed again on each completion.
+
+        The business periods are counted. The rest are estimated with the
+        length of the first period, and the estimate is moved back while
+        it's due after the date after, as the periods of months and years
+        have different lengths'''
+
+        if after <= parent_task['due']:
+            return 1
+
+        if is_business_period(parent_task['r']):
+            iteration = load_calendar(self.tw.config).iteration(
+                parent_task['due'],
+                parent_task['r'],
+                after,
+                self.local_zone,
+            )
+            return max(iteration or 1, 1)
+
+        period = self._occurrence_due(parent_task, 1) - parent_task['due']
+        if period <= datetime.timedelta(0):
+            return 1
+        iteration = max(int((after - parent_task['due']) / period), 1)
+        while iteration > 1 and \
+                self._occurrence_due(parent_task, iteration) > after:
+            iteration -= 1
+        return iteration
+
+    def _horizon(self, parent_task, now=None):
+        '''Returns the date till which the occurrences of the periodic
+        parent_task are created: now, or now plus its rahead lookahead
+        window'''
+
+        if now is None:
+            now = self.clock.now()
+        if parent_task['rahead'] is None:
+            return now
+        return self.tw.convert_datetime_string(
+            '{} + {}'.format(now.isoformat(), parent_task['rahead'])
+        )
+
+    def _load_occurrences(self, parent_task, query=True):
+        '''Returns the uuids of the children of parent_task due after
+        self.task, and a dictionary with the uuid of each occurrence key.
+
+        They are read from the data files if they can be scanned. Otherwise
+        they are queried if query is True, or None is returned'''
+
+        after = occurrence_key(self.task['due'])
+        children = scan_children(
+            data_location(self.tw),
+            parent_task['uuid'],
+            fields=['uuid', 'due'],
+        )
+        if children is not None:
+            children = [
+                task for task in children if task.get('due', '') > after
+            ]
+            return (
+                {task['uuid'] for task in children},
+                {task['due']: task['uuid'] for task in children},
+            )
+        if not query:
+            return None
+
+        children = self.tw.tasks.filter(
+            '( rparent:{} and due.after:{} )'.format(
+                parent_task['uuid'],
+                after,
+            )
+        )
+        return (
+            {task['uuid'] for task in children},
+            {occurrence_key(task['due']): task['uuid'] for task in children},
+        )
+
+    def _execute(self, plan_method):
+        '''Applies the changes planned by plan_method, even the ones planned
+        before it raised BudgetExceeded.
+
+        The planning reads the existing children, so it's done holding the
+        lock till the changes are applied. As the uuids of the children are
+        deterministic, a change planned again after waiting for the lock
+        finds its child and isn't applied twice'''
+
+        if self.lock is None:
+            lock = contextlib.nullcontext()
+        else:
+            lock = self.lock.hold(self.deadline)
+
+        with lock:
+            plan = RecurrencePlan()
+            try:
+                plan_method(plan)
+            finally:
+                self.executor.execute(plan)
+
+    def _business_due(self, due, r, iteration):
+        '''Returns the date iteration business periods r after due. `task
+        calc` doesn't understand them, so they're computed here with the
+        calendar configured in the taskrc'''
+
+        return load_calendar(self.tw.config).advance(
+            due,
+            r,
+            iteration,
+            self.local_zone,
+        )
+
+    def _update_offsets(self, task, force=False):
+        '''Stores in the rwaitoffset and rscheduledoffset of the parent task
+        the seconds between its due and its rwait and rscheduled, so the
+        dates of the children can be computed without calling taskwarrior.
+
+        The offsets are only computed if they're missing, unless force is
+        True. It returns a dictionary with the offsets that changed'''
+
+        changed_offsets = {}
+        for field, offset_field in OFFSET_FIELDS:
+            if task[offset_field] is not None and not force:
+                continue
+
+            value = task[field]
+            if value is None:
+                offset = None
+            else:
+                if isinstance(value, str):
+                    value = self.tw.convert_datetime_string(value)
+                offset = int((task['due'] - value).total_seconds())
+
+            if offset != task[offset_field]:
+                task[offset_field] = offset
+                changed_offsets[offset_field] = offset
+        return changed_offsets
+
+    def _shift_dates(self, next_task, parent_task):
+        '''Sets the wait and scheduled of next_task keeping the distance to
+        its due that rwait and rscheduled have with the due of the parent'''
+
+        if parent_task['rwaitoffset'] is not None:
+            next_task['wait'] = next_task['due'] - datetime.timedelta(
+                seconds=parent_task['rwaitoffset']
+            )
+        if parent_task['rscheduledoffset'] is not None:
+            next_task['scheduled'] = next_task['due'] - datetime.timedelta(
+                seconds=parent_task['rscheduledoffset']
+            )
+        self._set_expiry(next_task, parent_task)
+
+    def _set_expiry(self, task, parent_task):
+        '''Stamps on the child task the absolute date after which it expires,
+        the runtil duration of the parent after its due. tasklib doesn't
+        convert the dates of the UDAs, so it's stored as an export string'''
+
+        if parent_task['runtil'] is not None:
+            task['rexpiry'] = occurrence_key(
+                task['due'] + self._expiry_delta(parent_task)
+            )
+
+    def _expiry_delta(self, parent_task):
+        '''Returns the runtil duration of parent_task as a timedelta.
+
+        As the offsets, it's computed once with taskwarrior from the due of
+        the parent, and then added to the due of each child without calling
+        it'''
+
+        runtil = parent_task['runtil']
+        if self._expiry is None or self._expiry[0] != runtil:
+            due = parent_task['due']
+            self._expiry = (
+                runtil,
+                self.tw.convert_datetime_string(
+                    '{} + {}'.format(due.isoformat(), runtil)
+                ) - due,
+            )
+        return self._expiry[1]
+
+    def _get_parent(self):
+        '''Returns the parent of self.task.
+
+        If the child carries an up to date rspec of its parent it's decoded
+        from there, otherwise the parent is queried'''
+
+        if self._parent is None:
+            if self.task['rspec'] is not None:
+                parent_spec = ParentSpec(
+                    self.task['rparent'],
+                    self.task['rspec'],
+                    self.local_zone,
+                )
+                if self._spec_is_current(parent_spec):
+                    self._parent = parent_spec
+            if self._parent is None:
+                self._parent = self.tw.tasks.get(uuid=self.task['rparent'])
+        return self._parent
+
+    def _spec_is_current(self, parent_spec):
+        '''Checks if the rspec of self.task reflects its parent.
+
+        The hooks store the modified of the parent both in the rspec of its
+        children and in the index, so a fresh index tells if the parent
+        changed since. A stale one means it may have changed without the
+        hooks, for example on an undo, import or sync. Without index the
+        rspec is trusted'''
+
+        if self.index is None:
+            return True
+        if self.index.stale:
+            return False
+        return self.index.parent_modified(parent_spec['uuid']) == \
+            epoch(parent_spec['modified'])
+
+    def _copy_template(self, pop, parent_task):
+        '''Copies the task the next child is based on.
+
+        If the parent wasn't queried, the next child is a copy of self.task
+        without the attributes of its occurrence. propagate_spec keeps the
+        rest of them equal to the ones of the parent'''
+
+        if isinstance(parent_task, ParentSpec):
+            return self._copy_task(pop=pop + INSTANCE_FIELDS)
+        return self._copy_task(pop=pop, task=parent_task)
+
+    def _plan_last_instance(self, plan, parent_task, task_uuid):
+        '''Plans pointing the rlastinstance of the parent to task_uuid'''
+
+        parent_task['rlastinstance'] = task_uuid
+        plan.update_task(parent_task['uuid'], {'rlastinstance': task_uuid})
+
+    def _occurrence_exists(self, task_uuid, occurrence):
+        '''Returns the uuid of the child of the parent of self.task for the
+        occurrence, or None if it doesn't exist.
+
+        Children created before the uuids were deterministic are found by
+        their rparent and due, and their own uuid is returned'''
+
+        if self._occurrences is not None:
+            task_uuids, occurrences = self._occurrences
+            if task_uuid in task_uuids:
+                return task_uuid
+            return occurrences.get(occurrence)
+
+        if self.index is not None and not self.index.stale:
+            return self.index.occurrence_exists(
+                self.task['rparent'],
+                task_uuid,
+                occurrence,
+            )
+
+        task_uuids = [
+            task['uuid']
+            for task in self.tw.tasks.filter(
+                '( uuid:{} or ( rparent:{} and due:{} ) )'.format(
+                    task_uuid,
+                    self.task['rparent'],
+                    occurrence,
+                )
+            )
+        ]
+        if task_uuid in task_uuids:
+            return task_uuid
+        if task_uuids:
+            return task_uuids[0]
+        return None
+
+    def _live_children(self, parent_uuid):
+        '''Returns the uuids of the pending and waiting children of the
+        parent'''
+
+        if self.index is not None and not self.index.stale:
+            return self.index.children(
+                parent_uuid,
+                status=['pending', 'waiting'],
+            )
+        return [
+            task['uuid']
+            for task in self.tw.tasks.filter(
+                '( rparent:{} and ( status:pending or status:waiting ) )'
+                .format(parent_uuid)
+            )
+        ]
+
+    def _task_exists(self, task_uuid):
+        if self.index is not None and not self.index.stale:
+            return self.index.exists(task_uuid)
+        return len(self.tw.tasks.filter(uuid=task_uuid)) > 0
+
+    def _plan_child(self, plan, task, task_uuid):
+        '''Plans the creation of the task with the uuid task_uuid'''
+
+        task._data['uuid'] = task_uuid
+        data = json.loads(task.export_data())
+        data['status'] = 'pending'
+        plan.create_task(data)
 
     def _copy_task(self, pop=[], task=None):
         '''Copies the self.task stripping unneeded information and returns the
@@ -0,0 +1,471 @@
+#!/usr/bin/env python
+
+import io
+import re
+import json
+import uuid
+import datetime
+import tasklib
+from tasklib.backends import Backend, TaskWarriorException
+from tasklib.filters import TaskWarriorFilter
+from tasklib.serializing import local_zone
+from tasklib.task import TaskQuerySet
+
+DATE_FORMAT = '%Y%m%dT%H%M%SZ'
+DATE_FIELDS = [
+    'due',
+    'wait',
+    'scheduled',
+    'until',
+    'entry',
+    'end',
+    'start',
+    'modified',
+]
+COMMANDS = ['add', 'modify', 'delete', 'done', 'export', 'import', 'calc']
+COMMAND_VERBS = {
+    'modify': 'Modified',
+    'delete': 'Deleted',
+    'done': 'Completed',
+}
+# Taskwarrior adds months and years as a fixed number of days
+DURATION_UNITS = {
+    's': 1,
+    'sec': 1,
+    'secs': 1,
+    'seconds': 1,
+    'min': 60,
+    'mins': 60,
+    'minutes': 60,
+    'h': 3600,
+    'hrs': 3600,
+    'hours': 3600,
+    'd': 86400,
+    'day': 86400,
+    'days': 86400,
+    'w': 7 * 86400,
+    'wk': 7 * 86400,
+    'weeks': 7 * 86400,
+    'mo': 30 * 86400,
+    'months': 30 * 86400,
+    'q': 91 * 86400,
+    'y': 365 * 86400,
+    'years': 365 * 86400,
+}
+NAMED_DURATIONS = {
+    'daily': 86400,
+    'weekly': 7 * 86400,
+    'monthly': 30 * 86400,
+    'quarterly': 91 * 86400,
+    'yearly': 365 * 86400,
+}
+DURATION_REGEXP = re.compile(r'^(\d*)([a-z]+)$')
+
+
+def localize(naive):
+    '''Returns the naive datetime in the local zone'''
+
+    if hasattr(local_zone, 'localize'):
+        return local_zone.localize(naive)
+    return naive.replace(tzinfo=local_zone)
+
+
+def parse_duration(value):
+    '''Returns the seconds of a taskwarrior duration like 3d, 1w*4 or
+    weekly, or None if value isn't a duration'''
+
+    factor = 1
+    if '*' in value:
+        value, factor = value.split('*', 1)
+        try:
+            factor = int(factor)
+        except ValueError:
+            return None
+
+    if value in NAMED_DURATIONS:
+        return NAMED_DURATIONS[value] * factor
+
+    match = DURATION_REGEXP.match(value)
+    if match is None or match.group(2) not in DURATION_UNITS:
+        return None
+    amount = int(match.group(1) or 1)
+    return amount * DURATION_UNITS[match.group(2)] * factor
+
+
+def parse_date(value):
+    '''Returns the aware datetime of a taskwarrior date, or None if value
+    isn't a date'''
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if value == 'now':
+        return now
+    if value in ['today', 'tomorrow', 'yesterday']:
+        today = localize(datetime.datetime.combine(
+            now.astimezone(local_zone).date(),
+            datetime.time.min,
+        ))
+        offset = {'today': 0, 'tomorrow': 1, 'yesterday': -1}[value]
+        return today + datetime.timedelta(days=offset)
+
+    for date_format in ['%Y%m%dT%H%M%SZ', '%Y%m%dT%H%M%S']:
+        try:
+            date = datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+        if value.endswith('Z'):
+            return date.replace(tzinfo=datetime.timezone.utc)
+        return localize(date)
+
+    try:
+        date = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if date.tzinfo is None:
+        return localize(date)
+    return date
+
+
+def serialize_date(value):
+    return value.astimezone(datetime.timezone.utc).strftime(DATE_FORMAT)
+
+
+class InMemoryTaskWarrior(Backend):
+    '''tasklib backend that stores the tasks in memory instead of running the
+    `task` command, so the recurrence logic can be exercised fast in tests
+    and benchmarks.
+
+    It understands the subset of taskwarrior used by ProcessRecurrentTask:
+    the tasks queries, save and delete, the date expressions of `task calc`
+    and the import, modify, delete, done and export commands with filters
+    made of attribute:value terms, uuids, parenthesis, `and` and `or`. It
+    doesn't run hooks, and the functions that run `task` themselves, like
+    stream_export, can't use it'''
+
+    VERSION_2_4_0 = '2.4.0'
+    VERSION_2_4_1 = '2.4.1'
+    VERSION_2_4_2 = '2.4.2'
+    VERSION_2_4_3 = '2.4.3'
+    VERSION_2_4_4 = '2.4.4'
+    VERSION_2_4_5 = '2.4.5'
+
+    def __init__(self, tasks=None):
+        self.version = '2.5.1'
+        self.config = {}
+        self.overrides = {}
+        self.commands = []
+        self._tasks = {}
+        self.tasks = TaskQuerySet(self)
+        for data in tasks or []:
+            self._store(dict(data))
+
+    @property
+    def filter_class(self):
+        return TaskWarriorFilter
+
+    def load_task(self, data):
+        '''Returns a Task built from a hook payload, as Task.from_input does
+        when the hook reads its standard input'''
+
+        return tasklib.task.Task.from_input(
+            input_file=io.StringIO(json.dumps(data) + '\n'),
+            modify=False,
+            backend=self,
+        )
+
+    def add_recurrent_task(self, data, clock=None):
+        '''Simulates the `task add` of a recurrent task: the on-add hook
+        processes the data, creating the first children, and the returned
+        parent is stored. Returns the stored parent'''
+
+        try:
+            from main import ProcessRecurrentTask
+        except ImportError:
+            from .main import ProcessRecurrentTask
+
+        task = ProcessRecurrentTask(
+            self.load_task(data),
+            clock=clock,
+        ).add_recurrent_task()
+        data = self._store(json.loads(task.export_data()))
+        return self.tasks.get(uuid=data['uuid'])
+
+    def filter_tasks(self, filter_obj):
+        return [
+            self._task(data)
+            for data in self._filter(filter_obj.get_filter_params())
+        ]
+
+    def save_task(self, task):
+        if not task.saved:
+            task._data['uuid'] = str(uuid.uuid4())
+        data = json.loads(task.export_data())
+        self._store(data, self._tasks.get(data['uuid']))
+        task.refresh(after_save=True)
+
+    def delete_task(self, task):
+        self._set_status(self._tasks[task['uuid']], 'deleted')
+
+    def complete_task(self, task):
+        self._set_status(self._tasks[task['uuid']], 'completed')
+
+    def start_task(self, task):
+        self._tasks[task['uuid']]['start'] = serialize_date(parse_date('now'))
+
+    def stop_task(self, task):
+        self._tasks[task['uuid']].pop('start', None)
+
+    def refresh_task(self, task, after_save=False):
+        return dict(self._tasks[task['uuid']])
+
+    def annotate_task(self, task, annotation):
+        self._tasks[task['uuid']].setdefault('annotations', []).append({
+            'entry': serialize_date(parse_date('now')),
+            'description': annotation,
+        })
+
+    def denotate_task(self, task, annotation):
+        data = self._tasks[task['uuid']]
+        data['annotations'] = [
+            item
+            for item in data.get('annotations', [])
+            if item['description'] != annotation
+        ]
+
+    def sync(self):
+        pass
+
+    def convert_datetime_string(self, value):
+        '''Evaluates a `task calc` date expression, like
+        2018-08-08T01:00:00+02:00 + 1w*3'''
+
+        tokens = value.split()
+        result = None
+        sign = 1
+        for token in tokens:
+            if token in ['+', '-']:
+                sign = 1 if token == '+' else -1
+                continue
+            date = parse_date(token)
+            if date is not None and result is None:
+                result = date
+                continue
+            seconds = parse_duration(token)
+            if seconds is None or result is None:
+                raise TaskWarriorException(
+                    'Unsupported date expression: {}'.format(value)
+                )
+            result = result + sign * datetime.timedelta(seconds=seconds)
+
+        if result is None:
+            raise TaskWarriorException(
+                'Unsupported date expression: {}'.format(value)
+            )
+        return result.astimezone(local_zone)
+
+    def execute_command(self, args, config_override=None,
+                        allow_failure=True, return_all=False):
+        '''Runs the taskwarrior command args on the stored tasks and returns
+        its output lines. A filter without matches isn't an error here'''
+
+        args = [str(arg) for arg in args]
+        self.commands.append(args)
+
+        command_index = next(
+            (index for index, arg in enumerate(args) if arg in COMMANDS),
+            None,
+        )
+        if command_index is None:
+            raise TaskWarriorException(
+                'Unsupported command: {}'.format(' '.join(args))
+            )
+        command = args[command_index]
+        filter_args = args[:command_index]
+        modifications = args[command_index + 1:]
+
+        if command == 'calc':
+            return [
+                self.convert_datetime_string(' '.join(modifications))
+                .astimezone(local_zone)
+                .strftime('%Y-%m-%dT%H:%M:%S')
+            ]
+        if command == 'import':
+            return self._import(modifications[0])
+        if command == 'add':
+            data = {'description': ' '.join(
+                arg for arg in modifications if ':' not in arg
+            )}
+            data['uuid'] = str(uuid.uuid4())
+            self._store(self._modify(data, modifications))
+            return ['Created task {}.'.format(data['uuid'])]
+
+        tasks = self._filter(filter_args)
+        if command == 'export':
+            return [json.dumps(data) for data in tasks]
+        for data in tasks:
+            if command == 'modify':
+                self._store(self._modify(dict(data), modifications), data)
+            elif command == 'delete':
+                self._set_status(data, 'deleted')
+            elif command == 'done':
+                self._set_status(data, 'completed')
+        return ['{} {} tasks.'.format(COMMAND_VERBS[command], len(tasks))]
+
+    def _task(self, data):
+        task = tasklib.task.Task(self)
+        task._load_data(dict(data))
+        return task
+
+    def _store(self, data, previous=None):
+        '''Stores the task data filling the fields taskwarrior sets'''
+
+        now = serialize_date(parse_date('now'))
+        data.setdefault('uuid', str(uuid.uuid4()))
+        data.setdefault('entry', (previous or {}).get('entry', now))
+        data.setdefault('status', 'pending')
+        data['modified'] = now
+
+        wait = data.get('wait')
+        if data['status'] == 'pending' and wait is not None and wait > now:
+            data['status'] = 'waiting'
+        elif data['status'] == 'waiting' and (wait is None or wait <= now):
+            data['status'] = 'pending'
+
+        self._tasks[data['uuid']] = data
+        return data
+
+    def _set_status(self, data, status):
+        data['status'] = status
+        data['end'] = serialize_date(parse_date('now'))
+        data['modified'] = data['end']
+
+    def _import(self, path):
+        with open(path) as f:
+            content = f.read().strip()
+        if content.startswith('['):
+            tasks = json.loads(content)
+        else:
+            tasks = [json.loads(line) for line in content.splitlines() if line]
+        for data in tasks:
+            self._store(data, self._tasks.get(data.get('uuid')))
+        return ['Imported {} tasks.'.format(len(tasks))]
+
+    def _modify(self, data, modifications):
+        for modification in modifications:
+            if ':' not in modification:
+                continue
+            field, value = modification.split(':', 1)
+            value = _unquote(value)
+            if value == '':
+                data.pop(field, None)
+            elif field in DATE_FIELDS:
+                data[field] = serialize_date(
+                    self.convert_datetime_string(value)
+                )
+            else:
+                data[field] = value
+        return data
+
+    def _filter(self, filter_args):
+        '''Returns the stored tasks that match the filter arguments'''
+
+        tokens = []
+        for arg in filter_args:
+            tokens.extend(_tokenize(arg))
+        if not tokens:
+            return list(self._tasks.values())
+        if all(_is_uuid(token) for token in tokens):
+            # tasks.get(uuid=...) is the most common query
+            return [
+                self._tasks[token] for token in tokens if token in self._tasks
+            ]
+
+        matcher, position = self._parse_or(tokens, 0)
+        if position != len(tokens):
+            raise TaskWarriorException(
+                'Unsupported filter: {}'.format(' '.join(filter_args))
+            )
+        return [data for data in self._tasks.values() if matcher(data)]
+
+    def _parse_or(self, tokens, position):
+        matchers = []
+        matcher, position = self._parse_and(tokens, position)
+        matchers.append(matcher)
+        while position < len(tokens) and tokens[position] == 'or':
+            matcher, position = self._parse_and(tokens, position + 1)
+            matchers.append(matcher)
+        return (lambda data: any(m(data) for m in matchers)), position
+
+    def _parse_and(self, tokens, position):
+        matchers = []
+        uuids = []
+        while position < len(tokens) and tokens[position] not in ['or', ')']:
+            token = tokens[position]
+            if token == 'and':
+                position += 1
+                continue
+            if token == '(':
+                matcher, position = self._parse_or(tokens, position + 1)
+                if position >= len(tokens) or tokens[position] != ')':
+                    raise TaskWarriorException('Unbalanced parenthesis')
+                position += 1
+            elif ':' not in token and _is_uuid(token):
+                # Taskwarrior joins consecutive uuids with or
+                uuids.append(token)
+                position += 1
+                continue
+            else:
+                matcher = self._term(token)
+                position += 1
+            matchers.append(matcher)
+
+        if uuids:
+            matchers.append(lambda data: data.get('uuid') in uuids)
+        return (lambda data: all(m(data) for m in matchers)), position
+
+    def _term(self, token):
+        '''Returns the matcher of an attribute[.modifier]:value term'''
+
+        attribute, value = token.split(':', 1)
+        value = _unquote(value)
+        field, _, modifier = attribute.partition('.')
+        if value != '' and field in DATE_FIELDS:
+            value = serialize_date(self.convert_datetime_string(value))
+
+        def matcher(data):
+            current = data.get(field)
+            if modifier == 'any':
+                return current is not None
+            if modifier == 'none':
+                return current is None
+            if modifier == 'not':
+                return current != value
+            if modifier in ['after', 'above']:
+                return current is not None and current > value
+            if modifier in ['before', 'below']:
+                return current is not None and current < value
+            if modifier == 'has':
+                return current is not None and value in current
+            if value == '':
+                return current is None
+            return current == value
+        return matcher
+
+
+def _tokenize(arg):
+    '''Splits a filter argument in terms, keeping the quoted values'''
+
+    return re.findall(r"[()]|[^\s()']+(?:'[^']*')?", arg)
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '\'"':
+        return value[1:-1]
+    return value
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
@@ -6,8 +6,14 @@ import tasklib
 # I need this to import for the tests and for the final file
 try:
     from main import ProcessRecurrentTask
+    from clock import Clock
+    from backend import CachedTaskWarrior
+    from index import open_index
 except ImportError:
     from .main import ProcessRecurrentTask
+    from .clock import Clock
+    from .backend import CachedTaskWarrior
+    from .index import open_index
 
 
 def main():
@@ -15,24 +21,37 @@ def main():
     # Create the Taskwarrior backend till
     # [this](https://github.com/robgolding/tasklib/issues/58) bug is fixed
 
-    tw = tasklib.TaskWarrior(
+    data_location = sys.argv[5].split(':')[1]
+    tw = CachedTaskWarrior(
         taskrc_location=sys.argv[4].split(':')[1],
-        data_location=sys.argv[5].split(':')[1],
+        data_location=data_location,
     )
-    task = tasklib.task.Task.from_input(backend=tw)
+    # sys.stdin is passed explicitly as it's replaced while recording
+    task = tasklib.task.Task.from_input(input_file=sys.stdin, backend=tw)
 
     if task['r'] is None or task['rparent'] is not None:
         print(task.export_data())
         sys.exit(0)
 
-    prt = ProcessRecurrentTask(task)
+    index = open_index(data_location)
+    prt = ProcessRecurrentTask(
+        task,
+        index=index,
+        clock=Clock(data_location=data_location),
+    )
 
     if task['rtype'] == 'chained' or task['rtype'] == 'periodic':
         task = prt.add_recurrent_task()
+        if index is not None:
+            index.update(task)
 
     print(task.export_data())
     sys.exit(0)
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        from recording import run_hook
+    except ImportError:
+        from .recording import run_hook
+    run_hook('on_add', main)
@@ -1,47 +1,151 @@
 #!/usr/bin/python3
 # #!/usr/bin/env python
 
+import io
 import sys
-import tasklib
-try:
-    from main import ProcessRecurrentTask
-except ImportError:
-    from .main import ProcessRecurrentTask
+import time
+
+# The hook runs after every taskwarrior command, so tasklib and the
+# recurrence logic are only imported by load_dependencies once we know there
+# is recurrence work to do
+tasklib = None
+ProcessRecurrentTask = None
+CachedTaskWarrior = None
+deferred = None
+recurrence_index = None
+RecurrenceLock = None
+Clock = None
+
+# Commands that change the data without running the on-exit hook for each
+# modified task, so the recurrence index can't follow them
+STALE_COMMANDS = ['sync', 'undo', 'import', 'merge']
+
+
+def load_dependencies():
+    '''Imports the modules needed to process recurrent tasks'''
+
+    global tasklib, ProcessRecurrentTask, CachedTaskWarrior, deferred
+    global RecurrenceLock, Clock
+
+    if tasklib is None:
+        import tasklib
+    if ProcessRecurrentTask is None:
+        try:
+            from main import ProcessRecurrentTask
+        except ImportError:
+            from .main import ProcessRecurrentTask
+    if CachedTaskWarrior is None:
+        try:
+            from backend import CachedTaskWarrior
+        except ImportError:
+            from .backend import CachedTaskWarrior
+    if deferred is None:
+        try:
+            import deferred
+        except ImportError:
+            from . import deferred
+    if RecurrenceLock is None:
+        try:
+            from lock import RecurrenceLock
+        except ImportError:
+            from .lock import RecurrenceLock
+    if Clock is None:
+        try:
+            from clock import Clock
+        except ImportError:
+            from .clock import Clock
+    load_index()
+
+
+def load_index():
+    global recurrence_index
+
+    if recurrence_index is None:
+        try:
+            import index as recurrence_index
+        except ImportError:
+            from . import index as recurrence_index
 
 
 def main():
 
+    start = time.time()
+
     # Create the Taskwarrior backend till
     # [this](https://github.com/robgolding/tasklib/issues/58) bug is fixed
 
     task_command = sys.argv[3].split(':')[1].strip()
+    if task_command in STALE_COMMANDS:
+        load_index()
+        index = recurrence_index.open_index(sys.argv[5].split(':')[1])
+        if index is not None:
+            index.mark_stale()
+        sys.exit(0)
     if (
         task_command != 'delete' and
         task_command != 'done' and
-        True
+        task_command != 'modify' and
+        task_command != 'edit'
     ):
         sys.exit(0)
 
-    tw = tasklib.TaskWarrior(
+    # Taskwarrior exports the tasks without spaces, so a payload without "r":
+    # is either empty or doesn't hold a recurrent task
+    payload = sys.stdin.readline()
+    if '"r":' not in payload:
+        sys.exit(0)
+
+    load_dependencies()
+    deadline = deferred.hook_deadline(start)
+
+    data_location = sys.argv[5].split(':')[1]
+    tw = CachedTaskWarrior(
         taskrc_location=sys.argv[4].split(':')[1],
-        data_location=sys.argv[5].split(':')[1],
+        data_location=data_location,
+    )
+    task = tasklib.task.Task.from_input(
+        input_file=io.StringIO(payload),
+        backend=tw,
     )
-    task = tasklib.task.Task.from_input(backend=tw)
     task_command = sys.argv[3].split(':')[1].strip()
 
     if task['r'] is None:
         sys.exit(0)
 
-    prt = ProcessRecurrentTask(task)
+    index = recurrence_index.open_index(data_location)
+    if index is not None:
+        index.update(task)
+
+    lock = RecurrenceLock(data_location)
+    prt = ProcessRecurrentTask(
+        task,
+        deadline=deadline,
+        index=index,
+        lock=lock,
+        clock=Clock(data_location=data_location),
+    )
+    queue = deferred.DeferredQueue(data_location)
 
     if task['rlastinstance'] is not None:
+        # Keep the recurrence fields stored in the children up to date
+        prt.propagate_spec()
         if task_command == 'delete':
             prt.delete_child_task()
-    else:
-        prt.synthetize_next_child()
+    elif task_command == 'delete' or task_command == 'done':
+        try:
+            prt.synthetize_next_child()
+        except deferred.BudgetExceeded:
+            queue.push(task)
+
+    # Use the remaining budget to process the work deferred by previous runs
+    queue.drain(tw, deadline, index, lock)
 
     sys.exit(0)
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        from recording import run_hook
+    except ImportError:
+        from .recording import run_hook
+    run_hook('on_exit', main)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import tempfile
+
+
+class RecurrencePlan():
+    '''Changes decided by the recurrence synthesis, stored as plain data so
+    they can be merged, inspected or saved before an executor applies them.
+
+    * create: Data of the children to create, as accepted by `task import`.
+    * update: Fields to modify of existing tasks, by uuid.
+    * delete: Uuids of the tasks to delete.'''
+
+    def __init__(self, create=None, update=None, delete=None):
+        self.create = create or []
+        self.update = update or {}
+        self.delete = delete or []
+
+    def create_task(self, data):
+        self.create.append(data)
+
+    def update_task(self, task_uuid, fields):
+        self.update.setdefault(task_uuid, {}).update(fields)
+
+    def delete_task(self, task_uuid):
+        self.delete.append(task_uuid)
+
+    def merge(self, plan):
+        '''Adds the changes of plan to this one. The updates of plan win if
+        both modify the same field of a task'''
+
+        self.create.extend(plan.create)
+        for task_uuid, fields in plan.update.items():
+            self.update_task(task_uuid, fields)
+        self.delete.extend(plan.delete)
+        return self
+
+    def __len__(self):
+        return len(self.create) + len(self.update) + len(self.delete)
+
+    def to_dict(self):
+        return {
+            'create': self.create,
+            'update': self.update,
+            'delete': self.delete,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            create=data.get('create'),
+            update=data.get('update'),
+            delete=data.get('delete'),
+        )
+
+
+def load_plan(path):
+    '''Returns the plan stored by a PlanFileExecutor'''
+
+    with open(path) as f:
+        return RecurrencePlan.from_dict(json.load(f))
+
+
+def import_tasks(tw, tasks, index=None):
+    '''Imports the data of tasks with a single `task import` without hooks,
+    creating the missing tasks and replacing the existing ones, and updates
+    the index with them'''
+
+    with tempfile.NamedTemporaryFile(
+        'w',
+        suffix='.json',
+        delete=False,
+    ) as f:
+        f.write('\n'.join(json.dumps(data) for data in tasks))
+    try:
+        tw.execute_command(
+            ['import', f.name],
+            config_override={'hooks': 'off'},
+        )
+    finally:
+        os.remove(f.name)
+
+    if index is not None:
+        for data in tasks:
+            index.update(data)
+
+
+class TaskExecutor():
+    '''Applies a plan creating all its children with a single `task import`,
+    and running one taskwarrior command for each other change.
+
+    The children are imported, as `task add` can't set their uuid, and the
+    creations and updates run without hooks: the on-add
+    hook would pass the children through untouched and the on-exit hook
+    would mark the index stale, so the index is updated here instead. The
+    deletions keep the hooks so the on-exit hook processes them'''
+
+    def __init__(self, tw, index=None):
+        self.tw = tw
+        self.index = index
+
+    def execute(self, plan):
+        if plan.create:
+            self._import(plan.create)
+        self._update(plan)
+        self._delete(plan)
+
+    def _import(self, tasks):
+        import_tasks(self.tw, tasks, self.index)
+
+    def _update(self, plan):
+        for task_uuid, fields in plan.update.items():
+            self.tw.execute_command(
+                [task_uuid, 'modify'] + [
+                    '{}:{}'.format(field, '' if value is None else value)
+                    for field, value in sorted(fields.items())
+                ],
+                config_override={'hooks': 'off'},
+            )
+            if self.index is not None:
+                self.index.update_fields(task_uuid, fields)
+
+    def _delete(self, plan):
+        for task_uuid in plan.delete:
+            self.tw.execute_command([task_uuid, 'delete'])
+
+
+class ImportExecutor(TaskExecutor):
+    '''Applies a plan like TaskExecutor but deleting its tasks with a single
+    `task delete`, which pays off when the plans of many parents are
+    merged'''
+
+    def execute(self, plan):
+        if plan.create:
+            self._import(plan.create)
+        self._update(plan)
+        if plan.delete:
+            self.tw.execute_command(plan.delete + ['delete'])
+
+
+class DryRunExecutor():
+    '''Prints the changes of a plan instead of applying them'''
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+
+    def execute(self, plan):
+        for data in plan.create:
+            print(
+                'create {} due:{} {}'.format(
+                    data.get('uuid'),
+                    data.get('due'),
+                    data.get('description'),
+                ),
+                file=self.output,
+            )
+        for task_uuid, fields in plan.update.items():
+            print(
+                'update {} {}'.format(
+                    task_uuid,
+                    ' '.join(
+                        '{}:{}'.format(field, '' if value is None else value)
+                        for field, value in sorted(fields.items())
+                    ),
+                ),
+                file=self.output,
+            )
+        for task_uuid in plan.delete:
+            print('delete {}'.format(task_uuid), file=self.output)
+
+
+class PlanFileExecutor():
+    '''Stores the plan in a JSON file, merged with the plan already stored
+    there, so it can be reviewed and applied later with load_plan'''
+
+    def __init__(self, path):
+        self.path = path
+
+    def execute(self, plan):
+        if os.path.exists(self.path):
+            plan = load_plan(self.path).merge(plan)
+
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(plan.to_dict(), f, indent=2)
+        os.replace(temp_path, self.path)
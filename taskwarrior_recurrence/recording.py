@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+
+import io
+import os
+import sys
+import time
+
+# The hooks import this module on every run, so the modules only needed to
+# record or replay are imported by the functions that use them
+TRACE_VARIABLE = 'TASKWARRIOR_RECURRENCE_TRACE'
+HOOKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_hook(name, main):
+    '''Runs the main function of the hook name, recording the invocation in
+    the trace file set in the TASKWARRIOR_RECURRENCE_TRACE environmental
+    variable if there's one'''
+
+    path = os.environ.get(TRACE_VARIABLE)
+    if not path:
+        main()
+        return
+
+    payload = sys.stdin.read()
+    sys.stdin = io.StringIO(payload)
+    record = {
+        'hook': name,
+        'argv': sys.argv[1:],
+        'stdin': payload,
+        'start': time.time(),
+    }
+
+    start = time.perf_counter()
+    record['exit'] = 1
+    try:
+        main()
+        record['exit'] = 0
+    except SystemExit as error:
+        record['exit'] = error.code or 0
+        raise
+    finally:
+        record['duration'] = time.perf_counter() - start
+        write_record(path, record)
+
+
+def write_record(path, record):
+    '''Appends the record to the gzip compressed JSON lines trace file'''
+
+    import gzip
+    import json
+
+    try:
+        with gzip.open(path, 'at') as f:
+            f.write(json.dumps(record) + '\n')
+    except OSError:
+        # Recording mustn't break the hooks
+        pass
+
+
+def read_trace(path):
+    '''Yields the records of a trace file'''
+
+    import gzip
+    import json
+
+    with gzip.open(path, 'rt') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def percentile(values, fraction):
+    '''Returns the value below which the fraction of the sorted values lie'''
+
+    if not values:
+        return None
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def _override_argument(argument, overrides):
+    '''Replaces the value of the hook argument if it's in overrides'''
+
+    key = argument.split(':')[0]
+    if key in overrides:
+        return '{}:{}'.format(key, overrides[key])
+    return argument
+
+
+class Replayer():
+    '''Feeds the invocations of a trace to the current hooks against a copy
+    of a snapshot of the data location.
+
+    The `task` commands run by the hooks are counted with a wrapper placed
+    before the real binary in the PATH'''
+
+    def __init__(self, snapshot, taskrc=None):
+        self.snapshot = snapshot
+        self.taskrc = taskrc
+
+    def replay(self, records):
+        '''Replays the records in order and returns a result for each of
+        them'''
+
+        import shutil
+        import tempfile
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            data_location = os.path.join(temp_dir, 'data')
+            shutil.copytree(self.snapshot, data_location)
+            counter = os.path.join(temp_dir, 'task_calls')
+            environment = self._environment(temp_dir, counter)
+            overrides = {'data': data_location}
+            if self.taskrc is not None:
+                overrides['rc'] = self.taskrc
+
+            return [
+                self._replay_record(record, overrides, environment, counter)
+                for record in records
+            ]
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def _environment(self, temp_dir, counter):
+        '''Returns the environment of the replayed hooks, with the wrapper of
+        the `task` binary first in the PATH'''
+
+        import shutil
+
+        binary = shutil.which('task')
+        if binary is None:
+            raise OSError('The task command is needed to replay a trace')
+
+        bin_dir = os.path.join(temp_dir, 'bin')
+        os.mkdir(bin_dir)
+        wrapper = os.path.join(bin_dir, 'task')
+        with open(wrapper, 'w') as f:
+            f.write(
+                '#!/bin/sh\n'
+                'echo >> "{}"\n'
+                'exec "{}" "$@"\n'.format(counter, binary)
+            )
+        os.chmod(wrapper, 0o755)
+
+        environment = dict(os.environ)
+        environment.pop(TRACE_VARIABLE, None)
+        environment['PATH'] = bin_dir + os.pathsep + environment['PATH']
+        return environment
+
+    def _replay_record(self, record, overrides, environment, counter):
+        import subprocess
+
+        with open(counter, 'w'):
+            pass
+
+        command = [
+            sys.executable,
+            os.path.join(HOOKS_DIRECTORY, record['hook'] + '.py'),
+        ] + [
+            _override_argument(argument, overrides)
+            for argument in record['argv']
+        ]
+        start = time.perf_counter()
+        process = subprocess.run(
+            command,
+            input=record['stdin'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env=environment,
+            universal_newlines=True,
+        )
+        duration = time.perf_counter() - start
+
+        with open(counter) as f:
+            task_calls = len(f.read().splitlines())
+
+        return {
+            'hook': record['hook'],
+            'command': _command(record),
+            'recorded': record['duration'],
+            'replayed': duration,
+            'task_calls': task_calls,
+            'exit': process.returncode,
+            'recorded_exit': record['exit'],
+        }
+
+
+def _command(record):
+    for argument in record['argv']:
+        if argument.startswith('command:'):
+            return argument.split(':', 1)[1].strip()
+    return None
+
+
+def summarize(results):
+    '''Returns the latency and `task` calls distributions of the replayed
+    invocations of each hook'''
+
+    summary = {}
+    for hook in sorted({result['hook'] for result in results}):
+        hook_results = [
+            result for result in results if result['hook'] == hook
+        ]
+        summary[hook] = {'invocations': len(hook_results)}
+        for key in ['recorded', 'replayed', 'task_calls']:
+            values = sorted(result[key] for result in hook_results)
+            summary[hook][key] = {
+                'p50': percentile(values, 0.5),
+                'p90': percentile(values, 0.9),
+                'p99': percentile(values, 0.99),
+                'max': values[-1],
+                'total': sum(values),
+            }
+        summary[hook]['exit_mismatches'] = len([
+            result
+            for result in hook_results
+            if result['exit'] != result['recorded_exit']
+        ])
+    return summary
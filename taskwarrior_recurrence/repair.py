@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+
+import time
+import asyncio
+import tasklib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from tasklib.backends import TaskWarriorException
+
+try:
+    from export import parse_export_lines, uuid_chunks, RECURRENCE_FIELDS
+    from datafile import iter_children, data_location
+    from table import TaskTable
+    from main import ProcessRecurrentTask
+except ImportError:
+    from .export import parse_export_lines, uuid_chunks, RECURRENCE_FIELDS
+    from .datafile import iter_children, data_location
+    from .table import TaskTable
+    from .main import ProcessRecurrentTask
+
+DEFAULT_CONCURRENCY = 4
+# Longest `task export` line read, a task with many annotations may be longer
+# than the 64 KiB asyncio reads by default
+LINE_LIMIT = 2 ** 24
+
+
+async def stream_export_async(
+    tw,
+    filter_args,
+    semaphore,
+    fields=RECURRENCE_FIELDS,
+):
+    '''Yields the tasks matching filter_args as they are written by `task
+    export`, run as an asyncio subprocess once the semaphore is acquired.
+
+    As stream_export does, the output is read line by line, so the export is
+    never held in memory'''
+
+    command_args = tw._get_command_args(['export'] + filter_args)
+
+    with tempfile.TemporaryFile() as stderr:
+        async with semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *command_args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=stderr,
+                limit=LINE_LIMIT,
+            )
+            try:
+                while True:
+                    line = await process.stdout.readline()
+                    if not line:
+                        break
+                    for task in parse_export_lines([line], fields):
+                        yield task
+            except BaseException:
+                process.kill()
+                raise
+            finally:
+                await process.wait()
+
+        if process.returncode:
+            stderr.seek(0)
+            raise TaskWarriorException(
+                stderr.read().decode('utf-8').strip() +
+                '\nCommand used: ' + ' '.join(command_args)
+            )
+
+
+async def export_async(tw, filter_args, semaphore, fields=RECURRENCE_FIELDS):
+    '''Returns the list of tasks matching filter_args running `task export`
+    as an asyncio subprocess, waiting for the semaphore before starting
+    it'''
+
+    return [
+        task
+        async for task in stream_export_async(
+            tw,
+            filter_args,
+            semaphore,
+            fields,
+        )
+    ]
+
+
+async def export_table_async(tw, filter_args, semaphore):
+    '''Returns a TaskTable with the tasks matching filter_args, appending
+    each of them as it's read from `task export`'''
+
+    table = TaskTable()
+    async for task in stream_export_async(tw, filter_args, semaphore):
+        table.append(task)
+    return table
+
+
+async def export_uuids_async(
+    tw,
+    uuids,
+    semaphore,
+    filter_args=[],
+    fields=RECURRENCE_FIELDS,
+):
+    '''Returns the tasks with the uuids that match filter_args, exporting
+    the chunks of uuids concurrently'''
+
+    chunks = await asyncio.gather(*[
+        export_async(tw, filter_args + chunk, semaphore, fields)
+        for chunk in uuid_chunks(uuids)
+    ])
+    return [task for chunk in chunks for task in chunk]
+
+
+class RepairReport():
+    '''Summary of a repair run'''
+
+    def __init__(self):
+        self.parents = 0
+        self.broken = []
+        self.missing = []
+        self.repaired = []
+        self.failed = []
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        '''Checked parents per second'''
+
+        if not self.elapsed:
+            return 0.0
+        return self.parents / self.elapsed
+
+    def as_dict(self):
+        return {
+            'parents': self.parents,
+            'broken': self.broken,
+            'missing': self.missing,
+            'repaired': self.repaired,
+            'failed': self.failed,
+            'elapsed': self.elapsed,
+            'throughput': self.throughput,
+        }
+
+
+class RepairPipeline():
+    '''Regenerates the children of the recurrent parents whose last instance
+    is completed or deleted.
+
+    The exports are read-only, so they are run concurrently, at most
+    concurrency at the same time. Taskwarrior locks its data files on
+    writes, so the children are synthesized one after the other by a single
+    writer thread while the next exports are running.
+
+    If check is True the broken parents are only reported. If since is a
+    taskwarrior date only the parents modified after it, or whose children
+    were modified after it, are checked. If a RecurrenceLock is given, each
+    child is synthesized holding it, so a racing hook doesn't create it
+    too'''
+
+    def __init__(
+        self,
+        tw,
+        concurrency=DEFAULT_CONCURRENCY,
+        index=None,
+        check=False,
+        since=None,
+        lock=None,
+    ):
+        self.tw = tw
+        self.concurrency = concurrency
+        self.index = index
+        self.check = check
+        self.since = since
+        self.lock = lock
+        self.report = RepairReport()
+
+    def run(self):
+        '''Runs the pipeline and returns its RepairReport'''
+
+        return asyncio.run(self.run_async())
+
+    async def run_async(self):
+        start = time.time()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+        try:
+            if self.since is None:
+                parents, children = await self._all_tasks()
+            else:
+                parents, children = await self._modified_tasks()
+            self.report.parents = len(parents)
+            broken = list(self._broken_parents(parents, children))
+
+            if not self.check:
+                await asyncio.gather(*[
+                    self._repair(parent, child_uuid)
+                    for parent, child_uuid in broken
+                ])
+        finally:
+            self._writer.shutdown()
+
+        self.report.elapsed = time.time() - start
+        return self.report
+
+    async def _all_tasks(self):
+        '''Returns the parents and a TaskTable of the children of the data
+        location. The children are read from the data files if they can be
+        scanned, and appended to the table one by one'''
+
+        children = iter_children(data_location(self.tw))
+        if children is not None:
+            parents = await export_async(
+                self.tw,
+                ['status:recurring'],
+                self._semaphore,
+            )
+            return parents, TaskTable.from_records(children)
+
+        return await asyncio.gather(
+            export_async(self.tw, ['status:recurring'], self._semaphore),
+            export_table_async(self.tw, ['rparent.any:'], self._semaphore),
+        )
+
+    async def _modified_tasks(self):
+        '''Returns the parents modified after since or with children modified
+        after since, and a TaskTable of their last instances'''
+
+        modified = await export_async(
+            self.tw,
+            [
+                '(', 'rparent.any:', 'or', 'status:recurring', ')',
+                'modified.after:{}'.format(self.since),
+            ],
+            self._semaphore,
+        )
+        parent_uuids = [
+            task['rparent'] if task.get('rparent') else task['uuid']
+            for task in modified
+        ]
+
+        parents = await export_uuids_async(
+            self.tw,
+            parent_uuids,
+            self._semaphore,
+            ['status:recurring'],
+        )
+        children = await export_uuids_async(
+            self.tw,
+            [
+                parent['rlastinstance']
+                for parent in parents
+                if parent.get('rlastinstance')
+            ],
+            self._semaphore,
+        )
+        return parents, TaskTable.from_records(children)
+
+    def _broken_parents(self, parents, children):
+        '''Yields the parents whose last instance is completed or deleted
+        with the uuid of that instance'''
+
+        for parent in parents:
+            child_row = children.find(parent.get('rlastinstance'))
+            if child_row is None:
+                self.report.missing.append(
+                    (parent['uuid'], parent.get('rlastinstance'))
+                )
+            elif child_row['status'] in ['completed', 'deleted']:
+                self.report.broken.append(
+                    (parent['uuid'], child_row['uuid'])
+                )
+                yield parent, child_row['uuid']
+
+    async def _repair(self, parent, child_uuid):
+        try:
+            data = await export_async(
+                self.tw,
+                ['uuid:{}'.format(child_uuid)],
+                self._semaphore,
+                fields=None,
+            )
+            if not data:
+                # The child was removed after the tasks were exported
+                self.report.failed.append((
+                    parent['uuid'],
+                    'Task {} not found'.format(child_uuid),
+                ))
+                return
+            child_task = tasklib.task.Task(self.tw)
+            child_task._load_data(data[0])
+
+            await asyncio.get_running_loop().run_in_executor(
+                self._writer,
+                self._synthetize,
+                child_task,
+            )
+        except TaskWarriorException as error:
+            self.report.failed.append((parent['uuid'], str(error)))
+            return
+        self.report.repaired.append(
+            (parent['uuid'], child_task['description'])
+        )
+
+    def _synthetize(self, child_task):
+        ProcessRecurrentTask(
+            child_task,
+            index=self.index,
+            lock=self.lock,
+        ).synthetize_next_child()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+import json
+import datetime
+import contextlib
+
+try:
+    from busday import is_business_period, load_calendar
+    from clock import Clock
+    from main import child_uuid, encode_spec, occurrence_key
+    from plan import import_tasks
+except ImportError:
+    from .busday import is_business_period, load_calendar
+    from .clock import Clock
+    from .main import child_uuid, encode_spec, occurrence_key
+    from .plan import import_tasks
+
+# Dates of the parent moved with its due, and kept at the same distance
+PARENT_DATE_FIELDS = ['rwait', 'rscheduled']
+
+
+class SeriesShift():
+    '''Moves a recurrent series so its parent is due at a new date, for
+    example a weekly meeting that moves from Monday to Wednesday.
+
+    The due, rwait and rscheduled of the parent are moved by the same
+    amount. The live children of a periodic parent are moved to the
+    occurrence of the new due with the same number, computed as the periodic
+    synthesis does, and take the uuid derived from it, so the next synthesis
+    finds them. The children with the old uuids are deleted, unless they're
+    occurrences of the new series too. The live child of a chained parent is
+    moved by the same amount as the parent, as its due depends on the
+    completion of its predecessor.
+
+    The wait, scheduled, rexpiry and rspec of the children are recomputed,
+    and the parent and all its live children are replaced with a single
+    `task import` without hooks'''
+
+    def __init__(self, tw, parent_uuid, due, index=None, lock=None,
+                 clock=None):
+        self.tw = tw
+        self.parent_uuid = parent_uuid
+        self.due = due
+        self.index = index
+        self.lock = lock
+        if clock is None:
+            clock = Clock()
+        self.clock = clock
+
+    def run(self):
+        '''Shifts the series and returns the data of the shifted tasks, the
+        parent first'''
+
+        if self.lock is None:
+            lock = contextlib.nullcontext()
+        else:
+            lock = self.lock.hold()
+
+        with lock:
+            tasks = self.plan()
+            import_tasks(self.tw, tasks, self.index)
+        return tasks
+
+    def plan(self):
+        '''Returns the data of the parent and its live children moved to the
+        new due, and of the replaced children, without applying it'''
+
+        parent_task = self.tw.tasks.get(uuid=self.parent_uuid)
+        old_due = parent_task['due'].astimezone(self.clock.zone)
+        new_due = self.due.astimezone(self.clock.zone)
+        delta = new_due - old_due
+
+        parent_task['due'] = new_due
+        for field in PARENT_DATE_FIELDS:
+            value = parent_task[field]
+            if value is None:
+                continue
+            # tasklib doesn't convert the dates of the UDAs
+            if isinstance(value, str):
+                value = self.tw.convert_datetime_string(value)
+            parent_task[field] = occurrence_key(value + delta)
+
+        children = self.tw.tasks.filter(
+            '( rparent:{} and ( status:pending or status:waiting ) )'.format(
+                self.parent_uuid,
+            )
+        )
+        if parent_task['rtype'] == 'periodic':
+            period = self._due_at(old_due, parent_task['r'], 1) - old_due
+
+        shifted = []
+        for child_task in children:
+            old_data = json.loads(child_task.export_data())
+            child_due = child_task['due']
+            new_child_due = None
+            if parent_task['rtype'] == 'periodic':
+                iteration = self._iteration(
+                    old_due,
+                    parent_task['r'],
+                    period,
+                    child_due,
+                )
+                if iteration is not None:
+                    new_child_due = self._due_at(
+                        new_due,
+                        parent_task['r'],
+                        iteration,
+                    )
+            if new_child_due is None:
+                new_child_due = child_due + delta
+                new_uuid = child_task['uuid']
+            else:
+                # The uuid of a periodic child is derived from its due
+                new_uuid = child_uuid(
+                    self.parent_uuid,
+                    occurrence_key(new_child_due),
+                )
+
+            self._shift_child(child_task, parent_task, new_child_due)
+            data = json.loads(child_task.export_data())
+            data['uuid'] = new_uuid
+            shifted.append((old_data, child_due, data))
+
+        # A closed child of the occurrence keeps it, so the moved child keeps
+        # its old uuid instead of replacing it
+        live_uuids = {old_data['uuid'] for old_data, _, _ in shifted}
+        new_uuids = {data['uuid'] for _, _, data in shifted} - live_uuids
+        if new_uuids:
+            closed_uuids = {
+                task['uuid']
+                for task in self.tw.tasks.filter(' '.join(sorted(new_uuids)))
+            }
+            for old_data, _, data in shifted:
+                if data['uuid'] in closed_uuids:
+                    data['uuid'] = old_data['uuid']
+
+        tasks = [data for _, _, data in shifted]
+        moved = {
+            old_data['uuid']: data['uuid']
+            for old_data, _, data in shifted
+            if old_data['uuid'] != data['uuid']
+        }
+        for old_data, child_due, _ in shifted:
+            if old_data['uuid'] not in moved or \
+                    old_data['uuid'] in moved.values():
+                continue
+            if parent_task['rtype'] == 'periodic' and self._iteration(
+                new_due,
+                parent_task['r'],
+                period,
+                child_due,
+            ) is not None:
+                # The old child is an occurrence of the new series too, as
+                # when it moves back a whole period, so it stays
+                old_data['rspec'] = encode_spec(parent_task)
+            else:
+                old_data['status'] = 'deleted'
+                old_data['end'] = occurrence_key(self.clock.now())
+            tasks.append(old_data)
+
+        if parent_task['rlastinstance'] in moved:
+            parent_task['rlastinstance'] = moved[parent_task['rlastinstance']]
+        return [json.loads(parent_task.export_data())] + tasks
+
+    def _due_at(self, due, r, iteration):
+        '''Returns the due of the occurrence number iteration of a series due
+        at due, as the periodic synthesis computes it'''
+
+        if iteration == 0:
+            return due
+        if is_business_period(r):
+            return load_calendar(self.tw.config).advance(
+                due,
+                r,
+                iteration,
+                self.clock.zone,
+            )
+        return self.tw.convert_datetime_string(
+            '{} + {}*{}'.format(due.isoformat(), r, iteration)
+        )
+
+    def _iteration(self, due, r, period, child_due):
+        '''Returns the number of the occurrence due at child_due of a series
+        due at due, or None if it's not one of its occurrences.
+
+        The number is estimated with the approximate length of the period,
+        or counted for the business periods, so only the occurrences around
+        it are computed'''
+
+        if is_business_period(r):
+            estimate = load_calendar(self.tw.config).iteration(
+                due,
+                r,
+                child_due,
+                self.clock.zone,
+            )
+            candidates = [] if estimate is None else [estimate]
+        else:
+            estimate = round((child_due - due) / period)
+            candidates = [estimate, estimate - 1, estimate + 1]
+
+        for iteration in candidates:
+            if iteration < 0:
+                continue
+            if occurrence_key(self._due_at(due, r, iteration)) == \
+                    occurrence_key(child_due):
+                return iteration
+        return None
+
+    def _shift_child(self, child_task, parent_task, due):
+        '''Moves child_task to due, keeping its wait and scheduled at the
+        offsets of the parent, or at their distance to its due if the parent
+        has none'''
+
+        delta = due - child_task['due']
+        child_task['due'] = due
+        for field, offset_field in [
+            ('wait', 'rwaitoffset'),
+            ('scheduled', 'rscheduledoffset'),
+        ]:
+            if parent_task[offset_field] is not None:
+                child_task[field] = due - datetime.timedelta(
+                    seconds=parent_task[offset_field]
+                )
+            elif child_task[field] is not None:
+                child_task[field] = child_task[field] + delta
+
+        if parent_task['runtil'] is not None:
+            child_task['rexpiry'] = occurrence_key(
+                self.tw.convert_datetime_string('{} + {}'.format(
+                    due.isoformat(),
+                    parent_task['runtil'],
+                ))
+            )
+        child_task['rspec'] = encode_spec(parent_task)
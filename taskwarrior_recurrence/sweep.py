@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+import time
+import tasklib
+import contextlib
+
+try:
+    from export import stream_export, export_uuids, uuid_chunks
+    from main import ProcessRecurrentTask
+    from plan import RecurrencePlan, ImportExecutor
+except ImportError:
+    from .export import stream_export, export_uuids, uuid_chunks
+    from .main import ProcessRecurrentTask
+    from .plan import RecurrencePlan, ImportExecutor
+
+
+class Sweeper():
+    '''Deletes the pending children whose rexpiry has passed and creates
+    their successors.
+
+    The expired children are found with a single query, to the index if it's
+    usable or to `task export` otherwise, and deleted with a bulk `task
+    delete` without hooks for each chunk of uuids. The successors of all of
+    them are then created with a single plan'''
+
+    def __init__(self, tw, index=None, lock=None, executor=None):
+        self.tw = tw
+        self.index = index
+        self.lock = lock
+        if executor is None:
+            executor = ImportExecutor(tw, index)
+        self.executor = executor
+
+    def run(self):
+        '''Sweeps the expired children and returns their uuids'''
+
+        if self.lock is None:
+            lock = contextlib.nullcontext()
+        else:
+            lock = self.lock.hold()
+
+        with lock:
+            task_uuids = self._expired()
+            if not task_uuids:
+                return []
+
+            for chunk in uuid_chunks(task_uuids):
+                self.tw.execute_command(
+                    chunk + ['delete'],
+                    config_override={'hooks': 'off'},
+                )
+            self._synthetize(task_uuids)
+        return task_uuids
+
+    def _expired(self):
+        if self.index is not None and not self.index.stale:
+            return self.index.expired(int(time.time()))
+
+        return [
+            task['uuid']
+            for task in stream_export(
+                self.tw,
+                [
+                    'rparent.any:',
+                    '(', 'status:pending', 'or', 'status:waiting', ')',
+                    'rexpiry.before:now',
+                ],
+                fields=['uuid'],
+            )
+        ]
+
+    def _synthetize(self, task_uuids):
+        '''Plans the successors of the deleted tasks of task_uuids and applies
+        them at once. Only the last due child of each parent is processed, as
+        the periodic synthesis catches up all the missing occurrences'''
+
+        last_deleted = {}
+        for data in export_uuids(self.tw, task_uuids, fields=None):
+            if self.index is not None:
+                self.index.update(data)
+            previous = last_deleted.get(data['rparent'])
+            if previous is None or \
+                    data.get('due', '') > previous.get('due', ''):
+                last_deleted[data['rparent']] = data
+
+        plan = RecurrencePlan()
+        for data in last_deleted.values():
+            child_task = tasklib.task.Task(self.tw)
+            child_task._load_data(data)
+            ProcessRecurrentTask(
+                child_task,
+                index=self.index,
+                executor=self.executor,
+            ).plan_next_child(plan)
+        self.executor.execute(plan)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+import uuid
+import calendar
+from array import array
+
+try:
+    from export import stream_export
+except ImportError:
+    from .export import stream_export
+
+STATUSES = ['pending', 'completed', 'deleted', 'waiting', 'recurring']
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+NULL_DATE = -2 ** 63
+NULL_UUID = bytes(16)
+NULL_STRING = 0
+
+
+def parse_date(value):
+    '''Converts a taskwarrior export date (20180808T085429Z) into epoch
+    seconds'''
+
+    if value is None:
+        return NULL_DATE
+    return calendar.timegm((
+        int(value[0:4]),
+        int(value[4:6]),
+        int(value[6:8]),
+        int(value[9:11]),
+        int(value[11:13]),
+        int(value[13:15]),
+    ))
+
+
+class TaskRow():
+    '''Lightweight view of one row of a TaskTable'''
+
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, key):
+        return self.table.get(self.index, key)
+
+
+class TaskTable():
+    '''Compact columnar storage of the recurrence fields of many tasks.
+
+    Uuids are stored as 16 byte values, dates as int64 epoch seconds, status
+    as small integers and the r and rtype strings are interned, so a bulk tool
+    can hold hundreds of thousands of tasks without building a tasklib Task
+    for each of them'''
+
+    uuid_columns = ['uuid', 'rparent', 'rlastinstance']
+    date_columns = ['due', 'end', 'entry']
+    string_columns = ['r', 'rtype']
+
+    def __init__(self):
+        self.uuid = bytearray()
+        self.rparent = bytearray()
+        self.rlastinstance = bytearray()
+        self.due = array('q')
+        self.end = array('q')
+        self.entry = array('q')
+        self.status = array('b')
+        self.r = array('H')
+        self.rtype = array('H')
+        self._strings = [None]
+        self._string_codes = {None: NULL_STRING}
+        self._index = None
+
+    @classmethod
+    def from_export(cls, tw, filter_args=[]):
+        '''Builds the table streaming the `task export` of the filter'''
+
+        return cls.from_records(stream_export(tw, filter_args))
+
+    @classmethod
+    def from_records(cls, records):
+        '''Builds the table from an iterable of task dictionaries'''
+
+        table = cls()
+        for data in records:
+            table.append(data)
+        return table
+
+    def append(self, data):
+        '''Appends a task given as a dictionary of the task export'''
+
+        for column in self.uuid_columns:
+            getattr(self, column).extend(_uuid_bytes(data.get(column)))
+        for column in self.date_columns:
+            getattr(self, column).append(parse_date(data.get(column)))
+        for column in self.string_columns:
+            getattr(self, column).append(self._intern(data.get(column)))
+        self.status.append(STATUS_CODES[data['status']])
+
+        if self._index is not None:
+            self._index[bytes(self.uuid[-16:])] = len(self) - 1
+
+    def __len__(self):
+        return len(self.status)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield TaskRow(self, index)
+
+    def get(self, index, key):
+        '''Returns the value of the column key for the row index, decoded to
+        the representation of the task export'''
+
+        if key in self.uuid_columns:
+            value = bytes(getattr(self, key)[index * 16:(index + 1) * 16])
+            if value == NULL_UUID:
+                return None
+            return str(uuid.UUID(bytes=value))
+        elif key in self.date_columns:
+            value = getattr(self, key)[index]
+            if value == NULL_DATE:
+                return None
+            return value
+        elif key in self.string_columns:
+            return self._strings[getattr(self, key)[index]]
+        elif key == 'status':
+            return STATUSES[self.status[index]]
+        raise KeyError(key)
+
+    def find(self, task_uuid):
+        '''Returns the row of the task with uuid task_uuid or None if it
+        doesn't exist'''
+
+        if task_uuid is None:
+            return None
+        if self._index is None:
+            self._index = {
+                bytes(self.uuid[index * 16:(index + 1) * 16]): index
+                for index in range(len(self))
+            }
+        index = self._index.get(_uuid_bytes(task_uuid))
+        if index is None:
+            return None
+        return TaskRow(self, index)
+
+    def _intern(self, value):
+        try:
+            return self._string_codes[value]
+        except KeyError:
+            self._strings.append(value)
+            self._string_codes[value] = len(self._strings) - 1
+            return self._string_codes[value]
+
+
+def _uuid_bytes(value):
+    if value is None:
+        return NULL_UUID
+    return uuid.UUID(value).bytes
@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+
+import os
+import json
+import time
+import select
+import struct
+import tasklib
+import contextlib
+
+try:
+    from export import stream_export, export_uuids, uuid_chunks
+    from main import ProcessRecurrentTask
+    from plan import RecurrencePlan, ImportExecutor
+except ImportError:
+    from .export import stream_export, export_uuids, uuid_chunks
+    from .main import ProcessRecurrentTask
+    from .plan import RecurrencePlan, ImportExecutor
+
+# Files written by taskwarrior 2 and by the taskchampion storage of
+# taskwarrior 3
+DATA_FILES = ['pending.data', 'completed.data', 'taskchampion.sqlite3']
+SNAPSHOT_FILE = 'recurrence.snapshot'
+DEFAULT_DEBOUNCE = 2
+DEFAULT_MAX_DELAY = 30
+DEFAULT_POLL_INTERVAL = 1
+
+# inotify(7) events of a file written and closed or moved into the
+# directory, and the header of each event read from its file descriptor
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyNotifier():
+    '''Waits for writes of the data files of a data location with the inotify
+    API of the Linux kernel, called through ctypes so no extra dependency is
+    needed'''
+
+    def __init__(self, data_location):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if getattr(libc, 'inotify_init1', None) is None:
+            raise OSError('inotify is not available')
+
+        self.fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        watch = libc.inotify_add_watch(
+            self.fd,
+            os.fsencode(data_location),
+            IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE,
+        )
+        if watch < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+
+    def wait(self, timeout=None):
+        '''Returns True if a data file is written before timeout seconds, or
+        False if it isn't. Without timeout it waits forever'''
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = max(deadline - time.monotonic(), 0)
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+            if any(name in DATA_FILES for name in self._read_names()):
+                return True
+
+    def clear(self):
+        '''Drops the writes of the data files done till now'''
+
+        while self._read_names():
+            pass
+
+    def close(self):
+        os.close(self.fd)
+
+    def _read_names(self):
+        '''Returns the names of the files of the pending events'''
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            names.append(
+                os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            )
+            offset += length
+        return names
+
+
+class PollingNotifier():
+    '''Waits for writes of the data files of a data location checking their
+    modification times, for the systems without inotify'''
+
+    def __init__(self, data_location, interval=DEFAULT_POLL_INTERVAL):
+        self.paths = [os.path.join(data_location, name) for name in DATA_FILES]
+        self.interval = interval
+        self._mtimes = self._stat()
+
+    def wait(self, timeout=None):
+        '''Returns True if a data file is written before timeout seconds, or
+        False if it isn't. Without timeout it waits forever'''
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            mtimes = self._stat()
+            if mtimes != self._mtimes:
+                self._mtimes = mtimes
+                return True
+
+            sleep = self.interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                sleep = min(sleep, remaining)
+            time.sleep(sleep)
+
+    def clear(self):
+        '''Drops the writes of the data files done till now'''
+
+        self._mtimes = self._stat()
+
+    def close(self):
+        pass
+
+    def _stat(self):
+        mtimes = []
+        for path in self.paths:
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+
+def open_notifier(data_location, poll=False):
+    '''Returns an InotifyNotifier of the data location, or a PollingNotifier
+    if inotify isn't available or poll is True'''
+
+    if not poll:
+        try:
+            return InotifyNotifier(data_location)
+        except OSError:
+            pass
+    return PollingNotifier(data_location)
+
+
+class Watcher():
+    '''Keeps the recurrence of a data location up to date watching its data
+    files, so the taskwarrior commands don't pay for it in the hooks, and the
+    changes done by a sync or by other tools are processed too.
+
+    The live children and the modified of the recurrent parents are stored
+    in a snapshot file. Once the data files stop being written for debounce
+    seconds, or after max_delay seconds of writes, they are exported again.
+    As the on-exit hook does, the rspec of the children of the parents
+    modified since the snapshot is updated, and the live children of the
+    deleted ones are deleted. Then the successors of the children that were
+    completed or deleted since the snapshot are synthesized with a single
+    plan.
+
+    The children created and closed while the watcher wasn't running aren't
+    in the snapshot, the repair scripts fix those. If a RecurrenceLock is
+    given, the successors are planned and created holding it'''
+
+    def __init__(
+        self,
+        tw,
+        data_location,
+        notifier=None,
+        debounce=DEFAULT_DEBOUNCE,
+        max_delay=DEFAULT_MAX_DELAY,
+        index=None,
+        executor=None,
+        lock=None,
+    ):
+        self.tw = tw
+        self.path = os.path.join(data_location, SNAPSHOT_FILE)
+        if notifier is None:
+            notifier = open_notifier(data_location)
+        self.notifier = notifier
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.index = index
+        if executor is None:
+            executor = ImportExecutor(tw, index)
+        self.executor = executor
+        self.lock = lock
+
+    def run(self, batches=None):
+        '''Processes the writes of the data files, forever or till batches
+        batches have been processed'''
+
+        # Catch up with the changes done while the watcher wasn't running
+        self._process_batch()
+        processed_batches = 0
+        while batches is None or processed_batches < batches:
+            self.notifier.wait()
+            self._debounce()
+            self._process_batch()
+            processed_batches += 1
+
+    def _process_batch(self):
+        '''Processes the changes, dropping the writes of the data files done
+        meanwhile: the exports, imports and modifications of the watcher
+        write them too, and they would start another batch'''
+
+        self.process()
+        self.notifier.clear()
+
+    def process(self):
+        '''Updates the children of the parents changed since the last
+        snapshot, synthesizes the successors of the children closed since
+        then and stores the new one. Returns the number of children
+        processed'''
+
+        snapshot = self.load_snapshot()
+        parents = self._export_parents()
+        live = {
+            task['uuid']: task['rparent']
+            for task in stream_export(
+                self.tw,
+                [
+                    'rparent.any:',
+                    '(', 'status:pending', 'or', 'status:waiting', ')',
+                ],
+                fields=['uuid', 'rparent'],
+            )
+        }
+
+        processed = 0
+        if snapshot is not None:
+            changed = []
+            deleted = set()
+            if snapshot['parents'] is not None:
+                changed = [
+                    task_uuid
+                    for task_uuid, modified in snapshot['parents'].items()
+                    if parents.get(task_uuid) != modified
+                ]
+                if changed:
+                    deleted.update(self._update_parents(changed))
+
+            # The children deleted with their parent have no successor
+            for task_uuid in deleted:
+                live.pop(task_uuid, None)
+            gone = [
+                task_uuid
+                for task_uuid in snapshot['children']
+                if task_uuid not in live and task_uuid not in deleted
+            ]
+            if gone:
+                processed = self._synthetize(gone)
+
+            # The changes done here modify the parents too
+            if changed or processed:
+                parents = self._export_parents()
+
+        self.save_snapshot(live, parents)
+        return processed
+
+    def load_snapshot(self):
+        '''Returns the last snapshot, with the parent of each live child in
+        children and the modified of each recurrent parent in parents, or
+        None if there's none.
+
+        The snapshots stored by older versions only have the children, and
+        their parents are None'''
+
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if 'children' not in snapshot:
+            return {'children': snapshot, 'parents': None}
+        return snapshot
+
+    def save_snapshot(self, live, parents=None):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'children': live, 'parents': parents}, f)
+        os.replace(temp_path, self.path)
+
+    def _export_parents(self):
+        '''Returns the modified of each recurrent parent'''
+
+        return {
+            task['uuid']: task.get('modified')
+            for task in stream_export(
+                self.tw,
+                ['status:recurring'],
+                fields=['uuid', 'modified'],
+            )
+        }
+
+    def _debounce(self):
+        '''Waits till the data files aren't written for debounce seconds, or
+        max_delay seconds have passed'''
+
+        deadline = time.monotonic() + self.max_delay
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if not self.notifier.wait(min(self.debounce, remaining)):
+                return
+
+    def _hold_lock(self):
+        if self.lock is None:
+            return contextlib.nullcontext()
+        return self.lock.hold()
+
+    def _update_parents(self, task_uuids):
+        '''Updates the rspec of the live children of the parents of
+        task_uuids, and deletes them if their parent was deleted. Returns
+        the uuids of the deleted children'''
+
+        deleted = []
+        with self._hold_lock():
+            for data in export_uuids(self.tw, task_uuids, fields=None):
+                parent_task = tasklib.task.Task(self.tw)
+                parent_task._load_data(data)
+                ProcessRecurrentTask(
+                    parent_task,
+                    index=self.index,
+                    executor=self.executor,
+                ).propagate_spec()
+                if parent_task['status'] == 'deleted':
+                    deleted.extend(self._delete_children(parent_task['uuid']))
+        return deleted
+
+    def _delete_children(self, parent_uuid):
+        '''Deletes the live children of the parent with a bulk `task delete`
+        and returns their uuids.
+
+        As the Sweeper does, it runs without hooks and updates the index
+        itself: the on-exit hook of each child would wait forever for the
+        lock held by the watcher'''
+
+        task_uuids = [
+            task['uuid']
+            for task in stream_export(
+                self.tw,
+                [
+                    'rparent:{}'.format(parent_uuid),
+                    '(', 'status:pending', 'or', 'status:waiting', ')',
+                ],
+                fields=['uuid'],
+            )
+        ]
+        for chunk in uuid_chunks(task_uuids):
+            self.tw.execute_command(
+                chunk + ['delete'],
+                config_override={'hooks': 'off'},
+            )
+        if self.index is not None:
+            for data in export_uuids(self.tw, task_uuids, fields=None):
+                self.index.update(data)
+        return task_uuids
+
+    def _synthetize(self, task_uuids):
+        '''Plans the successors of the closed tasks of task_uuids and applies
+        them at once.
+
+        Only the last closed child of each parent is processed: it's the
+        base of the next chained child, and the periodic synthesis already
+        catches up all the missing occurrences'''
+
+        last_closed = {}
+        for data in export_uuids(
+            self.tw,
+            task_uuids,
+            ['(', 'status:completed', 'or', 'status:deleted', ')'],
+            fields=None,
+        ):
+            previous = last_closed.get(data['rparent'])
+            if previous is None or \
+                    data.get('end', '') > previous.get('end', ''):
+                last_closed[data['rparent']] = data
+
+        with self._hold_lock():
+            plan = RecurrencePlan()
+            for data in last_closed.values():
+                child_task = tasklib.task.Task(self.tw)
+                child_task._load_data(data)
+                ProcessRecurrentTask(
+                    child_task,
+                    index=self.index,
+                    executor=self.executor,
+                ).plan_next_child(plan)
+            self.executor.execute(plan)
+        return len(last_closed)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+import os
+import json
+import time
+
+WATERMARK_FILE = 'recurrence.watermark'
+# Tasks modified while a run is exporting could be missed, so the next run
+# starts a bit before the previous one did
+WATERMARK_MARGIN = 60
+
+
+class Watermark():
+    '''Time of the last run of a repair, stored in the data location, so the
+    next run only needs to look at the tasks modified after it.
+
+    Each repair is stored under its name, as they don't run at the same
+    times'''
+
+    def __init__(self, data_location, name):
+        self.path = os.path.join(data_location, WATERMARK_FILE)
+        self.name = name
+        self._start = None
+
+    def load(self):
+        '''Returns the watermark as a taskwarrior date or None if the repair
+        hasn't run yet'''
+
+        try:
+            with open(self.path) as f:
+                return json.load(f).get(self.name)
+        except (OSError, ValueError):
+            return None
+
+    def start(self):
+        '''Records the start of a run, the watermark that save will store'''
+
+        self._start = time.strftime(
+            '%Y%m%dT%H%M%SZ',
+            time.gmtime(time.time() - WATERMARK_MARGIN),
+        )
+
+    def save(self):
+        '''Stores the start of the run, so call it only if the run
+        succeeded'''
+
+        try:
+            with open(self.path) as f:
+                watermarks = json.load(f)
+        except (OSError, ValueError):
+            watermarks = {}
+        watermarks[self.name] = self._start
+
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(watermarks, f)
+        os.replace(temp_path, self.path)
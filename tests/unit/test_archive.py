@@ -0,0 +1,148 @@
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock, call
+from tasklib.backends import TaskWarriorException
+
+from taskwarrior_recurrence.archive import \
+    Archiver, read_archive, load_summaries
+
+
+class TestArchiver(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.tw = MagicMock()
+        self.tw.version = '2.6.2'
+        self.index = MagicMock()
+        self.parent_uuid = '012339c8-a8fe-41da-82db-a990f989237e'
+        self.parents = [
+            {
+                'uuid': self.parent_uuid,
+                'rlastinstance': 'c',
+            },
+        ]
+        self.children = [
+            {
+                'uuid': 'a',
+                'rparent': self.parent_uuid,
+                'status': 'completed',
+                'end': '20180708T010000Z',
+            },
+            {
+                'uuid': 'b',
+                'rparent': self.parent_uuid,
+                'status': 'deleted',
+                'end': '20180715T010000Z',
+            },
+            {
+                'uuid': 'c',
+                'rparent': self.parent_uuid,
+                'status': 'completed',
+                'end': '20180722T010000Z',
+            },
+        ]
+        self.stream_export_patch = patch(
+            'taskwarrior_recurrence.archive.stream_export',
+            side_effect=self.fake_export,
+        )
+        self.stream_export = self.stream_export_patch.start()
+        self.archiver = Archiver(
+            self.tw,
+            self.temp_dir,
+            age='30d',
+            index=self.index,
+        )
+
+    def tearDown(self):
+        self.stream_export_patch.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def fake_export(self, tw, filter_args, fields):
+        if filter_args == ['status:recurring']:
+            return iter(self.parents)
+        return iter(self.children)
+
+    def test_archives_old_children_but_the_last_instance(self):
+        self.assertEqual(self.archiver.run(), {self.parent_uuid: 2})
+
+        self.assertIn(
+            'end.before:now-30d',
+            self.stream_export.call_args[0][1],
+        )
+        self.assertEqual(
+            [task['uuid'] for task in read_archive(
+                self.temp_dir,
+                self.parent_uuid,
+            )],
+            ['a', 'b'],
+        )
+
+    def test_removes_children_in_bulk(self):
+        self.archiver.run()
+
+        self.assertEqual(
+            self.tw.execute_command.call_args_list,
+            [
+                call(['a', 'delete'], config_override={'hooks': 'off'}),
+                call(['a', 'b', 'purge'], config_override={'hooks': 'off'}),
+            ],
+        )
+        self.assertEqual(list(self.index.remove.call_args[0][0]), ['a', 'b'])
+
+    def test_summaries_accumulate_across_runs(self):
+        self.archiver.run()
+        self.children = [
+            {
+                'uuid': 'd',
+                'rparent': self.parent_uuid,
+                'status': 'completed',
+                'end': '20180729T010000Z',
+            },
+        ]
+        self.archiver.run()
+
+        self.assertEqual(
+            load_summaries(self.temp_dir),
+            {
+                self.parent_uuid: {
+                    'completed': 2,
+                    'deleted': 1,
+                    'last_end': '20180729T010000Z',
+                },
+            },
+        )
+
+    def test_archived_twice_child_is_read_once(self):
+        self.tw.execute_command.side_effect = [Exception('locked'), None, None]
+        with self.assertRaises(Exception):
+            self.archiver.run()
+        self.assertEqual(load_summaries(self.temp_dir), {})
+
+        self.archiver.run()
+
+        self.assertEqual(
+            len(list(read_archive(self.temp_dir, self.parent_uuid))),
+            2,
+        )
+
+    def test_nothing_to_archive(self):
+        self.children = []
+
+        self.assertEqual(self.archiver.run(), {})
+        self.assertFalse(self.tw.execute_command.called)
+
+    def test_old_taskwarrior_versions_arent_changed(self):
+        self.tw.version = '2.5.3'
+
+        with self.assertRaises(TaskWarriorException):
+            self.archiver.run()
+
+        self.assertFalse(self.stream_export.called)
+        self.assertFalse(self.tw.execute_command.called)
+        self.assertFalse(self.index.remove.called)
+        self.assertEqual(load_summaries(self.temp_dir), {})
+
+    def test_taskwarrior_3_can_purge(self):
+        self.tw.version = '3.1.0'
+
+        self.assertEqual(self.archiver.run(), {self.parent_uuid: 2})
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from taskwarrior_recurrence.backend import CachedTaskWarrior
+
+FAKE_TASK = '''#!{}
+import sys
+with open({!r}, 'a') as f:
+    f.write(' '.join(sys.argv[1:]) + '\\n')
+if '--version' in sys.argv:
+    print('2.5.1')
+elif 'show' in sys.argv:
+    print('uda.r.type      string')
+    print('dateformat      Y-M-D')
+    print('color           on')
+'''
+
+
+class TestCachedTaskWarrior(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.bin_dir = os.path.join(self.temp_dir, 'bin')
+        self.data_location = os.path.join(self.temp_dir, 'data')
+        self.taskrc = os.path.join(self.temp_dir, 'taskrc')
+        self.log = os.path.join(self.temp_dir, 'calls')
+        os.mkdir(self.bin_dir)
+        shutil.copyfile('tests/files/taskrc', self.taskrc)
+
+        self.binary = os.path.join(self.bin_dir, 'task')
+        with open(self.binary, 'w') as f:
+            f.write(FAKE_TASK.format(sys.executable, self.log))
+        os.chmod(self.binary, 0o755)
+
+        self.path_patch = patch.dict(
+            os.environ,
+            {'PATH': self.bin_dir + os.pathsep + os.environ['PATH']},
+        )
+        self.path_patch.start()
+
+    def tearDown(self):
+        self.path_patch.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def backend(self):
+        return CachedTaskWarrior(
+            taskrc_location=self.taskrc,
+            data_location=self.data_location,
+        )
+
+    def calls(self):
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log) as f:
+            return f.read().splitlines()
+
+    def touch(self, path):
+        future = time.time() + 10
+        os.utime(path, (future, future))
+
+    def test_version_is_probed_once(self):
+        self.assertEqual(self.backend().version, '2.5.1')
+        self.assertEqual(self.backend().version, '2.5.1')
+        self.assertEqual(self.calls(), ['--version'])
+
+    def test_config_is_probed_once_and_filtered(self):
+        self.backend().config
+        config = self.backend().config
+
+        self.assertEqual(config['uda.r.type'], 'string')
+        self.assertEqual(config['dateformat'], 'Y-M-D')
+        self.assertFalse('color' in config)
+        self.assertEqual(len([c for c in self.calls() if 'show' in c]), 1)
+
+    def test_cache_is_invalidated_if_taskrc_changes(self):
+        self.backend()
+        self.touch(self.taskrc)
+        self.backend()
+        self.assertEqual(self.calls(), ['--version'] * 2)
+
+    def test_cache_is_invalidated_if_binary_changes(self):
+        self.backend()
+        self.touch(self.binary)
+        self.backend()
+        self.assertEqual(self.calls(), ['--version'] * 2)
+
+    def test_corrupt_cache_is_ignored(self):
+        self.backend()
+        with open(os.path.join(self.data_location, 'recurrence.backend'),
+                  'w') as f:
+            f.write('{')
+        self.assertEqual(self.backend().version, '2.5.1')
+        self.assertEqual(self.calls(), ['--version'] * 2)
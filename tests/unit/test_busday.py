@@ -0,0 +1,264 @@
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+
+from taskwarrior_recurrence.busday import \
+    BusinessCalendar, HOLIDAYS_CONFIG, WEEKMASK_CONFIG, is_business_period, \
+    load_calendar, parse_weekmask
+from taskwarrior_recurrence.clock import FixedClock
+from taskwarrior_recurrence.main import ProcessRecurrentTask
+from taskwarrior_recurrence.memory import InMemoryTaskWarrior, serialize_date
+from taskwarrior_recurrence.shift import SeriesShift
+
+PARENT_UUID = '012339c8-a8fe-41da-82db-a990f989237e'
+UTC = datetime.timezone.utc
+
+
+class TestBusinessCalendar(unittest.TestCase):
+    def setUp(self):
+        self.calendar = BusinessCalendar(holidays=[
+            datetime.date(2037, 7, 13),
+            # Holidays on weekends don't change anything
+            datetime.date(2037, 7, 18),
+        ])
+
+    def brute_force_offset(self, date, count):
+        while count:
+            date += datetime.timedelta(days=1)
+            if self.calendar.is_busday(date):
+                count -= 1
+        return date
+
+    def test_business_periods(self):
+        self.assertTrue(is_business_period('bd'))
+        self.assertTrue(is_business_period('3bd'))
+        self.assertTrue(is_business_period('lastbd'))
+        self.assertTrue(is_business_period('3lastbd'))
+        self.assertFalse(is_business_period('3d'))
+        self.assertFalse(is_business_period(None))
+
+    def test_weekmask_accepts_day_names(self):
+        self.assertEqual(
+            parse_weekmask('Mon Wed Sat'),
+            parse_weekmask('1010010'),
+        )
+        with self.assertRaises(ValueError):
+            parse_weekmask('Mon Funday')
+        with self.assertRaises(ValueError):
+            parse_weekmask('0000000')
+
+    def test_offset_skips_weekends_and_holidays(self):
+        friday = datetime.date(2037, 7, 10)
+
+        self.assertEqual(
+            self.calendar.offset(friday, 1),
+            datetime.date(2037, 7, 14),
+        )
+        self.assertEqual(
+            self.calendar.offset(friday, 5),
+            datetime.date(2037, 7, 20),
+        )
+
+    def test_offset_matches_walking_the_days(self):
+        start = datetime.date(2037, 7, 1)
+        for day in range(14):
+            date = start + datetime.timedelta(days=day)
+            for count in range(40):
+                offset = self.calendar.offset(date, count)
+                self.assertEqual(
+                    offset,
+                    self.brute_force_offset(date, count),
+                )
+                self.assertEqual(self.calendar.count(date, offset), count)
+
+    def test_last_busday(self):
+        self.assertEqual(
+            self.calendar.last_busday(2037, 10),
+            datetime.date(2037, 10, 30),
+        )
+
+    def test_advance_keeps_the_time_of_the_day(self):
+        due = datetime.datetime(2037, 7, 10, 9, tzinfo=UTC)
+
+        self.assertEqual(
+            self.calendar.advance(due, '3bd', 2, UTC),
+            datetime.datetime(2037, 7, 21, 9, tzinfo=UTC),
+        )
+        self.assertEqual(
+            self.calendar.advance(due, '3lastbd', 1, UTC),
+            datetime.datetime(2037, 10, 30, 9, tzinfo=UTC),
+        )
+
+    def test_iteration_inverts_advance(self):
+        due = datetime.datetime(2037, 7, 10, 9, tzinfo=UTC)
+
+        for r in ['2bd', 'lastbd', '2lastbd']:
+            for iteration in range(30):
+                self.assertEqual(
+                    self.calendar.iteration(
+                        due,
+                        r,
+                        self.calendar.advance(due, r, iteration, UTC),
+                        UTC,
+                    ),
+                    iteration,
+                )
+        self.assertIsNone(self.calendar.iteration(
+            due,
+            '2bd',
+            datetime.datetime(2037, 7, 14, 9, tzinfo=UTC),
+            UTC,
+        ))
+
+
+class TestLoadCalendar(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'holidays')
+        with open(self.path, 'w') as f:
+            f.write('# Holidays\n2037-07-13\n\n2037-12-25  # Christmas\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_calendar_of_the_configuration(self):
+        calendar = load_calendar({
+            WEEKMASK_CONFIG: '1111110',
+            HOLIDAYS_CONFIG: self.path,
+        })
+
+        self.assertTrue(calendar.is_busday(datetime.date(2037, 7, 11)))
+        self.assertFalse(calendar.is_busday(datetime.date(2037, 7, 13)))
+        self.assertFalse(calendar.is_busday(datetime.date(2037, 12, 25)))
+
+    def test_calendar_is_loaded_once(self):
+        config = {HOLIDAYS_CONFIG: self.path}
+
+        self.assertIs(load_calendar(config), load_calendar(config))
+
+    def test_default_calendar(self):
+        calendar = load_calendar({})
+
+        self.assertTrue(calendar.is_busday(datetime.date(2037, 7, 10)))
+        self.assertFalse(calendar.is_busday(datetime.date(2037, 7, 11)))
+
+
+class TestBusinessRecurrence(unittest.TestCase):
+    '''Runs the business periods through the recurrence logic against the in
+    memory backend'''
+
+    def setUp(self):
+        self.tw = InMemoryTaskWarrior()
+        self.clock = FixedClock(
+            self.tw.convert_datetime_string('20370715T000000Z')
+        )
+
+    def dues(self, **filter_kwargs):
+        return sorted(
+            serialize_date(task['due'])
+            for task in self.tw.tasks.filter(
+                rparent=PARENT_UUID,
+                **filter_kwargs
+            )
+        )
+
+    def test_periodic_business_days(self):
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": PARENT_UUID,
+            "description": "Every business day",
+            "due": "20370710T090000Z",
+            "r": "bd",
+            "rtype": "periodic",
+        }, clock=self.clock)
+
+        self.tw.execute_command([parent_task['rlastinstance'], 'done'])
+        ProcessRecurrentTask(
+            self.tw.tasks.get(uuid=parent_task['rlastinstance']),
+            clock=self.clock,
+        ).synthetize_next_child()
+
+        self.assertEqual(self.dues(), [
+            '20370710T090000Z',
+            '20370713T090000Z',
+            '20370714T090000Z',
+            '20370715T090000Z',
+        ])
+
+    def test_periodic_last_business_day_of_the_month(self):
+        self.clock.set(self.tw.convert_datetime_string('20371001T000000Z'))
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": PARENT_UUID,
+            "description": "Last business day of the month",
+            "due": "20370731T090000Z",
+            "r": "lastbd",
+            "rtype": "periodic",
+        }, clock=self.clock)
+
+        self.tw.execute_command([parent_task['rlastinstance'], 'done'])
+        ProcessRecurrentTask(
+            self.tw.tasks.get(uuid=parent_task['rlastinstance']),
+            clock=self.clock,
+        ).synthetize_next_child()
+
+        self.assertEqual(self.dues(), [
+            '20370731T090000Z',
+            '20370831T090000Z',
+            '20370930T090000Z',
+            '20371030T090000Z',
+        ])
+
+    def test_chained_business_days(self):
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": PARENT_UUID,
+            "description": "Three business days after the last one",
+            "due": "20370710T090000Z",
+            "r": "3bd",
+            "rtype": "chained",
+        }, clock=self.clock)
+        first_child = self.tw.tasks.get(uuid=parent_task['rlastinstance'])
+        self.tw.execute_command([first_child['uuid'], 'done'])
+        first_child = self.tw.tasks.get(uuid=first_child['uuid'])
+
+        ProcessRecurrentTask(
+            first_child,
+            clock=self.clock,
+        ).synthetize_next_child()
+
+        parent_task = self.tw.tasks.get(uuid=PARENT_UUID)
+        next_task = self.tw.tasks.get(uuid=parent_task['rlastinstance'])
+        calendar = BusinessCalendar()
+        end = first_child['end'].astimezone(self.clock.zone)
+        self.assertEqual(
+            next_task['due'],
+            calendar.advance(end, '3bd', 1, self.clock.zone),
+        )
+        self.assertTrue(calendar.is_busday(
+            next_task['due'].astimezone(self.clock.zone).date()
+        ))
+
+    def test_shift_moves_business_day_children(self):
+        self.tw.add_recurrent_task({
+            "uuid": PARENT_UUID,
+            "description": "Every other business day",
+            "due": "20370710T090000Z",
+            "r": "2bd",
+            "rtype": "periodic",
+            "rahead": "1w",
+        }, clock=self.clock)
+
+        SeriesShift(
+            self.tw,
+            PARENT_UUID,
+            self.tw.convert_datetime_string('20370713T090000Z'),
+            clock=self.clock,
+        ).run()
+
+        self.assertEqual(self.dues(status='pending'), [
+            '20370713T090000Z',
+            '20370715T090000Z',
+            '20370717T090000Z',
+            '20370721T090000Z',
+            '20370723T090000Z',
+        ])
@@ -0,0 +1,106 @@
+import os
+import json
+import shutil
+import datetime
+import tempfile
+import unittest
+import zoneinfo
+from unittest.mock import patch
+
+from taskwarrior_recurrence import clock
+from taskwarrior_recurrence.clock import \
+    Clock, FixedClock, ZONE_CACHE_FILE, get_local_zone, localize
+
+
+class TestGetLocalZone(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_dir, ZONE_CACHE_FILE)
+
+        # Each test resolves the zone as a new process would
+        self.zone_patch = patch.object(clock, '_local_zone', None)
+        self.zone_patch.start()
+        self.addCleanup(self.zone_patch.stop)
+
+        self.tzlocal_patch = patch('tzlocal.get_localzone')
+        self.get_localzone = self.tzlocal_patch.start()
+        self.addCleanup(self.tzlocal_patch.stop)
+        self.get_localzone.return_value = zoneinfo.ZoneInfo('Europe/Madrid')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_zone_is_resolved_once_per_process(self):
+        get_local_zone()
+        zone = get_local_zone()
+
+        self.assertEqual(self.get_localzone.call_count, 1)
+        self.assertEqual(zone.key, 'Europe/Madrid')
+
+    def test_zone_is_stored_in_the_cache(self):
+        get_local_zone(self.cache_path)
+
+        with open(self.cache_path) as f:
+            self.assertEqual(json.load(f)['name'], 'Europe/Madrid')
+
+    def test_cached_zone_doesnt_probe_the_system(self):
+        get_local_zone(self.cache_path)
+        clock._local_zone = None
+
+        zone = get_local_zone(self.cache_path)
+
+        self.assertEqual(self.get_localzone.call_count, 1)
+        self.assertEqual(zone.key, 'Europe/Madrid')
+
+    def test_cache_is_ignored_if_the_zone_key_changes(self):
+        get_local_zone(self.cache_path)
+        clock._local_zone = None
+
+        with patch.dict(os.environ, {'TZ': 'America/New_York'}):
+            get_local_zone(self.cache_path)
+
+        self.assertEqual(self.get_localzone.call_count, 2)
+
+    def test_corrupt_cache_is_ignored(self):
+        with open(self.cache_path, 'w') as f:
+            f.write('{')
+
+        zone = get_local_zone(self.cache_path)
+
+        self.assertEqual(self.get_localzone.call_count, 1)
+        self.assertEqual(zone.key, 'Europe/Madrid')
+
+    def test_unwritable_cache_is_ignored(self):
+        zone = get_local_zone(
+            os.path.join(self.temp_dir, 'missing', ZONE_CACHE_FILE)
+        )
+
+        self.assertEqual(zone.key, 'Europe/Madrid')
+
+
+class TestClock(unittest.TestCase):
+    def setUp(self):
+        self.zone = zoneinfo.ZoneInfo('Europe/Madrid')
+
+    def test_now_is_aware(self):
+        now = Clock(zone=self.zone).now()
+
+        self.assertEqual(now.tzinfo, self.zone)
+
+    def test_localize_supports_zoneinfo_zones(self):
+        date = localize(datetime.datetime(2037, 7, 8, 1), self.zone)
+
+        self.assertEqual(date.isoformat(), '2037-07-08T01:00:00+02:00')
+
+    def test_fixed_clock_is_moved_explicitly(self):
+        now = datetime.datetime(2037, 7, 8, 1, tzinfo=self.zone)
+        fixed_clock = FixedClock(now)
+
+        self.assertEqual(fixed_clock.now(), now)
+        self.assertEqual(fixed_clock.zone, self.zone)
+
+        fixed_clock.advance(datetime.timedelta(days=1))
+        self.assertEqual(fixed_clock.now().day, 9)
+
+        fixed_clock.set(now)
+        self.assertEqual(fixed_clock.now(), now)
@@ -0,0 +1,166 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from taskwarrior_recurrence.datafile import \
+    TASKCHAMPION_FILE, data_location, decode_value, iter_children, \
+    parse_line, scan_children
+
+PARENT_UUID = '012339c8-a8fe-41da-82db-a990f989237e'
+OTHER_PARENT_UUID = '7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f'
+
+
+class TestParseLine(unittest.TestCase):
+    def test_dates_are_converted_to_the_export_format(self):
+        data = parse_line(
+            b'[due:"1533977669" rparent:"' + PARENT_UUID.encode() +
+            b'" status:"pending" uuid:"child"]'
+        )
+
+        self.assertEqual(data, {
+            'due': '20180811T085429Z',
+            'rparent': PARENT_UUID,
+            'status': 'pending',
+            'uuid': 'child',
+        })
+
+    def test_only_the_fields_are_kept(self):
+        data = parse_line(
+            b'[description:"Task" status:"pending" uuid:"child"]',
+            fields=['uuid'],
+        )
+
+        self.assertEqual(data, {'uuid': 'child'})
+
+    def test_values_are_unescaped(self):
+        self.assertEqual(
+            decode_value(b'say \\"hi\\" &open;now&close;'),
+            'say "hi" [now]',
+        )
+        self.assertEqual(decode_value(b'&dquot;old&dquot;'), '"old"')
+        self.assertEqual(decode_value(b'caf\\u00e9'), 'café')
+
+    def test_escaped_quotes_dont_end_the_value(self):
+        data = parse_line(
+            b'[description:"a \\"b\\" c" uuid:"child"]',
+            fields=None,
+        )
+
+        self.assertEqual(data['description'], 'a "b" c')
+
+
+class TestScanChildren(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, tasks):
+        with open(os.path.join(self.temp_dir, name), 'w') as f:
+            for task in tasks:
+                f.write('[{}]\n'.format(' '.join(
+                    '{}:"{}"'.format(key, value)
+                    for key, value in sorted(task.items())
+                )))
+
+    def child(self, task_uuid, parent_uuid=PARENT_UUID, **data):
+        data.update({
+            'uuid': task_uuid,
+            'rparent': parent_uuid,
+            'status': data.get('status', 'pending'),
+            'modified': data.get('modified', 1533459269),
+        })
+        return data
+
+    def test_children_of_both_files_are_found(self):
+        self.write('pending.data', [
+            {'uuid': PARENT_UUID, 'status': 'recurring'},
+            self.child('pending child'),
+            self.child('other child', OTHER_PARENT_UUID),
+        ])
+        self.write('completed.data', [
+            self.child('completed child', status='completed'),
+        ])
+
+        children = scan_children(self.temp_dir, PARENT_UUID)
+
+        self.assertEqual(
+            sorted(task['uuid'] for task in children),
+            ['completed child', 'pending child'],
+        )
+
+    def test_children_of_every_parent_are_found(self):
+        self.write('pending.data', [
+            {'uuid': PARENT_UUID, 'status': 'recurring'},
+            self.child('pending child'),
+            self.child('other child', OTHER_PARENT_UUID),
+        ])
+
+        children = scan_children(self.temp_dir)
+
+        self.assertEqual(
+            sorted(task['uuid'] for task in children),
+            ['other child', 'pending child'],
+        )
+
+    def test_attributes_ending_in_rparent_are_ignored(self):
+        self.write('pending.data', [
+            {'uuid': 'task', 'status': 'pending', 'myrparent': PARENT_UUID},
+            self.child('child', myrparent=PARENT_UUID),
+        ])
+
+        children = scan_children(self.temp_dir, PARENT_UUID)
+
+        self.assertEqual([task['uuid'] for task in children], ['child'])
+
+    def test_last_modified_copy_wins(self):
+        self.write('pending.data', [
+            self.child('child', status='completed', modified=1533977669),
+        ])
+        self.write('completed.data', [
+            self.child('child', modified=1533459269),
+        ])
+
+        children = scan_children(self.temp_dir, PARENT_UUID)
+
+        self.assertEqual(len(children), 1)
+        self.assertEqual(children[0]['status'], 'completed')
+
+    def test_children_are_yielded_one_by_one(self):
+        self.write('pending.data', [
+            self.child('child', status='completed', modified=1533977669),
+            self.child('other child'),
+        ])
+        self.write('completed.data', [
+            self.child('child', modified=1533459269),
+        ])
+
+        children = iter_children(self.temp_dir, PARENT_UUID, fields=['uuid'])
+
+        self.assertEqual(next(children), {'uuid': 'child'})
+        self.assertEqual(list(children), [{'uuid': 'other child'}])
+
+    def test_empty_files_are_supported(self):
+        self.write('pending.data', [])
+        self.write('completed.data', [])
+
+        self.assertEqual(scan_children(self.temp_dir, PARENT_UUID), [])
+
+    def test_locations_without_taskwarrior_2_files_arent_scanned(self):
+        self.assertIsNone(scan_children(self.temp_dir, PARENT_UUID))
+        self.assertIsNone(scan_children(None, PARENT_UUID))
+        self.assertIsNone(iter_children(None, PARENT_UUID))
+
+        self.write('pending.data', [self.child('child')])
+        self.write(TASKCHAMPION_FILE, [])
+        self.assertIsNone(scan_children(self.temp_dir, PARENT_UUID))
+
+    def test_data_location_of_the_backend(self):
+        tw = MagicMock()
+        self.assertIsNone(data_location(tw))
+
+        tw.overrides = {'data.location': self.temp_dir}
+        self.assertEqual(data_location(tw), self.temp_dir)
@@ -0,0 +1,159 @@
+import os
+import time
+import shutil
+import datetime
+import tempfile
+import unittest
+import threading
+from tasklib import Task
+from unittest.mock import patch, MagicMock
+
+from taskwarrior_recurrence.deferred import \
+    BudgetExceeded, DeferredQueue, check_deadline, hook_deadline
+
+
+class TestHookDeadline(unittest.TestCase):
+    def test_no_deadline_if_budget_not_set(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(hook_deadline(), None)
+
+    def test_deadline_is_start_plus_budget(self):
+        environ = {'TASKWARRIOR_RECURRENCE_BUDGET': '0.5'}
+        with patch.dict(os.environ, environ, clear=True):
+            self.assertEqual(hook_deadline(start=100), 100.5)
+
+    def test_check_deadline_raises_if_passed(self):
+        with self.assertRaises(BudgetExceeded):
+            check_deadline(time.time() - 1)
+
+    def test_check_deadline_doesnt_raise_without_deadline(self):
+        check_deadline(None)
+
+
+class TestDeferredQueue(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.queue = DeferredQueue(self.temp_dir)
+        self.task_data = {
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "rparent": "012339c8-a8fe-41da-82db-a990f989237e",
+            "end": datetime.datetime(2018, 8, 9, 8, 54, 29),
+            "due": datetime.datetime(2018, 8, 8, 1, 0, 0),
+        }
+        self.prt_patch = patch(
+            'taskwarrior_recurrence.main.ProcessRecurrentTask'
+        )
+        self.prt = self.prt_patch.start()
+        self.tw = MagicMock()
+        self.tw.tasks.get.return_value.__getitem__.return_value = 'periodic'
+
+    def tearDown(self):
+        self.prt_patch.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_push_appends_intent_record(self):
+        self.queue.push(self.task_data)
+        self.queue.push(self.task_data)
+
+        self.assertEqual(
+            self.queue.records(),
+            [{
+                'parent': '012339c8-a8fe-41da-82db-a990f989237e',
+                'child': '3f0a43d0-a713-4ebe-9e5c-b1facf49f078',
+                'end': '2018-08-09T08:54:29',
+                'due': '2018-08-08T01:00:00',
+            }] * 2,
+        )
+
+    def test_records_is_empty_if_queue_doesnt_exist(self):
+        self.assertEqual(self.queue.records(), [])
+
+    def test_drain_synthetizes_children_and_empties_queue(self):
+        self.queue.push(self.task_data)
+
+        self.assertEqual(self.queue.drain(self.tw), 1)
+
+        self.assertTrue(self.prt.return_value.synthetize_next_child.called)
+        self.assertFalse(os.path.exists(self.queue.path))
+
+    def test_drain_keeps_records_if_deadline_is_reached(self):
+        self.queue.push(self.task_data)
+        self.queue.push(dict(
+            self.task_data,
+            uuid='7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f',
+        ))
+        self.prt.return_value.synthetize_next_child.side_effect = \
+            [None, BudgetExceeded()]
+
+        self.assertEqual(self.queue.drain(self.tw), 1)
+
+        self.assertEqual(
+            [record['child'] for record in self.queue.records()],
+            ['7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f'],
+        )
+
+    def test_drain_discards_the_duplicates_of_processed_records(self):
+        self.queue.push(self.task_data)
+        self.queue.push(self.task_data)
+        self.prt.return_value.synthetize_next_child.side_effect = \
+            [None, BudgetExceeded()]
+
+        self.assertEqual(self.queue.drain(self.tw), 1)
+
+        self.assertEqual(self.queue.records(), [])
+
+    def test_drain_skips_chained_records_already_processed(self):
+        self.queue.push(self.task_data)
+        self.tw.tasks.get.return_value.__getitem__.return_value = 'chained'
+        self.tw.tasks.filter.return_value = [MagicMock()]
+
+        self.assertEqual(self.queue.drain(self.tw), 1)
+
+        self.assertFalse(self.prt.return_value.synthetize_next_child.called)
+        self.assertEqual(self.queue.records(), [])
+
+    def test_drain_keeps_records_pushed_during_a_concurrent_drain(self):
+        self.queue.push(self.task_data)
+        other_task_data = dict(
+            self.task_data,
+            uuid='7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f',
+        )
+
+        def concurrent_drain():
+            self.prt.return_value.synthetize_next_child.side_effect = None
+            DeferredQueue(self.temp_dir).drain(self.tw)
+            self.queue.push(other_task_data)
+
+        self.prt.return_value.synthetize_next_child.side_effect = \
+            concurrent_drain
+
+        self.assertEqual(self.queue.drain(self.tw), 1)
+
+        self.assertEqual(
+            [record['child'] for record in self.queue.records()],
+            ['7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f'],
+        )
+
+    def test_drain_drops_records_of_purged_tasks(self):
+        self.queue.push(self.task_data)
+        self.tw.tasks.get.side_effect = Task.DoesNotExist()
+
+        self.assertEqual(self.queue.drain(self.tw), 1)
+
+        self.assertEqual(self.queue.records(), [])
+
+    def test_push_waits_for_the_rewrite_of_the_queue(self):
+        thread = threading.Thread(
+            target=self.queue.push,
+            args=(self.task_data,),
+        )
+
+        # Holds the lock as _discard does while it rewrites the queue
+        with self.queue._locked():
+            thread.start()
+            thread.join(0.1)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(self.queue.records(), [])
+        thread.join()
+
+        self.assertEqual(len(self.queue.records()), 1)
@@ -0,0 +1,62 @@
+import datetime
+import unittest
+
+from taskwarrior_recurrence.exdates import \
+    add_exdates, remove_exdates, parse_exdates, is_excluded, day_start
+
+UTC = datetime.timezone.utc
+
+
+class TestExdates(unittest.TestCase):
+    def setUp(self):
+        self.christmas = datetime.datetime(2018, 12, 25, 9, 30, tzinfo=UTC)
+        self.new_year = datetime.datetime(2019, 1, 1, tzinfo=UTC)
+
+    def test_day_start(self):
+        self.assertEqual(day_start(self.christmas), 1545696000)
+
+    def test_add_keeps_exdates_sorted_and_unique(self):
+        value = add_exdates(None, [self.new_year, self.christmas])
+        value = add_exdates(value, [self.christmas])
+
+        self.assertEqual(value, '1545696000,1546300800')
+
+    def test_parse_sorts_hand_edited_values(self):
+        self.assertEqual(
+            parse_exdates('1546300800,1545696000,'),
+            [1545696000, 1546300800],
+        )
+        self.assertEqual(parse_exdates(None), [])
+
+    def test_is_excluded_matches_any_time_of_the_day(self):
+        exdates = parse_exdates(add_exdates(None, [self.christmas]))
+
+        self.assertTrue(is_excluded(
+            exdates,
+            datetime.datetime(2018, 12, 25, 23, 59, tzinfo=UTC),
+        ))
+        self.assertFalse(is_excluded(exdates, self.new_year))
+        self.assertFalse(is_excluded([], self.christmas))
+
+    def test_is_excluded_with_many_exdates(self):
+        start = datetime.datetime(2018, 1, 1, tzinfo=UTC)
+        exdates = parse_exdates(add_exdates(None, [
+            start + datetime.timedelta(days=2 * day) for day in range(500)
+        ]))
+
+        self.assertTrue(is_excluded(
+            exdates,
+            start + datetime.timedelta(days=998),
+        ))
+        self.assertFalse(is_excluded(
+            exdates,
+            start + datetime.timedelta(days=999),
+        ))
+
+    def test_remove_exdates(self):
+        value = add_exdates(None, [self.new_year, self.christmas])
+
+        self.assertEqual(
+            remove_exdates(value, [self.christmas]),
+            '1546300800',
+        )
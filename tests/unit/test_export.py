@@ -0,0 +1,112 @@
+import sys
+import json
+import unittest
+from unittest.mock import MagicMock
+from tasklib.backends import TaskWarriorException
+
+from taskwarrior_recurrence.export import \
+    parse_export_lines, stream_export, uuid_chunks
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.task_data = {
+            "entry": "20180702T194712Z",
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "modified": "20180708T085429Z",
+            "status": "completed",
+            "description": "This is a periodic recurring task",
+            "end": "20180708T085429Z",
+            "due": "20180708T010000Z",
+            "r": "1w",
+            "rparent": "012339c8-a8fe-41da-82db-a990f989237e",
+            "project": "test_project",
+        }
+        self.recurrence_data = {
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "status": "completed",
+            "end": "20180708T085429Z",
+            "due": "20180708T010000Z",
+            "r": "1w",
+            "rparent": "012339c8-a8fe-41da-82db-a990f989237e",
+        }
+        self.tw = MagicMock()
+
+    def fake_export(self, output, returncode=0):
+        '''Makes the backend run a command that prints output instead of
+        task export'''
+
+        self.tw._get_command_args.return_value = [
+            sys.executable,
+            '-c',
+            'import sys; sys.stdout.write({!r}); sys.stderr.write("error");'
+            'sys.exit({})'.format(output, returncode),
+        ]
+
+    def test_parse_keeps_only_recurrence_fields(self):
+        lines = [json.dumps(self.task_data)]
+        self.assertEqual(
+            list(parse_export_lines(lines)),
+            [self.recurrence_data],
+        )
+
+    def test_parse_understands_array_output(self):
+        lines = [
+            '[',
+            json.dumps(self.task_data) + ',',
+            json.dumps(self.task_data),
+            ']',
+        ]
+        self.assertEqual(
+            list(parse_export_lines(lines)),
+            [self.recurrence_data] * 2,
+        )
+
+    def test_parse_understands_single_line_array_output(self):
+        lines = ['[' + json.dumps(self.task_data) + ']']
+        self.assertEqual(
+            list(parse_export_lines(lines)),
+            [self.recurrence_data],
+        )
+
+    def test_parse_accepts_custom_fields(self):
+        lines = [json.dumps(self.task_data).encode('utf-8')]
+        self.assertEqual(
+            list(parse_export_lines(lines, fields=['uuid', 'project'])),
+            [{
+                'uuid': self.task_data['uuid'],
+                'project': self.task_data['project'],
+            }],
+        )
+
+    def test_stream_export_yields_tasks(self):
+        self.fake_export(
+            json.dumps(self.task_data) + '\n' + json.dumps(self.task_data)
+        )
+
+        tasks = list(stream_export(self.tw, ['rparent.any:']))
+
+        self.tw._get_command_args.assert_called_with(
+            ['export', 'rparent.any:']
+        )
+        self.assertEqual(tasks, [self.recurrence_data] * 2)
+
+    def test_stream_export_raises_if_task_fails(self):
+        self.fake_export('', returncode=2)
+
+        with self.assertRaises(TaskWarriorException):
+            list(stream_export(self.tw))
+
+    def test_parse_keeps_whole_task_without_fields(self):
+        lines = [json.dumps(self.task_data)]
+        self.assertEqual(
+            list(parse_export_lines(lines, fields=None)),
+            [self.task_data],
+        )
+
+    def test_uuid_chunks_are_sorted_unique_and_bounded(self):
+        uuids = ['{:03}'.format(number) for number in range(250)]
+        chunks = list(uuid_chunks(uuids + uuids))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [100, 100, 50])
+        self.assertEqual(chunks[0][0], '000')
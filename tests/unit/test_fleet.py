@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from taskwarrior_recurrence.fleet import \
+    Fleet, glob_locations, load_manifest, summarize
+
+
+def fake_report(taskrc, data_location, check, concurrency, full):
+    return {
+        'parents': 2,
+        'broken': [('parent', 'child')],
+        'missing': [],
+        'repaired': [] if check else [('parent', 'description')],
+        'failed': [],
+        'elapsed': 0.1,
+        'throughput': 20.0,
+    }
+
+
+def slow_report(taskrc, data_location, check, concurrency, full):
+    if data_location.endswith('slow'):
+        time.sleep(10)
+    return fake_report(taskrc, data_location, check, concurrency, full)
+
+
+def failing_report(taskrc, data_location, check, concurrency, full):
+    raise ValueError('broken data location')
+
+
+class TestLocations(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_load_manifest(self):
+        path = os.path.join(self.temp_dir, 'manifest.json')
+        with open(path, 'w') as f:
+            json.dump([{'taskrc': '/a/.taskrc', 'data': '/a/.task'}], f)
+
+        self.assertEqual(load_manifest(path), [('/a/.taskrc', '/a/.task')])
+
+    def test_glob_locations_skips_directories_without_data(self):
+        for user in ['alice', 'bob']:
+            os.mkdir(os.path.join(self.temp_dir, user))
+        os.mkdir(os.path.join(self.temp_dir, 'alice', '.task'))
+
+        self.assertEqual(
+            glob_locations(os.path.join(self.temp_dir, '*')),
+            [(
+                os.path.join(self.temp_dir, 'alice', '.taskrc'),
+                os.path.join(self.temp_dir, 'alice', '.task'),
+            )],
+        )
+
+
+class TestFleet(unittest.TestCase):
+    def setUp(self):
+        self.locations = [
+            ('/home/alice/.taskrc', '/home/alice/.task'),
+            ('/home/bob/.taskrc', '/home/bob/.task'),
+        ]
+
+    @patch('taskwarrior_recurrence.fleet.process_location', fake_report)
+    def test_run_merges_the_reports(self):
+        summary = Fleet(self.locations, workers=2).run()
+
+        self.assertEqual(summary['totals']['locations'], 2)
+        self.assertEqual(summary['totals']['ok'], 2)
+        self.assertEqual(summary['totals']['parents'], 4)
+        self.assertEqual(summary['totals']['repaired'], 2)
+        self.assertEqual(
+            [location['data'] for location in summary['locations']],
+            ['/home/alice/.task', '/home/bob/.task'],
+        )
+
+    @patch('taskwarrior_recurrence.fleet.process_location', fake_report)
+    def test_check_doesnt_repair(self):
+        summary = Fleet(self.locations, workers=1, check=True).run()
+
+        self.assertEqual(summary['totals']['broken'], 2)
+        self.assertEqual(summary['totals']['repaired'], 0)
+
+    @patch('taskwarrior_recurrence.fleet.process_location', slow_report)
+    def test_slow_locations_time_out(self):
+        self.locations.append(('/home/slow/.taskrc', '/home/slow'))
+
+        summary = Fleet(self.locations, workers=3, timeout=1).run()
+
+        self.assertEqual(summary['totals']['ok'], 2)
+        self.assertEqual(summary['totals']['timeout'], 1)
+        self.assertTrue(summary['elapsed'] < 5)
+
+    @patch('taskwarrior_recurrence.fleet.process_location', failing_report)
+    def test_errors_are_reported(self):
+        summary = Fleet(self.locations[:1]).run()
+
+        self.assertEqual(summary['totals']['error'], 1)
+        self.assertEqual(
+            summary['locations'][0]['error'],
+            'broken data location',
+        )
+
+
+class TestSummarize(unittest.TestCase):
+    def test_empty_summary(self):
+        summary = summarize([], 0)
+        self.assertEqual(summary['totals']['locations'], 0)
+        self.assertEqual(summary['locations'], [])
@@ -0,0 +1,233 @@
+import shutil
+import sqlite3
+import datetime
+import tempfile
+import unittest
+
+from taskwarrior_recurrence.index import RecurrenceIndex, open_index
+
+
+class TestRecurrenceIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index = RecurrenceIndex(self.temp_dir)
+        self.parent_data = {
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "status": "recurring",
+            "due": "20180701T010000Z",
+            "r": "1w",
+            "rtype": "periodic",
+            "rlastinstance": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+        }
+        self.child_data = {
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "status": "pending",
+            "due": "20180708T010000Z",
+            "r": "1w",
+            "rparent": "012339c8-a8fe-41da-82db-a990f989237e",
+        }
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_open_index_returns_none_if_not_created(self):
+        self.assertEqual(open_index(self.temp_dir + '/missing'), None)
+
+    def test_open_index_returns_existing_index(self):
+        index = open_index(self.temp_dir)
+        self.assertTrue(isinstance(index, RecurrenceIndex))
+        index.close()
+
+    def test_new_index_is_stale(self):
+        self.assertTrue(self.index.stale)
+
+    def test_reindex_stores_the_tasks(self):
+        self.index.reindex([self.parent_data, self.child_data])
+
+        self.assertFalse(self.index.stale)
+        self.assertEqual(
+            self.index.children(self.parent_data['uuid']),
+            [self.child_data['uuid']],
+        )
+
+    def test_reindex_removes_previous_tasks(self):
+        self.index.update(self.child_data)
+        self.index.reindex([self.parent_data])
+
+        self.assertEqual(self.index.children(self.parent_data['uuid']), [])
+
+    def test_mark_stale(self):
+        self.index.reindex([])
+        self.index.mark_stale()
+        self.assertTrue(self.index.stale)
+
+    def test_update_replaces_the_task(self):
+        self.index.update(self.child_data)
+        self.child_data['status'] = 'completed'
+        self.index.update(self.child_data)
+
+        self.assertEqual(
+            self.index.children(self.parent_data['uuid'], status='pending'),
+            [],
+        )
+        self.assertEqual(
+            self.index.children(self.parent_data['uuid'], status='completed'),
+            [self.child_data['uuid']],
+        )
+
+    def test_children_filtered_by_many_statuses(self):
+        waiting_child = dict(self.child_data)
+        waiting_child['uuid'] = 'b8e4a3a4-3a0b-4ac5-a89e-1b4f5b4bd2a6'
+        waiting_child['status'] = 'waiting'
+        completed_child = dict(self.child_data)
+        completed_child['uuid'] = '7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f'
+        completed_child['status'] = 'completed'
+        for task in [self.child_data, waiting_child, completed_child]:
+            self.index.update(task)
+
+        self.assertEqual(
+            sorted(self.index.children(
+                self.parent_data['uuid'],
+                status=['pending', 'waiting'],
+            )),
+            sorted([self.child_data['uuid'], waiting_child['uuid']]),
+        )
+
+    def test_update_fields_changes_indexed_task(self):
+        self.index.update(self.child_data)
+
+        self.index.update_fields(
+            self.child_data['uuid'],
+            {'status': 'completed', 'description': 'not indexed'},
+        )
+
+        self.assertEqual(
+            self.index.children(self.parent_data['uuid'], status='completed'),
+            [self.child_data['uuid']],
+        )
+
+    def test_children_are_sorted_by_due(self):
+        later_child = dict(self.child_data)
+        later_child['uuid'] = 'b8e4a3a4-3a0b-4ac5-a89e-1b4f5b4bd2a6'
+        later_child['due'] = '20180715T010000Z'
+        self.index.update(later_child)
+        self.index.update(self.child_data)
+
+        self.assertEqual(
+            self.index.children(self.parent_data['uuid']),
+            [self.child_data['uuid'], later_child['uuid']],
+        )
+
+    def test_occurrence_exists_by_uuid(self):
+        self.index.update(self.child_data)
+        self.assertTrue(self.index.occurrence_exists(
+            'other parent',
+            self.child_data['uuid'],
+            '20180101T000000Z',
+        ))
+
+    def test_occurrence_exists_by_parent_and_due(self):
+        self.index.update(self.child_data)
+        self.assertEqual(
+            self.index.occurrence_exists(
+                self.parent_data['uuid'],
+                'other uuid',
+                '20180708T010000Z',
+            ),
+            self.child_data['uuid'],
+        )
+        self.assertFalse(self.index.occurrence_exists(
+            self.parent_data['uuid'],
+            'other uuid',
+            '20180715T010000Z',
+        ))
+
+    def test_update_understands_datetimes(self):
+        self.child_data['due'] = datetime.datetime(
+            2018, 7, 8, 1, 0, 0, tzinfo=datetime.timezone.utc,
+        )
+        self.index.update(self.child_data)
+        self.assertTrue(self.index.occurrence_exists(
+            self.parent_data['uuid'],
+            'other uuid',
+            '20180708T010000Z',
+        ))
+
+    def test_index_is_persisted(self):
+        self.index.reindex([self.parent_data, self.child_data])
+        index = RecurrenceIndex(self.temp_dir)
+
+        self.assertFalse(index.stale)
+        self.assertEqual(
+            index.children(self.parent_data['uuid']),
+            [self.child_data['uuid']],
+        )
+        index.close()
+
+    def test_remove_deletes_tasks(self):
+        self.index.reindex([self.parent_data, self.child_data])
+
+        self.index.remove([self.child_data['uuid']])
+
+        self.assertEqual(self.index.children(self.parent_data['uuid']), [])
+
+    def test_expired_returns_pending_children_past_their_expiry(self):
+        self.child_data['rexpiry'] = '20180709T010000Z'
+        self.index.reindex([self.parent_data, self.child_data])
+
+        self.assertEqual(self.index.expired(1531097999), [])
+        self.assertEqual(
+            self.index.expired(1531098000),
+            [self.child_data['uuid']],
+        )
+
+    def test_parent_modified(self):
+        self.parent_data['modified'] = '20180702T010000Z'
+        self.index.update(self.parent_data)
+
+        self.assertEqual(
+            self.index.parent_modified(self.parent_data['uuid']),
+            1530493200,
+        )
+        self.assertIsNone(self.index.parent_modified('other parent'))
+
+    def test_index_without_parent_modified_is_migrated_and_stale(self):
+        self.index.close()
+        connection = sqlite3.connect(self.index.path)
+        connection.executescript(
+            'DROP TABLE parents;'
+            'CREATE TABLE parents ('
+            'uuid TEXT PRIMARY KEY, rtype TEXT, r TEXT, due INTEGER, '
+            'status TEXT, rlastinstance TEXT);'
+            "INSERT OR REPLACE INTO meta VALUES ('indexed', '1');"
+        )
+        connection.close()
+
+        self.index = RecurrenceIndex(self.temp_dir)
+
+        self.assertTrue(self.index.stale)
+        self.parent_data['modified'] = '20180702T010000Z'
+        self.index.reindex([self.parent_data])
+        self.assertEqual(
+            self.index.parent_modified(self.parent_data['uuid']),
+            1530493200,
+        )
+
+    def test_old_index_is_migrated_and_stale(self):
+        self.index.close()
+        connection = sqlite3.connect(self.index.path)
+        connection.executescript(
+            'DROP TABLE children;'
+            'CREATE TABLE children ('
+            'uuid TEXT PRIMARY KEY, rparent TEXT NOT NULL, due INTEGER, '
+            'status TEXT);'
+            "INSERT OR REPLACE INTO meta VALUES ('indexed', '1');"
+        )
+        connection.close()
+
+        self.index = RecurrenceIndex(self.temp_dir)
+
+        self.assertTrue(self.index.stale)
+        self.index.reindex([self.parent_data, self.child_data])
+        self.assertEqual(self.index.expired(1531098000), [])
@@ -0,0 +1,79 @@
+import time
+import shutil
+import tempfile
+import unittest
+import subprocess
+import sys
+
+from taskwarrior_recurrence.deferred import BudgetExceeded
+from taskwarrior_recurrence.lock import RecurrenceLock, load_stats
+
+
+class TestRecurrenceLock(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.lock = RecurrenceLock(self.temp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def hold_in_other_process(self, seconds):
+        '''Starts a process that holds the lock for seconds and returns once
+        it's holding it'''
+
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                '-c',
+                'import sys, time\n'
+                'from taskwarrior_recurrence.lock import RecurrenceLock\n'
+                'with RecurrenceLock(sys.argv[1]).hold():\n'
+                '    print("held", flush=True)\n'
+                '    time.sleep(float(sys.argv[2]))\n',
+                self.temp_dir,
+                str(seconds),
+            ],
+            stdout=subprocess.PIPE,
+        )
+        self.addCleanup(process.wait)
+        self.addCleanup(process.stdout.close)
+        process.stdout.readline()
+        return process
+
+    def test_uncontended_acquisitions_are_counted(self):
+        with self.lock.hold():
+            pass
+        with self.lock.hold():
+            pass
+
+        stats = load_stats(self.temp_dir)
+        self.assertEqual(stats['acquisitions'], 2)
+        self.assertEqual(stats['contended'], 0)
+
+    def test_lock_is_reentrant(self):
+        with self.lock.hold():
+            with self.lock.hold():
+                pass
+
+        self.assertEqual(load_stats(self.temp_dir)['acquisitions'], 1)
+
+    def test_waits_for_other_process(self):
+        self.hold_in_other_process(0.2)
+
+        start = time.monotonic()
+        with self.lock.hold():
+            waited = time.monotonic() - start
+
+        self.assertGreater(waited, 0.1)
+        stats = load_stats(self.temp_dir)
+        self.assertEqual(stats['contended'], 1)
+        self.assertGreater(stats['wait_max'], 0.1)
+
+    def test_raises_budget_exceeded_if_deadline_is_reached(self):
+        self.hold_in_other_process(1)
+
+        with self.assertRaises(BudgetExceeded):
+            with self.lock.hold(deadline=time.time() + 0.05):
+                pass
+
+        self.assertEqual(self.lock._file, None)
@@ -1,15 +1,18 @@
 import os
 import json
 import tasklib
-import tzlocal
 import datetime
 import unittest
 import tempfile
 import shutil
 from tasklib.task import Task
-from unittest.mock import patch, call
+from unittest.mock import patch, call, ANY, MagicMock
 
-from taskwarrior_recurrence.main import ProcessRecurrentTask
+from taskwarrior_recurrence.clock import FixedClock, get_local_zone, localize
+from taskwarrior_recurrence.deferred import BudgetExceeded
+from taskwarrior_recurrence.main import \
+    ProcessRecurrentTask, child_uuid, occurrence_key
+from taskwarrior_recurrence.plan import RecurrencePlan
 
 
 class TestProcessRecurrentTask(unittest.TestCase):
@@ -18,6 +21,10 @@ class TestProcessRecurrentTask(unittest.TestCase):
         self.print = self.print_patch.start()
         self.tasklib_patch = patch('taskwarrior_recurrence.main.tasklib')
         self.tasklib = self.tasklib_patch.start()
+        self.plan_child_patch = patch(
+            'taskwarrior_recurrence.main.ProcessRecurrentTask._plan_child'
+        )
+        self.plan_child = self.plan_child_patch.start()
         self.task = self.tasklib.task.Task.from_input.return_value
 
         self.task_data = {
@@ -29,6 +36,13 @@ class TestProcessRecurrentTask(unittest.TestCase):
             "rtype": "chained",
             "due": '20180808T085429Z',
             "r": '3d',
+            "rwait": None,
+            "rscheduled": None,
+            "rwaitoffset": None,
+            "rscheduledoffset": None,
+            "rexcept": None,
+            "rahead": None,
+            "runtil": None,
             "project": 'test_project',
             "myuda": 'udavalue',
         }
@@ -38,6 +52,7 @@ class TestProcessRecurrentTask(unittest.TestCase):
         self.prt = ProcessRecurrentTask(self.task)
 
     def tearDown(self):
+        self.plan_child_patch.stop()
         self.tasklib_patch.stop()
         self.print_patch.stop()
 
@@ -93,13 +108,27 @@ class TestProcessRecurrentTask(unittest.TestCase):
         self.prt.add_recurrent_task()
         self.assertEqual(
             copyMock.mock_calls[0],
-            call(pop=['rtype']),
+            call(pop=['rtype', 'rexcept', 'rahead', 'runtil']),
         )
         self.assertEqual(
             copyMock.return_value.__setitem__.mock_calls,
-            [call('rparent', self.task['uuid'])]
+            [
+                call('rparent', self.task['uuid']),
+                call(
+                    'rspec',
+                    'recurring;chained;3d;20180808T085429Z;;;;;;'
+                    '20180806T085429Z',
+                ),
+            ]
+        )
+        self.assertEqual(
+            self.plan_child.mock_calls[0],
+            call(
+                ANY,
+                copyMock.return_value,
+                child_uuid(self.task['uuid'], self.task['due']),
+            ),
         )
-        self.assertTrue(copyMock.return_value.save.called)
 
     def test_add_recurrent_sets_recur_to_r_in_parent(self):
         parent_task = self.prt.add_recurrent_task()
@@ -143,7 +172,7 @@ class TestProcessRecurrentTask(unittest.TestCase):
             call('due', self.task['due'])
             in new_task.__setitem__.mock_calls
         )
-        self.assertTrue(len(new_task.__setitem__.mock_calls) == 6)
+        self.assertTrue(len(new_task.__setitem__.mock_calls) == 13)
         self.assertTrue(returned_task == self.tasklib.Task.return_value)
 
     def test_copy_task_can_accept_pop_list(self):
@@ -163,9 +192,257 @@ class TestProcessRecurrentTask(unittest.TestCase):
             in new_task.__setitem__.mock_calls
         )
 
+    def test_add_recurrent_sets_rspec_in_child(self):
+        self.prt.add_recurrent_task()
+        child_task = self.tasklib.Task.return_value
+        self.assertTrue(
+            call(
+                'rspec',
+                'recurring;chained;3d;20180808T085429Z;;;;;;20180806T085429Z',
+            )
+            in child_task.__setitem__.mock_calls
+        )
+
+    def test_propagate_spec_updates_living_children(self):
+        self.task_data['status'] = 'deleted'
+        self.task.export_data.return_value = json.dumps(self.task_data)
+        child_task = MagicMock()
+        child_task.export_data.return_value = json.dumps({
+            'uuid': '7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f',
+            'status': 'pending',
+            'description': 'Old description',
+            'priority': 'H',
+            'due': '20180811T085429Z',
+            'wait': '20180810T085429Z',
+            'rparent': '3f0a43d0-a713-4ebe-9e5c-b1facf49f078',
+            'rspec': 'recurring;chained;3d;20180808T085429Z;;;;;;',
+        })
+        self.task.backend.tasks.filter.return_value = [child_task]
+
+        with patch('taskwarrior_recurrence.main.import_tasks') as import_tasks:
+            self.prt.propagate_spec()
+
+        self.task.backend.tasks.filter.assert_called_once_with(
+            '( rparent:3f0a43d0-a713-4ebe-9e5c-b1facf49f078 and '
+            '( status:pending or status:waiting ) )'
+        )
+        import_tasks.assert_called_once_with(
+            self.task.backend,
+            [{
+                'uuid': '7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f',
+                'status': 'pending',
+                'description': 'This is a chained recurring task',
+                'due': '20180811T085429Z',
+                'wait': '20180810T085429Z',
+                'rparent': '3f0a43d0-a713-4ebe-9e5c-b1facf49f078',
+                'rspec': 'deleted;chained;3d;20180808T085429Z;;;;;;'
+                '20180806T085429Z',
+                'r': '3d',
+                'project': 'test_project',
+                'myuda': 'udavalue',
+            }],
+            None,
+        )
+
+    def test_propagate_spec_without_living_children_doesnt_import(self):
+        self.task.export_data.return_value = json.dumps(self.task_data)
+        self.task.backend.tasks.filter.return_value = []
+
+        with patch('taskwarrior_recurrence.main.import_tasks') as import_tasks:
+            self.prt.propagate_spec()
+
+        self.assertFalse(import_tasks.called)
+        self.assertFalse(self.task.backend.execute_command.called)
+
+    def test_propagate_spec_updates_changed_offsets_in_parent(self):
+        self.task_data['due'] = datetime.datetime(2018, 8, 8, 8, 54, 29)
+        self.task_data['rwait'] = datetime.datetime(2018, 8, 7, 8, 54, 29)
+        self.task.export_data.return_value = '{}'
+        self.task.backend.tasks.filter.return_value = []
+
+        self.prt.propagate_spec()
+
+        self.assertEqual(
+            self.task.backend.execute_command.mock_calls[0],
+            call(
+                ['3f0a43d0-a713-4ebe-9e5c-b1facf49f078',
+                 'modify',
+                 'rwaitoffset:86400'],
+                config_override={'hooks': 'off'},
+            ),
+        )
+
+    def test_first_iteration_is_moved_back_past_longer_periods(self):
+        due = datetime.datetime(2037, 2, 1, tzinfo=datetime.timezone.utc)
+
+        def month_due(parent_task, iteration):
+            month = due.month - 1 + iteration
+            return due.replace(
+                year=due.year + month // 12,
+                month=month % 12 + 1,
+            )
+
+        with patch.object(
+            self.prt,
+            '_occurrence_due',
+            side_effect=month_due,
+        ) as occurrence_due:
+            # February is shorter than the rest, so the estimate is too big
+            iteration = self.prt._first_iteration(
+                {'due': due, 'r': '1mo'},
+                month_due(None, 24),
+            )
+
+        self.assertEqual(iteration, 24)
+        self.assertLess(occurrence_due.call_count, 5)
+
+    def test_first_iteration_of_the_parent_due(self):
+        due = datetime.datetime(2037, 2, 1, tzinfo=datetime.timezone.utc)
+
+        self.assertEqual(
+            self.prt._first_iteration({'due': due, 'r': '1mo'}, due),
+            1,
+        )
+
     def test_copy_task_doesnt_fail_if_element_doesnt_exist(self):
         self.prt._copy_task(pop=['unexistent_field'])
 
+    def test_load_occurrences_scans_the_data_files(self):
+        parent_uuid = '012339c8-a8fe-41da-82db-a990f989237e'
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        with open(os.path.join(temp_dir, 'pending.data'), 'w') as f:
+            for task_uuid, due in [('old', 1533459269), ('new', 1533977669)]:
+                f.write(
+                    '[due:"{}" rparent:"{}" status:"pending" uuid:"{}"]\n'
+                    .format(due, parent_uuid, task_uuid)
+                )
+        self.task.backend.overrides = {'data.location': temp_dir}
+
+        occurrences = self.prt._load_occurrences(
+            {'uuid': parent_uuid},
+            query=False,
+        )
+
+        self.assertEqual(
+            occurrences,
+            ({'new'}, {'20180811T085429Z': 'new'}),
+        )
+        self.assertFalse(self.task.backend.tasks.filter.called)
+
+    def test_load_occurrences_without_data_files_can_skip_the_query(self):
+        occurrences = self.prt._load_occurrences(
+            {'uuid': '012339c8-a8fe-41da-82db-a990f989237e'},
+            query=False,
+        )
+
+        self.assertIsNone(occurrences)
+        self.assertFalse(self.task.backend.tasks.filter.called)
+
+
+class TestDeterministicChildren(unittest.TestCase):
+    def setUp(self):
+        self.parent_uuid = '012339c8-a8fe-41da-82db-a990f989237e'
+        self.tw = MagicMock()
+        self.task = tasklib.Task(
+            self.tw,
+            description='This is a periodic recurring task',
+            rparent=self.parent_uuid,
+        )
+        self.prt = ProcessRecurrentTask(self.task)
+
+    def test_occurrence_key_is_the_utc_due(self):
+        due = datetime.datetime(
+            2018, 8, 8, 1, 0, 0,
+            tzinfo=datetime.timezone(datetime.timedelta(hours=2)),
+        )
+        self.assertEqual(occurrence_key(due), '20180807T230000Z')
+
+    def test_child_uuid_is_deterministic(self):
+        self.assertEqual(
+            child_uuid(self.parent_uuid, '20180807T230000Z'),
+            child_uuid(self.parent_uuid, '20180807T230000Z'),
+        )
+
+    def test_child_uuid_changes_with_occurrence(self):
+        self.assertNotEqual(
+            child_uuid(self.parent_uuid, '20180807T230000Z'),
+            child_uuid(self.parent_uuid, '20180814T230000Z'),
+        )
+
+    def test_plan_child_plans_task_with_uuid(self):
+        plan = RecurrencePlan()
+        task_uuid = child_uuid(self.parent_uuid, '20180807T230000Z')
+
+        self.prt._plan_child(plan, self.task, task_uuid)
+
+        self.assertEqual(plan.create[0]['uuid'], task_uuid)
+        self.assertEqual(plan.create[0]['status'], 'pending')
+        self.assertEqual(plan.create[0]['rparent'], self.parent_uuid)
+        self.assertEqual(self.task['uuid'], task_uuid)
+        self.assertFalse(self.tw.execute_command.called)
+
+    def test_occurrence_exists_uses_fresh_index(self):
+        self.prt.index = MagicMock()
+        self.prt.index.stale = False
+
+        self.prt._occurrence_exists('child uuid', '20180807T230000Z')
+
+        self.prt.index.occurrence_exists.assert_called_once_with(
+            self.task['rparent'],
+            'child uuid',
+            '20180807T230000Z',
+        )
+        self.assertEqual(self.tw.tasks.filter.call_count, 0)
+
+    def test_occurrence_exists_ignores_stale_index(self):
+        self.prt.index = MagicMock()
+        self.prt.index.stale = True
+        self.tw.tasks.filter.return_value = []
+
+        self.assertIsNone(
+            self.prt._occurrence_exists('child uuid', '20180807T230000Z')
+        )
+        self.assertEqual(self.prt.index.occurrence_exists.call_count, 0)
+
+    def test_occurrence_exists_queries_uuid_and_legacy_children(self):
+        self.tw.tasks.filter.return_value = []
+
+        exists = self.prt._occurrence_exists('uuid', '20180807T230000Z')
+
+        self.assertIsNone(exists)
+        self.tw.tasks.filter.assert_called_with(
+            '( uuid:uuid or ( rparent:{} and due:20180807T230000Z ) )'.format(
+                self.parent_uuid
+            )
+        )
+
+    def test_occurrence_exists_returns_the_uuid_of_legacy_children(self):
+        self.tw.tasks.filter.return_value = [{'uuid': 'legacy uuid'}]
+
+        self.assertEqual(
+            self.prt._occurrence_exists('uuid', '20180807T230000Z'),
+            'legacy uuid',
+        )
+
+    def test_loaded_occurrences_return_the_uuid_of_legacy_children(self):
+        self.prt._occurrences = (
+            {'uuid', 'legacy uuid'},
+            {'20180807T230000Z': 'legacy uuid'},
+        )
+
+        self.assertEqual(
+            self.prt._occurrence_exists('uuid', '20180807T230000Z'),
+            'uuid',
+        )
+        self.assertEqual(
+            self.prt._occurrence_exists('other uuid', '20180807T230000Z'),
+            'legacy uuid',
+        )
+        self.assertIsNone(
+            self.prt._occurrence_exists('other uuid', '20180814T230000Z')
+        )
+
 
 class TestChildChainedTask(unittest.TestCase):
 
@@ -178,6 +455,10 @@ class TestChildChainedTask(unittest.TestCase):
             'taskwarrior_recurrence.main.ProcessRecurrentTask._copy_task'
         )
         self.copy_task = self.copy_task_patch.start()
+        self.plan_child_patch = patch(
+            'taskwarrior_recurrence.main.ProcessRecurrentTask._plan_child'
+        )
+        self.plan_child = self.plan_child_patch.start()
 
         self.input_patch = patch('taskwarrior_recurrence.main.input')
         self.input = self.input_patch.start()
@@ -198,6 +479,7 @@ class TestChildChainedTask(unittest.TestCase):
             ),
             "r": '3d',
             "rparent": "012339c8-a8fe-41da-82db-a990f989237e",
+            "rspec": None,
             "project": 'test_project',
             "myuda": 'udavalue',
         }
@@ -217,6 +499,11 @@ class TestChildChainedTask(unittest.TestCase):
             ),
             "rwait": None,
             "rscheduled": None,
+            "rwaitoffset": None,
+            "rscheduledoffset": None,
+            "rexcept": None,
+            "rahead": None,
+            "runtil": None,
             "r": '3d',
             'rtype': 'chained',
             "recur": '3d',
@@ -236,6 +523,7 @@ class TestChildChainedTask(unittest.TestCase):
         self.input_patch.stop()
         self.tasklib_patch.stop()
         self.copy_task_patch.stop()
+        self.plan_child_patch.stop()
         self.print_patch.stop()
 
     def test_delete_recurrent_task_deletes_child(self):
@@ -253,10 +541,37 @@ class TestChildChainedTask(unittest.TestCase):
         }
         self.task.__getitem__.side_effect = self.task_data.__getitem__
         self.task._data.copy.return_value = self.task_data.copy()
+        self.task.backend.tasks.filter.return_value = [
+            {'uuid': self.task_data['rlastinstance']},
+        ]
         self.prt = ProcessRecurrentTask(self.task)
         self.prt.delete_child_task()
-        self.assertTrue(self.task.backend.tasks.get.called)
-        self.assertTrue(self.task.backend.tasks.get.return_value.delete.called)
+        self.task.backend.tasks.filter.assert_called_with(
+            '( rparent:{} and ( status:pending or status:waiting ) )'.format(
+                self.task_data['uuid'],
+            )
+        )
+        self.task.backend.execute_command.assert_called_with(
+            [self.task_data['rlastinstance'], 'delete'],
+        )
+
+    def test_delete_recurrent_task_uses_fresh_index(self):
+        self.prt.index = MagicMock()
+        self.prt.index.stale = False
+        self.prt.index.children.return_value = ['first', 'second']
+        self.prt.executor.index = self.prt.index
+
+        self.prt.delete_child_task()
+
+        self.prt.index.children.assert_called_once_with(
+            self.task_data['uuid'],
+            status=['pending', 'waiting'],
+        )
+        self.assertFalse(self.task.backend.tasks.filter.called)
+        self.assertEqual(
+            self.task.backend.execute_command.mock_calls,
+            [call(['first', 'delete']), call(['second', 'delete'])],
+        )
 
     def test_synthetize_next_chained_creates_new_clean_task(self):
         self.prt.synthetize_next_chained()
@@ -268,11 +583,24 @@ class TestChildChainedTask(unittest.TestCase):
                 'recur',
                 'rlastinstance',
                 'status',
-                'end'
+                'end',
+                'rexcept',
+                'rahead',
+                'runtil',
             ], task=self.parent_task
             ),
         )
-        self.assertTrue(self.copy_task.return_value.save.called)
+        self.assertEqual(
+            self.plan_child.mock_calls[0],
+            call(
+                ANY,
+                self.copy_task.return_value,
+                child_uuid(
+                    self.parent_task_data['uuid'],
+                    'after:' + self.task_data['uuid'],
+                ),
+            ),
+        )
 
     def test_synthetize_next_chained_doesnt_create_task_if_parent_dead(self):
         self.parent_task_data = {
@@ -287,6 +615,11 @@ class TestChildChainedTask(unittest.TestCase):
             ),
             "rwait": None,
             "rscheduled": None,
+            "rwaitoffset": None,
+            "rscheduledoffset": None,
+            "rexcept": None,
+            "rahead": None,
+            "runtil": None,
             "r": '3d',
             "recur": '3d',
             "rlastinstance": self.task_data['uuid'],
@@ -301,7 +634,7 @@ class TestChildChainedTask(unittest.TestCase):
         self.parent_task._data.copy.return_value = self.parent_task_data.copy()
         self.prt.synthetize_next_chained()
 
-        self.assertFalse(self.copy_task.return_value.save.called)
+        self.assertFalse(self.plan_child.called)
 
     def test_synthetize_next_chained_doesnt_create_task_if_parent_done(self):
         self.parent_task_data = {
@@ -316,6 +649,11 @@ class TestChildChainedTask(unittest.TestCase):
             ),
             "rwait": None,
             "rscheduled": None,
+            "rwaitoffset": None,
+            "rscheduledoffset": None,
+            "rexcept": None,
+            "rahead": None,
+            "runtil": None,
             "r": '3d',
             "recur": '3d',
             "rlastinstance": self.task_data['uuid'],
@@ -330,7 +668,7 @@ class TestChildChainedTask(unittest.TestCase):
         self.parent_task._data.copy.return_value = self.parent_task_data.copy()
         self.prt.synthetize_next_chained()
 
-        self.assertFalse(self.copy_task.return_value.save.called)
+        self.assertFalse(self.plan_child.called)
 
     def test_synthetize_next_chained_sets_rparent_on_child(self):
         self.prt.synthetize_next_chained()
@@ -366,10 +704,10 @@ class TestChildChainedTask(unittest.TestCase):
         # instance.wait: new_instance.due - (template.due - template.wait)
         self.assertTrue(
             call(
-                'wait', '{} - ({} - {})'.format(
-                    next_task_due.isoformat(),
-                    self.parent_task_data['due'].isoformat(),
-                    self.parent_task_data['rwait'].isoformat()
+                'wait',
+                next_task_due - (
+                    self.parent_task_data['due'] -
+                    self.parent_task_data['rwait']
                 )
             ) in
             next_task.__setitem__.mock_calls
@@ -393,20 +731,49 @@ class TestChildChainedTask(unittest.TestCase):
         # (template.due - template.scheduled)
         self.assertTrue(
             call(
-                'scheduled', '{} - ({} - {})'.format(
-                    next_task_due.isoformat(),
-                    self.parent_task_data['due'].isoformat(),
-                    self.parent_task_data['rscheduled'].isoformat()
+                'scheduled',
+                next_task_due - (
+                    self.parent_task_data['due'] -
+                    self.parent_task_data['rscheduled']
                 )
             ) in
             next_task.__setitem__.mock_calls
         )
 
+    def test_synthetize_next_chained_stores_offsets_in_parent(self):
+        self.parent_task_data['rwait'] = datetime.datetime.strptime(
+            '20180706T010000',
+            "%Y%m%dT%H%M%S",
+        )
+
+        self.prt.synthetize_next_chained()
+
+        self.assertEqual(self.parent_task_data['rwaitoffset'], 172800)
+        self.assertEqual(self.parent_task_data['rscheduledoffset'], None)
+
+    def test_synthetize_next_chained_shifts_wait_with_stored_offset(self):
+        self.parent_task_data['rwait'] = 'due - 2d'
+        self.parent_task_data['rwaitoffset'] = 172800
+        next_task_due = datetime.datetime.strptime(
+            '20180816T010000',
+            "%Y%m%dT%H%M%S",
+        )
+        next_task = self.copy_task.return_value
+        next_task.__getitem__.return_value = next_task_due
+
+        self.prt.synthetize_next_chained()
+
+        self.assertFalse(self.task.backend.convert_datetime_string.called)
+        self.assertTrue(
+            call('wait', datetime.datetime(2018, 8, 14, 1, 0)) in
+            next_task.__setitem__.mock_calls
+        )
+
     def test_synthetize_next_chained_doesnt_wait_or_schedule_if_not_set(self):
         next_task = self.copy_task.return_value
         self.prt.synthetize_next_chained()
-        # By default it only set's the due, rparent and r
-        self.assertEqual(len(next_task.__setitem__.mock_calls), 3)
+        # By default it only set's the due, rparent, rspec and r
+        self.assertEqual(len(next_task.__setitem__.mock_calls), 4)
 
     def test_synthetize_next_chained_updates_parent_last(self):
         self.copy_task.return_value.__getitem__.side_effect = \
@@ -422,11 +789,122 @@ class TestChildChainedTask(unittest.TestCase):
             parent_task.__setitem__.mock_calls,
             [call('rlastinstance', "3f0a43d0-a713-4ebe-9e5c-b1facf49f078")]
         )
-        self.assertTrue(parent_task.save.called)
+        self.task.backend.execute_command.assert_called_with(
+            [
+                self.parent_task_data['uuid'],
+                'modify',
+                'rlastinstance:3f0a43d0-a713-4ebe-9e5c-b1facf49f078',
+            ],
+            config_override={'hooks': 'off'},
+        )
+
+    def test_synthetize_next_chained_sets_rspec_on_child(self):
+        self.prt.synthetize_next_chained()
+
+        self.assertTrue(
+            call('rspec', 'recurring;chained;3d;{};;;;;;{}'.format(
+                occurrence_key(self.parent_task_data['due']),
+                self.parent_task_data['modified'],
+            )) in
+            self.copy_task.return_value.__setitem__.mock_calls,
+        )
+
+    def test_synthetize_next_chained_uses_child_rspec(self):
+        self.task_data['rspec'] = 'recurring;chained;3d;20180708T010000Z;;'
+
+        self.prt.synthetize_next_chained()
+
+        self.assertFalse(self.task.backend.tasks.get.called)
+        self.assertEqual(
+            self.copy_task.mock_calls[0],
+            call(pop=[
+                'due',
+                'recur',
+                'rlastinstance',
+                'status',
+                'end',
+                'rexcept',
+                'rahead',
+                'runtil',
+                'start',
+                'wait',
+                'scheduled',
+                'annotations',
+                'depends',
+                'rexpiry',
+            ]),
+        )
+        self.assertTrue(self.plan_child.called)
+
+    def test_synthetize_next_chained_doesnt_create_task_if_rspec_dead(self):
+        self.task_data['rspec'] = 'deleted;chained;3d;20180708T010000Z;;'
+
+        self.prt.synthetize_next_chained()
+
+        self.assertFalse(self.plan_child.called)
+
+    def test_rspec_is_used_if_the_index_has_the_same_parent(self):
+        self.task_data['rspec'] = \
+            'recurring;chained;3d;20180708T010000Z;;;;;;20180706T085429Z'
+        self.prt.index = MagicMock()
+        self.prt.index.stale = False
+        self.prt.index.parent_modified.return_value = 1530867269
+
+        self.prt._get_parent()
+
+        self.prt.index.parent_modified.assert_called_once_with(
+            self.task_data['rparent'],
+        )
+        self.assertFalse(self.task.backend.tasks.get.called)
+
+    def test_parent_is_queried_if_it_changed_since_the_rspec(self):
+        self.task_data['rspec'] = \
+            'recurring;chained;3d;20180708T010000Z;;;;;;20180706T085429Z'
+        self.prt.index = MagicMock()
+        self.prt.index.stale = False
+        self.prt.index.parent_modified.return_value = 1530867300
+
+        self.assertEqual(self.prt._get_parent(), self.parent_task)
+
+    def test_parent_is_queried_if_the_index_is_stale(self):
+        self.task_data['rspec'] = \
+            'recurring;chained;3d;20180708T010000Z;;;;;;20180706T085429Z'
+        self.prt.index = MagicMock()
+        self.prt.index.stale = True
+
+        self.assertEqual(self.prt._get_parent(), self.parent_task)
+
+    def test_plan_next_chained_doesnt_change_tasks(self):
+        self.copy_task.return_value.__getitem__.side_effect = \
+            self.task_data.__getitem__
+
+        plan = self.prt.plan_next_chained()
+
+        self.assertEqual(
+            plan.update,
+            {self.parent_task_data['uuid']: {
+                'rlastinstance': self.task_data['uuid'],
+            }},
+        )
+        self.assertFalse(self.task.backend.execute_command.called)
+
+    def test_synthetize_next_chained_uses_executor(self):
+        self.prt.executor = MagicMock()
+
+        self.prt.synthetize_next_chained()
+
+        plan = self.prt.executor.execute.call_args[0][0]
+        self.assertEqual(list(plan.update), [self.parent_task_data['uuid']])
+        self.assertFalse(self.task.backend.execute_command.called)
+
+    def test_synthetize_next_child_queries_parent_once(self):
+        self.prt.synthetize_next_child()
+
+        self.assertEqual(self.task.backend.tasks.get.call_count, 1)
 
     @patch(
         'taskwarrior_recurrence.main.ProcessRecurrentTask.'
-        'synthetize_next_chained'
+        'plan_next_chained'
     )
     def test_synthetize_next_child_on_chained_calls_chained_method(
         self,
@@ -435,14 +913,44 @@ class TestChildChainedTask(unittest.TestCase):
         self.prt.synthetize_next_child()
         self.assertTrue(chainedMock.called)
 
+    @patch(
+        'taskwarrior_recurrence.main.ProcessRecurrentTask.'
+        'synthetize_next_chained'
+    )
+    def test_synthetize_next_child_raises_if_deadline_is_reached(
+        self,
+        chainedMock,
+    ):
+        self.prt = ProcessRecurrentTask(self.task, deadline=0)
+
+        with self.assertRaises(BudgetExceeded):
+            self.prt.synthetize_next_child()
+
+        self.assertFalse(chainedMock.called)
+
+    def test_synthetize_next_chained_skips_existing_successor(self):
+        self.task.backend.tasks.filter.return_value = [MagicMock()]
+
+        self.prt.synthetize_next_chained()
+
+        self.assertFalse(self.copy_task.called)
+        self.assertFalse(self.plan_child.called)
+
+    def test_synthetize_next_chained_holds_the_lock(self):
+        lock = MagicMock()
+        self.prt = ProcessRecurrentTask(self.task, lock=lock)
+
+        self.prt.synthetize_next_chained()
+
+        lock.hold.assert_called_once_with(None)
+        self.assertTrue(lock.hold.return_value.__enter__.called)
+        self.assertTrue(self.plan_child.called)
+
 
 class TestChildPeriodicTask(unittest.TestCase):
 
     def setUp(self):
-        self.local_zone = tzlocal.get_localzone()
-
-        self.tzlocal_patch = patch('taskwarrior_recurrence.main.tzlocal')
-        self.tzlocal = self.tzlocal_patch.start()
+        self.local_zone = get_local_zone()
 
         self.temp_dir = tempfile.mkdtemp()
         shutil.copyfile('tests/files/taskrc', self.temp_dir + '/taskrc')
@@ -483,19 +991,20 @@ class TestChildPeriodicTask(unittest.TestCase):
         }
         self.parent_task = self.import_task(self.parent_task_data)
 
-        self.tzlocal.get_localzone.return_value.localize.return_value = \
-            self.local_zone.localize(
+        self.clock = FixedClock(
+            localize(
                 datetime.datetime.strptime(
                     self.task_data['end'],
                     '%Y%m%dT%H%M%S'
-                )
+                ),
+                self.local_zone,
             )
+        )
 
-        self.prt = ProcessRecurrentTask(self.task)
+        self.prt = ProcessRecurrentTask(self.task, clock=self.clock)
 
     def tearDown(self):
         shutil.rmtree(self.temp_dir)
-        self.tzlocal_patch.stop()
 
     def import_task(self, task_data):
         json_path = os.path.join(self.temp_dir, 'task_data.json')
@@ -600,14 +1109,15 @@ class TestChildPeriodicTask(unittest.TestCase):
     def test_synthetize_tasks_till_next_one_from_now(self):
         '''In this test we will assume that the current date is the completion
         of a child task, but there should be 3 new tasks'''
-        self.tzlocal.get_localzone.return_value.localize.return_value = \
-            self.local_zone.localize(
+        self.clock.set(
+            localize(
                 datetime.datetime.strptime(
                     '20370723T085429',
                     '%Y%m%dT%H%M%S',
-                )
+                ),
+                self.local_zone,
             )
-        self.prt = ProcessRecurrentTask(self.task)
+        )
         self.prt.synthetize_next_periodic()
 
         tasks = self.tw.tasks.filter(
@@ -730,7 +1240,7 @@ class TestChildPeriodicTask(unittest.TestCase):
 
     @patch(
         'taskwarrior_recurrence.main.ProcessRecurrentTask.'
-        'synthetize_next_periodic'
+        'plan_next_periodic'
     )
     def test_synthetize_next_child_on_periodic_calls_periodic_method(
         self,
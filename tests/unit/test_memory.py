@@ -0,0 +1,543 @@
+import json
+import datetime
+import tempfile
+import unittest
+from unittest.mock import patch
+from tasklib.backends import TaskWarriorException
+
+from taskwarrior_recurrence.main import ProcessRecurrentTask
+from taskwarrior_recurrence.clock import FixedClock
+from taskwarrior_recurrence.exdates import add_exdates
+from taskwarrior_recurrence.memory import \
+    InMemoryTaskWarrior, parse_duration, serialize_date
+
+
+class TestInMemoryTaskWarrior(unittest.TestCase):
+    def setUp(self):
+        self.parent_data = {
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "status": "recurring",
+            "description": "This is a periodic recurring task",
+            "due": "20370708T010000Z",
+            "r": "1w",
+            "rtype": "periodic",
+            "rlastinstance": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+        }
+        self.child_data = {
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "status": "pending",
+            "description": "This is a periodic recurring task",
+            "due": "20370708T010000Z",
+            "r": "1w",
+            "rparent": "012339c8-a8fe-41da-82db-a990f989237e",
+        }
+        self.tw = InMemoryTaskWarrior([self.parent_data, self.child_data])
+
+    def uuids(self, *filter_args, **filter_kwargs):
+        return [
+            task['uuid']
+            for task in self.tw.tasks.filter(*filter_args, **filter_kwargs)
+        ]
+
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration('3d'), 3 * 86400)
+        self.assertEqual(parse_duration('1w*4'), 28 * 86400)
+        self.assertEqual(parse_duration('weekly'), 7 * 86400)
+        self.assertEqual(parse_duration('20370708T010000Z'), None)
+
+    def test_convert_datetime_string_evaluates_expressions(self):
+        date = self.tw.convert_datetime_string(
+            '2037-07-08T01:00:00+02:00 + 1w*2'
+        )
+        self.assertEqual(serialize_date(date), '20370721T230000Z')
+
+        date = self.tw.convert_datetime_string('20370708T010000Z - 1d')
+        self.assertEqual(serialize_date(date), '20370707T010000Z')
+
+    def test_convert_datetime_string_raises_on_unknown_expressions(self):
+        with self.assertRaises(TaskWarriorException):
+            self.tw.convert_datetime_string('next monday')
+
+    def test_get_by_uuid(self):
+        task = self.tw.tasks.get(uuid=self.child_data['uuid'])
+        self.assertEqual(task['rparent'], self.parent_data['uuid'])
+
+    def test_filter_keyword(self):
+        self.assertEqual(
+            self.uuids(rparent=self.parent_data['uuid']),
+            [self.child_data['uuid']],
+        )
+
+    def test_filter_expressions(self):
+        self.assertEqual(
+            self.uuids('( uuid:other or ( rparent:{} and due:{} ) )'.format(
+                self.parent_data['uuid'],
+                '20370708T010000Z',
+            )),
+            [self.child_data['uuid']],
+        )
+        self.assertEqual(
+            self.uuids('rparent.any:'),
+            [self.child_data['uuid']],
+        )
+        self.assertEqual(
+            self.uuids('( status:pending or status:recurring )'),
+            [self.parent_data['uuid'], self.child_data['uuid']],
+        )
+        self.assertEqual(self.uuids('due.after:20370708T010000Z'), [])
+
+    def test_modify_command(self):
+        self.tw.execute_command([
+            'rparent:{}'.format(self.parent_data['uuid']),
+            '(', 'status:pending', 'or', 'status:waiting', ')',
+            'modify',
+            "rspec:'recurring;periodic;1w;20370708T010000Z;;;;;'",
+            'due:20370709T010000Z',
+        ])
+
+        child_task = self.tw.tasks.get(uuid=self.child_data['uuid'])
+        self.assertEqual(
+            child_task['rspec'],
+            'recurring;periodic;1w;20370708T010000Z;;;;;',
+        )
+        self.assertEqual(
+            serialize_date(child_task['due']),
+            '20370709T010000Z',
+        )
+
+    def test_delete_and_done_commands(self):
+        self.tw.execute_command([self.child_data['uuid'], 'done'])
+        self.tw.execute_command([self.parent_data['uuid'], 'delete'])
+
+        self.assertEqual(self.uuids('status:completed'), [
+            self.child_data['uuid'],
+        ])
+        self.assertEqual(self.uuids('status:deleted'), [
+            self.parent_data['uuid'],
+        ])
+
+    def test_import_command_creates_tasks(self):
+        data = dict(self.child_data)
+        data['uuid'] = 'b8e4a3a4-3a0b-4ac5-a89e-1b4f5b4bd2a6'
+        data['wait'] = '20370701T010000Z'
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            f.write(json.dumps(data))
+            f.flush()
+            self.tw.execute_command(['import', f.name])
+
+        task = self.tw.tasks.get(uuid=data['uuid'])
+        self.assertEqual(task['status'], 'waiting')
+        self.assertNotEqual(task['entry'], None)
+
+    def test_export_command(self):
+        output = self.tw.execute_command([self.child_data['uuid'], 'export'])
+        self.assertEqual(
+            json.loads(output[0])['uuid'],
+            self.child_data['uuid'],
+        )
+
+    def test_save_and_delete_tasks(self):
+        task = self.tw.tasks.get(uuid=self.child_data['uuid'])
+        task['project'] = 'test_project'
+        task.save()
+        self.assertEqual(
+            self.tw.tasks.get(uuid=self.child_data['uuid'])['project'],
+            'test_project',
+        )
+
+        task.delete()
+        self.assertEqual(
+            self.tw.tasks.get(uuid=self.child_data['uuid'])['status'],
+            'deleted',
+        )
+
+
+class TestInMemoryRecurrence(unittest.TestCase):
+    '''Runs the whole recurrence logic against the in memory backend'''
+
+    def setUp(self):
+        self.tw = InMemoryTaskWarrior()
+        self.clock = FixedClock(
+            self.tw.convert_datetime_string('20370708T000000Z')
+        )
+
+    def complete(self, task_uuid):
+        '''Simulates a task done and the on-exit hook'''
+
+        self.tw.execute_command([task_uuid, 'done'])
+        child_task = self.tw.tasks.get(uuid=task_uuid)
+        ProcessRecurrentTask(
+            child_task,
+            clock=self.clock,
+        ).synthetize_next_child()
+
+    def test_chained_completions_create_one_child_each(self):
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "description": "This is a chained recurring task",
+            "due": "20370708T010000Z",
+            "r": "3d",
+            "rtype": "chained",
+        }, clock=self.clock)
+
+        for completion in range(50):
+            parent_task = self.tw.tasks.get(uuid=parent_task['uuid'])
+            self.complete(parent_task['rlastinstance'])
+
+        children = self.tw.tasks.filter(rparent=parent_task['uuid'])
+        self.assertEqual(len(children), 51)
+        self.assertEqual(
+            len([task for task in children if task['status'] == 'pending']),
+            1,
+        )
+
+    def test_periodic_completion_creates_missing_occurrences(self):
+        self.clock.set(self.tw.convert_datetime_string('20370729T000000Z'))
+
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "description": "This is a periodic recurring task",
+            "due": "20370708T010000Z",
+            "r": "1w",
+            "rtype": "periodic",
+        }, clock=self.clock)
+
+        self.complete(parent_task['rlastinstance'])
+
+        dues = sorted(
+            serialize_date(task['due'])
+            for task in self.tw.tasks.filter(rparent=parent_task['uuid'])
+        )
+        self.assertEqual(dues, [
+            '20370708T010000Z',
+            '20370715T010000Z',
+            '20370722T010000Z',
+            '20370729T010000Z',
+        ])
+        parent_task = self.tw.tasks.get(uuid=parent_task['uuid'])
+        last_instance = self.tw.tasks.get(uuid=parent_task['rlastinstance'])
+        self.assertEqual(
+            serialize_date(last_instance['due']),
+            '20370729T010000Z',
+        )
+
+    def test_legacy_children_keep_their_uuid_as_last_instance(self):
+        '''Children created before the uuids were deterministic are found by
+        their due, and the parent must point to them and not to the uuid
+        they would have now'''
+
+        self.clock.set(self.tw.convert_datetime_string('20370712T000000Z'))
+        parent_uuid = '012339c8-a8fe-41da-82db-a990f989237e'
+        self.tw = InMemoryTaskWarrior(tasks=[
+            {
+                'uuid': parent_uuid,
+                'description': 'This is a periodic recurring task',
+                'status': 'recurring',
+                'due': '20370706T010000Z',
+                'r': '1w',
+                'rtype': 'periodic',
+                'rlastinstance': '7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f',
+            },
+            {
+                'uuid': '5d8c1b3e-8f9c-4d6f-9a2e-0c5b7d3e1f4a',
+                'description': 'This is a periodic recurring task',
+                'status': 'completed',
+                'due': '20370706T010000Z',
+                'end': '20370706T020000Z',
+                'rparent': parent_uuid,
+            },
+            {
+                'uuid': '7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f',
+                'description': 'This is a periodic recurring task',
+                'due': '20370713T010000Z',
+                'rparent': parent_uuid,
+            },
+        ])
+
+        ProcessRecurrentTask(
+            self.tw.tasks.get(uuid='5d8c1b3e-8f9c-4d6f-9a2e-0c5b7d3e1f4a'),
+            clock=self.clock,
+        ).synthetize_next_child()
+
+        parent_task = self.tw.tasks.get(uuid=parent_uuid)
+        self.assertEqual(
+            parent_task['rlastinstance'],
+            '7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f',
+        )
+        self.assertEqual(len(self.tw.tasks.filter(rparent=parent_uuid)), 2)
+
+    def test_deleting_the_parent_deletes_the_lookahead_window(self):
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "description": "This is a periodic recurring task",
+            "due": "20370708T010000Z",
+            "r": "1w",
+            "rtype": "periodic",
+            "rahead": "2w",
+        }, clock=self.clock)
+        self.assertEqual(
+            len(self.tw.tasks.filter(rparent=parent_task['uuid'])),
+            3,
+        )
+
+        # Simulates a task delete of the parent and the on-exit hook
+        self.tw.execute_command([parent_task['uuid'], 'delete'])
+        prt = ProcessRecurrentTask(
+            self.tw.tasks.get(uuid=parent_task['uuid']),
+            clock=self.clock,
+        )
+        prt.propagate_spec()
+        prt.delete_child_task()
+
+        self.assertEqual(
+            [
+                task['status']
+                for task in self.tw.tasks.filter(rparent=parent_task['uuid'])
+            ],
+            ['deleted'] * 3,
+        )
+
+    def test_add_recurrent_task_stores_child_spec(self):
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "description": "This is a chained recurring task",
+            "due": "20370708T010000Z",
+            "r": "3d",
+            "rtype": "chained",
+        }, clock=self.clock)
+
+        child_task = self.tw.tasks.get(uuid=parent_task['rlastinstance'])
+        self.assertEqual(
+            child_task['rspec'],
+            'recurring;chained;3d;20370708T010000Z;;;;;;',
+        )
+        self.assertEqual(child_task['status'], 'pending')
+        self.assertEqual(
+            child_task['due'] - datetime.timedelta(0),
+            parent_task['due'],
+        )
+
+    def test_instance_fields_dont_reach_the_next_child(self):
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "description": "This is a chained recurring task",
+            "due": "20370708T010000Z",
+            "r": "3d",
+            "rtype": "chained",
+        }, clock=self.clock)
+        self.tw.execute_command([
+            parent_task['rlastinstance'],
+            'modify',
+            'depends:7a6f2f8e-7f4a-4f4b-8c4b-1d9a4c2b3e5f',
+            'rexpiry:20370709T010000Z',
+        ])
+
+        self.complete(parent_task['rlastinstance'])
+
+        parent_task = self.tw.tasks.get(uuid=parent_task['uuid'])
+        data = json.loads(self.tw.execute_command(
+            [parent_task['rlastinstance'], 'export'],
+        )[0])
+        self.assertNotIn('depends', data)
+        self.assertNotIn('rexpiry', data)
+
+    def test_parent_changes_reach_the_next_child(self):
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "description": "old desc",
+            "project": "old",
+            "due": "20370708T010000Z",
+            "r": "3d",
+            "rtype": "chained",
+        }, clock=self.clock)
+
+        # Simulates a task modify of the parent and the on-exit hook
+        self.tw.execute_command([
+            parent_task['uuid'],
+            'modify',
+            'description:new',
+            'project:new',
+        ])
+        ProcessRecurrentTask(
+            self.tw.tasks.get(uuid=parent_task['uuid']),
+            clock=self.clock,
+        ).propagate_spec()
+        live_child = self.tw.tasks.get(uuid=parent_task['rlastinstance'])
+        self.assertEqual(live_child['description'], 'new')
+        self.assertEqual(live_child['project'], 'new')
+
+        self.complete(parent_task['rlastinstance'])
+
+        parent_task = self.tw.tasks.get(uuid=parent_task['uuid'])
+        next_child = self.tw.tasks.get(uuid=parent_task['rlastinstance'])
+        self.assertNotEqual(next_child['uuid'], live_child['uuid'])
+        self.assertEqual(next_child['description'], 'new')
+        self.assertEqual(next_child['project'], 'new')
+
+    def test_periodic_synthesis_skips_exception_dates(self):
+        self.clock.set(self.tw.convert_datetime_string('20370729T000000Z'))
+
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "description": "This is a periodic recurring task",
+            "due": "20370708T010000Z",
+            "r": "1w",
+            "rtype": "periodic",
+            "rexcept": add_exdates(None, [
+                self.tw.convert_datetime_string('20370715T000000Z'),
+                self.tw.convert_datetime_string('20370729T000000Z'),
+            ]),
+        }, clock=self.clock)
+
+        self.complete(parent_task['rlastinstance'])
+
+        dues = sorted(
+            serialize_date(task['due'])
+            for task in self.tw.tasks.filter(rparent=parent_task['uuid'])
+        )
+        self.assertEqual(dues, [
+            '20370708T010000Z',
+            '20370722T010000Z',
+            '20370805T010000Z',
+        ])
+
+    def test_periodic_lookahead_window(self):
+        self.clock.set(self.tw.convert_datetime_string('20370708T000000Z'))
+
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "description": "This is a periodic recurring task",
+            "due": "20370708T010000Z",
+            "r": "1w",
+            "rtype": "periodic",
+            "rahead": "3w",
+        }, clock=self.clock)
+
+        self.assertEqual(
+            len(self.tw.tasks.filter(rparent=parent_task['uuid'])),
+            4,
+        )
+        last_instance = self.tw.tasks.get(uuid=parent_task['rlastinstance'])
+        self.assertEqual(
+            serialize_date(last_instance['due']),
+            '20370729T010000Z',
+        )
+
+        self.clock.set(self.tw.convert_datetime_string('20370715T000000Z'))
+        first_child = min(
+            self.tw.tasks.filter(rparent=parent_task['uuid']),
+            key=lambda task: task['due'],
+        )
+        self.complete(first_child['uuid'])
+
+        dues = sorted(
+            serialize_date(task['due'])
+            for task in self.tw.tasks.filter(rparent=parent_task['uuid'])
+        )
+        self.assertEqual(dues, [
+            '20370708T010000Z',
+            '20370715T010000Z',
+            '20370722T010000Z',
+            '20370729T010000Z',
+            '20370805T010000Z',
+        ])
+
+    def test_expiry_is_computed_once_per_plan(self):
+        with patch.object(
+            self.tw,
+            'convert_datetime_string',
+            wraps=self.tw.convert_datetime_string,
+        ) as convert_datetime_string:
+            parent_task = self.tw.add_recurrent_task({
+                "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+                "description": "This is a periodic recurring task",
+                "due": "20370708T010000Z",
+                "r": "1w",
+                "rtype": "periodic",
+                "rahead": "3w",
+                "runtil": "2d",
+            }, clock=self.clock)
+
+        self.assertEqual(
+            sorted(
+                task['rexpiry']
+                for task in self.tw.tasks.filter(rparent=parent_task['uuid'])
+            ),
+            [
+                '20370710T010000Z',
+                '20370717T010000Z',
+                '20370724T010000Z',
+                '20370731T010000Z',
+            ],
+        )
+        self.assertEqual(
+            len([
+                expression_call
+                for expression_call in convert_datetime_string.call_args_list
+                if expression_call.args[0].endswith(' + 2d')
+            ]),
+            1,
+        )
+
+    def test_periodic_synthesis_starts_at_the_completed_occurrence(self):
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "description": "This is a periodic recurring task",
+            "due": "20370708T010000Z",
+            "r": "1d",
+            "rtype": "periodic",
+        }, clock=self.clock)
+        for day in range(200):
+            self.clock.advance(datetime.timedelta(days=1))
+            parent_task = self.tw.tasks.get(uuid=parent_task['uuid'])
+            self.complete(parent_task['rlastinstance'])
+
+        self.clock.advance(datetime.timedelta(days=1))
+        parent_task = self.tw.tasks.get(uuid=parent_task['uuid'])
+        with patch.object(
+            self.tw,
+            'convert_datetime_string',
+            wraps=self.tw.convert_datetime_string,
+        ) as convert_datetime_string:
+            self.complete(parent_task['rlastinstance'])
+
+        parent_task = self.tw.tasks.get(uuid=parent_task['uuid'])
+        self.assertEqual(
+            serialize_date(
+                self.tw.tasks.get(uuid=parent_task['rlastinstance'])['due']
+            ),
+            '20380125T010000Z',
+        )
+        # The 201 past occurrences aren't computed again
+        self.assertLess(convert_datetime_string.call_count, 10)
+
+    def test_periodic_synthesis_stamps_expiry_and_skips_expired(self):
+        self.clock.set(self.tw.convert_datetime_string('20370729T000000Z'))
+
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "description": "This is a periodic recurring task",
+            "due": "20370708T010000Z",
+            "r": "1w",
+            "rtype": "periodic",
+            "runtil": "2d",
+        }, clock=self.clock)
+        first_child = self.tw.tasks.get(uuid=parent_task['rlastinstance'])
+        self.assertEqual(first_child['rexpiry'], '20370710T010000Z')
+
+        self.complete(first_child['uuid'])
+
+        children = sorted(
+            self.tw.tasks.filter(rparent=parent_task['uuid']),
+            key=lambda task: task['due'],
+        )
+        self.assertEqual(
+            [
+                (serialize_date(task['due']), task['rexpiry'])
+                for task in children
+            ],
+            [
+                ('20370708T010000Z', '20370710T010000Z'),
+                ('20370729T010000Z', '20370731T010000Z'),
+            ],
+        )
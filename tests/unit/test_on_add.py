@@ -10,6 +10,10 @@ class TestOnAdd(unittest.TestCase):
         self.print = self.print_patch.start()
         self.tasklib_patch = patch('taskwarrior_recurrence.on_add.tasklib')
         self.tasklib = self.tasklib_patch.start()
+        self.tw_patch = patch(
+            'taskwarrior_recurrence.on_add.CachedTaskWarrior'
+        )
+        self.tw = self.tw_patch.start()
         self.task = self.tasklib.task.Task.from_input.return_value
         self.sys_patch = patch('taskwarrior_recurrence.on_add.sys')
         self.sys = self.sys_patch.start()
@@ -24,6 +28,7 @@ class TestOnAdd(unittest.TestCase):
         ]
 
     def tearDown(self):
+        self.tw_patch.stop()
         self.tasklib_patch.stop()
         self.sys_patch.stop()
         self.print_patch.stop()
@@ -31,7 +36,7 @@ class TestOnAdd(unittest.TestCase):
     def test_task_backend_is_configured(self):
         main()
         self.assertEqual(
-            self.tasklib.TaskWarrior.assert_called_with(
+            self.tw.assert_called_with(
                 taskrc_location='/path/to/rc_file',
                 data_location='/path/to/data',
             ),
@@ -112,7 +117,9 @@ class TestOnAdd(unittest.TestCase):
         self.task._data.copy.return_value = task_data.copy()
         main()
         self.assertTrue(processMock.return_value.add_recurrent_task.called)
-    def test_if_task_has_rparent_uda_do_nothing(self):
+
+    @patch('taskwarrior_recurrence.main.ProcessRecurrentTask._plan_child')
+    def test_if_task_has_rparent_uda_do_nothing(self, importMock):
         task_data = {
             "entry": "20180802T194712Z",
             "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
@@ -122,6 +129,13 @@ class TestOnAdd(unittest.TestCase):
             "rtype": 'chained',
             "r": '2d',
             "due": "monday",
+            "rwait": None,
+            "rscheduled": None,
+            "rwaitoffset": None,
+            "rscheduledoffset": None,
+            "rexcept": None,
+            "rahead": None,
+            "runtil": None,
             "description": "This is a task without rtype",
         }
         self.task.__getitem__.side_effect = task_data.__getitem__
@@ -1,6 +1,9 @@
+import sys
 import unittest
 import datetime
-from unittest.mock import patch
+import subprocess
+from unittest.mock import patch, call
+from taskwarrior_recurrence.deferred import BudgetExceeded
 from taskwarrior_recurrence.on_exit import main
 
 
@@ -10,6 +13,10 @@ class TestOnExit(unittest.TestCase):
         self.print = self.print_patch.start()
         self.tasklib_patch = patch('taskwarrior_recurrence.on_exit.tasklib')
         self.tasklib = self.tasklib_patch.start()
+        self.tw_patch = patch(
+            'taskwarrior_recurrence.on_exit.CachedTaskWarrior'
+        )
+        self.tw = self.tw_patch.start()
         self.task = self.tasklib.task.Task.from_input.return_value
         self.sys_patch = patch('taskwarrior_recurrence.on_exit.sys')
         self.sys = self.sys_patch.start()
@@ -22,13 +29,22 @@ class TestOnExit(unittest.TestCase):
               'data:/path/to/data',
               'version:2.5.1',
         ]
+        self.sys.stdin.readline.return_value = \
+            '{"uuid":"3f0a43d0-a713-4ebe-9e5c-b1facf49f078","r":"3d"}'
         self.prt_patch = patch(
             'taskwarrior_recurrence.on_exit.ProcessRecurrentTask'
         )
         self.prt = self.prt_patch.start()
         self.prt = self.prt.return_value
+        self.queue_patch = patch(
+            'taskwarrior_recurrence.deferred.DeferredQueue'
+        )
+        self.queue = self.queue_patch.start()
+        self.queue = self.queue.return_value
 
     def tearDown(self):
+        self.tw_patch.stop()
+        self.queue_patch.stop()
         self.tasklib_patch.stop()
         self.sys_patch.stop()
         self.print_patch.stop()
@@ -37,7 +53,7 @@ class TestOnExit(unittest.TestCase):
     def test_task_backend_is_configured(self):
         main()
         self.assertEqual(
-            self.tasklib.TaskWarrior.assert_called_with(
+            self.tw.assert_called_with(
                 taskrc_location='/path/to/rc_file',
                 data_location='/path/to/data',
             ),
@@ -69,8 +85,9 @@ class TestOnExit(unittest.TestCase):
 
         # If I use sys.exit(0) mock as sys.exit it exits all the tests,
         # therefore I can't use self.assertFalse(processrecurMock.called)
-        # So instead I make sure that the sys.exit(0) is called twice
-        self.assertEqual(len(self.sys.mock_calls), 3)
+        # So instead I make sure that the sys.exit(0) is called three times
+        # besides reading the payload
+        self.assertEqual(len(self.sys.mock_calls), 4)
 
     def test_if_chained_task_deleted_create_next_task(self):
         self.sys.argv = [
@@ -273,3 +290,145 @@ class TestOnExit(unittest.TestCase):
         self.task._data.copy.return_value = task_data.copy()
         main()
         self.assertTrue(self.prt.delete_child_task.called)
+
+    def test_deferred_queue_is_drained(self):
+        main()
+        self.assertTrue(self.queue.drain.called)
+
+    def test_child_is_queued_if_budget_is_exceeded(self):
+        self.sys.argv = [
+              '/path/to/hook/script',
+              'api:2',
+              'args:/path/to/rc_file',
+              'command: done',
+              'rc:/path/to/rc_file',
+              'data:/path/to/data',
+              'version:2.5.1',
+        ]
+        task_data = {
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "status": "completed",
+            "r": '3d',
+            "rlastinstance": None,
+            "rparent": "88781555-f66c-40b1-9c17-11d81d6e7864",
+        }
+        self.task.__getitem__.side_effect = task_data.__getitem__
+        self.prt.synthetize_next_child.side_effect = BudgetExceeded()
+        main()
+        self.queue.push.assert_called_with(self.task)
+
+    def test_if_parent_task_modified_propagate_spec(self):
+        self.sys.argv = [
+              '/path/to/hook/script',
+              'api:2',
+              'args:/path/to/rc_file',
+              'command: modify',
+              'rc:/path/to/rc_file',
+              'data:/path/to/data',
+              'version:2.5.1',
+        ]
+        task_data = {
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "status": "recurring",
+            "r": '3d',
+            "rlastinstance": "88781555-f66c-40b1-9c17-11d81d6e7864",
+        }
+        self.task.__getitem__.side_effect = task_data.__getitem__
+        main()
+        self.assertTrue(self.prt.propagate_spec.called)
+        self.assertFalse(self.prt.delete_child_task.called)
+
+    def test_if_child_task_modified_do_nothing(self):
+        self.sys.argv = [
+              '/path/to/hook/script',
+              'api:2',
+              'args:/path/to/rc_file',
+              'command: modify',
+              'rc:/path/to/rc_file',
+              'data:/path/to/data',
+              'version:2.5.1',
+        ]
+        task_data = {
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "status": "pending",
+            "r": '3d',
+            "rlastinstance": None,
+            "rparent": "88781555-f66c-40b1-9c17-11d81d6e7864",
+        }
+        self.task.__getitem__.side_effect = task_data.__getitem__
+        main()
+        self.assertFalse(self.prt.propagate_spec.called)
+        self.assertFalse(self.prt.synthetize_next_child.called)
+
+    def test_main_reads_payload_from_stdin(self):
+        main()
+        self.assertEqual(
+            self.tasklib.task.Task.from_input.call_args[1][
+                'input_file'
+            ].read(),
+            self.sys.stdin.readline.return_value,
+        )
+
+    def test_main_exits_before_loading_data_if_payload_isnt_recurrent(self):
+        self.sys.stdin.readline.return_value = \
+            '{"uuid":"3f0a43d0-a713-4ebe-9e5c-b1facf49f078"}'
+        main()
+        self.assertEqual(self.sys.exit.call_args_list[1], call(0))
+
+    def test_stale_commands_mark_index_stale(self):
+        self.sys.argv[3] = 'command: sync'
+        self.sys.exit.side_effect = SystemExit
+        with patch('taskwarrior_recurrence.index.open_index') as open_index:
+            with self.assertRaises(SystemExit):
+                main()
+
+        open_index.assert_called_once_with('/path/to/data')
+        self.assertTrue(open_index.return_value.mark_stale.called)
+
+    def test_index_is_updated_with_the_payload(self):
+        self.sys.argv[3] = 'command: modify'
+        self.task.__getitem__.side_effect = {
+            "r": '3d',
+            "rlastinstance": None,
+        }.__getitem__
+        with patch('taskwarrior_recurrence.index.open_index') as open_index:
+            main()
+
+        open_index.return_value.update.assert_called_once_with(self.task)
+
+
+class TestOnExitImports(unittest.TestCase):
+    def run_hook(self, command, payload=''):
+        '''Runs the hook in a new interpreter and returns the modules it
+        imported'''
+
+        script = (
+            'import sys\n'
+            'sys.path.insert(0, "taskwarrior_recurrence")\n'
+            'sys.argv = ["on-exit", "api:2", "args:", "command:{}",'
+            ' "rc:/dev/null", "data:/dev/null", "version:2.5.1"]\n'
+            'import on_exit\n'
+            'try:\n'
+            '    on_exit.main()\n'
+            'except SystemExit:\n'
+            '    pass\n'
+            'print(" ".join(sys.modules))\n'
+        ).format(command)
+        output = subprocess.run(
+            [sys.executable, '-c', script],
+            input=payload,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        ).stdout
+        return output.split()
+
+    def test_read_only_commands_dont_import_tasklib(self):
+        self.assertNotIn('tasklib', self.run_hook('list'))
+
+    def test_empty_payload_doesnt_import_tasklib(self):
+        self.assertNotIn('tasklib', self.run_hook('done'))
+
+    def test_non_recurrent_payload_doesnt_import_tasklib(self):
+        modules = self.run_hook('done', '{"uuid":"3f0a43d0"}\n')
+        self.assertNotIn('tasklib', modules)
@@ -0,0 +1,194 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from taskwarrior_recurrence.plan import \
+    DryRunExecutor, ImportExecutor, PlanFileExecutor, RecurrencePlan, \
+    TaskExecutor, load_plan
+
+
+class TestRecurrencePlan(unittest.TestCase):
+    def setUp(self):
+        self.child_data = {
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "status": "pending",
+            "description": "This is a periodic recurring task",
+            "due": "20180708T010000Z",
+            "rparent": "012339c8-a8fe-41da-82db-a990f989237e",
+        }
+        self.plan = RecurrencePlan()
+        self.plan.create_task(self.child_data)
+        self.plan.update_task(
+            self.child_data['rparent'],
+            {'rlastinstance': self.child_data['uuid']},
+        )
+
+    def test_len_counts_the_changes(self):
+        self.plan.delete_task('b8e4a3a4-3a0b-4ac5-a89e-1b4f5b4bd2a6')
+        self.assertEqual(len(self.plan), 3)
+
+    def test_merge_joins_the_updates_of_a_task(self):
+        other = RecurrencePlan()
+        other.update_task(
+            self.child_data['rparent'],
+            {'rlastinstance': 'other', 'rwaitoffset': 3600},
+        )
+
+        self.plan.merge(other)
+
+        self.assertEqual(
+            self.plan.update,
+            {self.child_data['rparent']: {
+                'rlastinstance': 'other',
+                'rwaitoffset': 3600,
+            }},
+        )
+
+    def test_dict_round_trip(self):
+        plan = RecurrencePlan.from_dict(
+            json.loads(json.dumps(self.plan.to_dict()))
+        )
+        self.assertEqual(plan.to_dict(), self.plan.to_dict())
+
+
+class TestExecutors(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.tw = MagicMock()
+        self.imported = []
+        self.tw.execute_command.side_effect = self.fake_execute
+        self.child_data = {
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "status": "pending",
+            "description": "This is a periodic recurring task",
+            "due": "20180708T010000Z",
+            "rparent": "012339c8-a8fe-41da-82db-a990f989237e",
+        }
+        self.other_child_data = dict(self.child_data)
+        self.other_child_data['uuid'] = 'b8e4a3a4-3a0b-4ac5-a89e-1b4f5b4bd2a6'
+        self.plan = RecurrencePlan()
+        self.plan.create_task(self.child_data)
+        self.plan.create_task(self.other_child_data)
+        self.plan.update_task(
+            self.child_data['rparent'],
+            {'rlastinstance': self.other_child_data['uuid']},
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def fake_execute(self, args, config_override=None):
+        if args[0] == 'import':
+            with open(args[1]) as f:
+                self.imported.append(
+                    [json.loads(line) for line in f.read().splitlines()]
+                )
+
+    def test_task_executor_imports_children_at_once(self):
+        TaskExecutor(self.tw).execute(self.plan)
+
+        self.assertEqual(
+            self.imported,
+            [[self.child_data, self.other_child_data]],
+        )
+
+    def test_task_executor_runs_without_hooks(self):
+        TaskExecutor(self.tw).execute(self.plan)
+
+        for command in self.tw.execute_command.mock_calls:
+            self.assertEqual(
+                command[2],
+                {'config_override': {'hooks': 'off'}},
+            )
+
+    def test_task_executor_modifies_the_updated_tasks(self):
+        TaskExecutor(self.tw).execute(self.plan)
+
+        self.tw.execute_command.assert_called_with(
+            [
+                self.child_data['rparent'],
+                'modify',
+                'rlastinstance:' + self.other_child_data['uuid'],
+            ],
+            config_override={'hooks': 'off'},
+        )
+
+    def test_task_executor_removes_temporary_files(self):
+        TaskExecutor(self.tw).execute(self.plan)
+
+        path = self.tw.execute_command.mock_calls[0][1][0][1]
+        self.assertFalse(os.path.exists(path))
+
+    def test_task_executor_updates_index(self):
+        index = MagicMock()
+
+        TaskExecutor(self.tw, index).execute(self.plan)
+
+        self.assertEqual(index.update.call_count, 2)
+        index.update_fields.assert_called_once_with(
+            self.child_data['rparent'],
+            {'rlastinstance': self.other_child_data['uuid']},
+        )
+
+    def test_task_executor_deletes_tasks(self):
+        plan = RecurrencePlan()
+        plan.delete_task(self.child_data['uuid'])
+
+        TaskExecutor(self.tw).execute(plan)
+
+        self.tw.execute_command.assert_called_once_with(
+            [self.child_data['uuid'], 'delete'],
+        )
+
+    def test_import_executor_imports_children_at_once(self):
+        self.plan.delete_task(self.child_data['uuid'])
+        self.plan.delete_task(self.other_child_data['uuid'])
+
+        ImportExecutor(self.tw).execute(self.plan)
+
+        self.assertEqual(
+            self.imported,
+            [[self.child_data, self.other_child_data]],
+        )
+        self.tw.execute_command.assert_called_with(
+            [self.child_data['uuid'], self.other_child_data['uuid'], 'delete'],
+        )
+
+    def test_dry_run_executor_prints_the_changes(self):
+        output = io.StringIO()
+
+        DryRunExecutor(output).execute(self.plan)
+
+        self.assertFalse(self.tw.execute_command.called)
+        self.assertEqual(
+            output.getvalue().splitlines(),
+            [
+                'create {} due:20180708T010000Z {}'.format(
+                    self.child_data['uuid'],
+                    self.child_data['description'],
+                ),
+                'create {} due:20180708T010000Z {}'.format(
+                    self.other_child_data['uuid'],
+                    self.other_child_data['description'],
+                ),
+                'update {} rlastinstance:{}'.format(
+                    self.child_data['rparent'],
+                    self.other_child_data['uuid'],
+                ),
+            ],
+        )
+
+    def test_plan_file_executor_merges_the_plans(self):
+        path = os.path.join(self.temp_dir, 'plan.json')
+        executor = PlanFileExecutor(path)
+
+        executor.execute(self.plan)
+        executor.execute(self.plan)
+
+        plan = load_plan(path)
+        self.assertEqual(len(plan.create), 4)
+        self.assertEqual(plan.update, self.plan.update)
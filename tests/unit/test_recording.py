@@ -0,0 +1,148 @@
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+from taskwarrior_recurrence.recording import \
+    Replayer, read_trace, run_hook, summarize, write_record
+
+FAKE_TASK = '''#!{}
+print('task')
+'''
+
+FAKE_HOOK = '''import sys
+import subprocess
+data = [argument for argument in sys.argv if argument.startswith('data:')]
+with open(data[0][5:] + '/seen', 'a') as f:
+    f.write(sys.stdin.read())
+subprocess.run(['task', 'export'])
+subprocess.run(['task', 'export'])
+sys.exit(3)
+'''
+
+
+class TestRunHook(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.trace = os.path.join(self.temp_dir, 'trace.gz')
+        self.argv = ['on-exit', 'api:2', 'command:done', 'data:/tmp/data']
+        self.payload = '{"uuid":"3f0a43d0-a713-4ebe-9e5c-b1facf49f078"}\n'
+        self.sys_patch = patch.multiple(
+            sys,
+            argv=self.argv,
+            stdin=io.StringIO(self.payload),
+        )
+        self.sys_patch.start()
+
+    def tearDown(self):
+        self.sys_patch.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_runs_main_without_recording_by_default(self):
+        main = MagicMock()
+        with patch.dict(os.environ, {}, clear=True):
+            run_hook('on_exit', main)
+
+        self.assertTrue(main.called)
+        self.assertFalse(os.path.exists(self.trace))
+
+    def test_records_the_invocation(self):
+        read = []
+
+        def main():
+            read.append(sys.stdin.readline())
+            sys.exit(0)
+
+        environ = {'TASKWARRIOR_RECURRENCE_TRACE': self.trace}
+        with patch.dict(os.environ, environ):
+            with self.assertRaises(SystemExit):
+                run_hook('on_exit', main)
+
+        record = list(read_trace(self.trace))[0]
+        self.assertEqual(read, [self.payload])
+        self.assertEqual(record['hook'], 'on_exit')
+        self.assertEqual(record['argv'], self.argv[1:])
+        self.assertEqual(record['stdin'], self.payload)
+        self.assertEqual(record['exit'], 0)
+        self.assertTrue(record['duration'] >= 0)
+
+    def test_records_failed_invocations(self):
+        environ = {'TASKWARRIOR_RECURRENCE_TRACE': self.trace}
+        main = MagicMock(side_effect=ValueError)
+        with patch.dict(os.environ, environ):
+            with self.assertRaises(ValueError):
+                run_hook('on_add', main)
+
+        self.assertEqual(list(read_trace(self.trace))[0]['exit'], 1)
+
+    def test_records_are_appended(self):
+        write_record(self.trace, {'hook': 'on_add'})
+        write_record(self.trace, {'hook': 'on_exit'})
+
+        self.assertEqual(
+            [record['hook'] for record in read_trace(self.trace)],
+            ['on_add', 'on_exit'],
+        )
+
+
+class TestReplayer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.snapshot = os.path.join(self.temp_dir, 'snapshot')
+        os.mkdir(self.snapshot)
+        self.bin_dir = os.path.join(self.temp_dir, 'bin')
+        os.mkdir(self.bin_dir)
+        binary = os.path.join(self.bin_dir, 'task')
+        with open(binary, 'w') as f:
+            f.write(FAKE_TASK.format(sys.executable))
+        os.chmod(binary, 0o755)
+        with open(os.path.join(self.temp_dir, 'fake_hook.py'), 'w') as f:
+            f.write(FAKE_HOOK)
+
+        self.patches = [
+            patch.dict(
+                os.environ,
+                {'PATH': self.bin_dir + os.pathsep + os.environ['PATH']},
+            ),
+            patch(
+                'taskwarrior_recurrence.recording.HOOKS_DIRECTORY',
+                self.temp_dir,
+            ),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+
+        self.record = {
+            'hook': 'fake_hook',
+            'argv': ['api:2', 'command:done', 'data:/production/data'],
+            'stdin': 'payload\n',
+            'duration': 0.5,
+            'exit': 3,
+        }
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_replay_counts_task_calls_and_keeps_snapshot(self):
+        results = Replayer(self.snapshot).replay([self.record] * 2)
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['task_calls'], 2)
+        self.assertEqual(results[0]['command'], 'done')
+        self.assertEqual(results[0]['exit'], 3)
+        self.assertEqual(os.listdir(self.snapshot), [])
+
+    def test_summarize(self):
+        results = Replayer(self.snapshot).replay([self.record])
+
+        summary = summarize(results)
+
+        self.assertEqual(summary['fake_hook']['invocations'], 1)
+        self.assertEqual(summary['fake_hook']['recorded']['max'], 0.5)
+        self.assertEqual(summary['fake_hook']['task_calls']['total'], 2)
+        self.assertEqual(summary['fake_hook']['exit_mismatches'], 0)
@@ -0,0 +1,215 @@
+import sys
+import json
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from tasklib.backends import TaskWarriorException
+
+from taskwarrior_recurrence.repair import \
+    RepairPipeline, export_async, export_table_async
+
+
+class TestRepairPipeline(unittest.TestCase):
+    def setUp(self):
+        self.parent_data = {
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "status": "recurring",
+            "r": "1w",
+            "rtype": "periodic",
+            "rlastinstance": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+        }
+        self.child_data = {
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "status": "completed",
+            "description": "This is a periodic recurring task",
+            "r": "1w",
+            "rparent": "012339c8-a8fe-41da-82db-a990f989237e",
+        }
+        self.exports = {
+            'status:recurring': [self.parent_data],
+            'rparent.any:': [self.child_data],
+            'uuid:' + self.child_data['uuid']: [self.child_data],
+        }
+        self.tw = MagicMock()
+        self.tw._get_command_args.side_effect = self.fake_export
+        self.prt_patch = patch(
+            'taskwarrior_recurrence.repair.ProcessRecurrentTask'
+        )
+        self.prt = self.prt_patch.start()
+
+    def tearDown(self):
+        self.prt_patch.stop()
+
+    def fake_export(self, args):
+        '''Returns a command that prints the export of the filter of args'''
+
+        filter_args = ' '.join(args[1:])
+        if filter_args not in self.exports:
+            return [sys.executable, '-c', 'import sys; sys.exit(2)']
+        output = '\n'.join(
+            json.dumps(task) for task in self.exports[filter_args]
+        )
+        return [
+            sys.executable,
+            '-c',
+            'import sys; sys.stdout.write({!r})'.format(output),
+        ]
+
+    def test_repairs_parent_with_completed_last_instance(self):
+        report = RepairPipeline(self.tw).run()
+
+        self.assertEqual(report.parents, 1)
+        self.assertEqual(
+            report.repaired,
+            [(self.parent_data['uuid'], self.child_data['description'])],
+        )
+        child_task = self.prt.call_args[0][0]
+        self.assertEqual(child_task['uuid'], self.child_data['uuid'])
+        self.assertTrue(self.prt.return_value.synthetize_next_child.called)
+
+    def test_check_only_reports_broken_parents(self):
+        report = RepairPipeline(self.tw, check=True).run()
+
+        self.assertEqual(
+            report.broken,
+            [(self.parent_data['uuid'], self.child_data['uuid'])],
+        )
+        self.assertEqual(report.repaired, [])
+        self.assertFalse(self.prt.called)
+
+    def test_doesnt_repair_parent_with_pending_last_instance(self):
+        self.child_data['status'] = 'pending'
+
+        report = RepairPipeline(self.tw).run()
+
+        self.assertEqual(report.repaired, [])
+        self.assertFalse(self.prt.called)
+
+    def test_reports_missing_last_instance(self):
+        self.exports['rparent.any:'] = []
+
+        report = RepairPipeline(self.tw).run()
+
+        self.assertEqual(
+            report.missing,
+            [(self.parent_data['uuid'], self.child_data['uuid'])],
+        )
+
+    def test_reports_failed_repairs(self):
+        del self.exports['uuid:' + self.child_data['uuid']]
+
+        report = RepairPipeline(self.tw).run()
+
+        self.assertEqual(report.repaired, [])
+        self.assertEqual(report.failed[0][0], self.parent_data['uuid'])
+
+    def test_reports_children_that_disappeared(self):
+        self.exports['uuid:' + self.child_data['uuid']] = []
+
+        report = RepairPipeline(self.tw).run()
+
+        self.assertEqual(report.repaired, [])
+        self.assertEqual(
+            report.failed,
+            [(
+                self.parent_data['uuid'],
+                'Task {} not found'.format(self.child_data['uuid']),
+            )],
+        )
+        self.assertFalse(self.prt.called)
+
+    def test_writes_are_serialized(self):
+        other_parent = dict(self.parent_data)
+        other_parent['uuid'] = 'b8e4a3a4-3a0b-4ac5-a89e-1b4f5b4bd2a6'
+        other_parent['rlastinstance'] = '6d3c1d1b-7a1c-4e8a-9a51-7f4d1f6c2b10'
+        other_child = dict(self.child_data)
+        other_child['uuid'] = other_parent['rlastinstance']
+        other_child['rparent'] = other_parent['uuid']
+        self.exports['status:recurring'].append(other_parent)
+        self.exports['rparent.any:'].append(other_child)
+        self.exports['uuid:' + other_child['uuid']] = [other_child]
+
+        writers = []
+        self.prt.return_value.synthetize_next_child.side_effect = \
+            lambda: writers.append(threading.get_ident())
+
+        report = RepairPipeline(self.tw, concurrency=2).run()
+
+        self.assertEqual(len(report.repaired), 2)
+        self.assertEqual(len(writers), 2)
+        self.assertEqual(len(set(writers)), 1)
+
+    def test_since_exports_only_modified_tasks(self):
+        modified_filter = '( rparent.any: or status:recurring ) ' \
+            'modified.after:20180808T010000Z'
+        self.exports[modified_filter] = [self.child_data]
+        self.exports['status:recurring ' + self.parent_data['uuid']] = \
+            [self.parent_data]
+        self.exports[self.child_data['uuid']] = [self.child_data]
+        del self.exports['status:recurring']
+        del self.exports['rparent.any:']
+
+        report = RepairPipeline(self.tw, since='20180808T010000Z').run()
+
+        self.assertEqual(report.parents, 1)
+        self.assertEqual(len(report.repaired), 1)
+
+    def test_since_without_modified_tasks_exports_nothing_else(self):
+        modified_filter = '( rparent.any: or status:recurring ) ' \
+            'modified.after:20180808T010000Z'
+        self.exports[modified_filter] = []
+
+        report = RepairPipeline(self.tw, since='20180808T010000Z').run()
+
+        self.assertEqual(report.parents, 0)
+        self.assertEqual(self.tw._get_command_args.call_count, 1)
+
+    def test_report_throughput(self):
+        report = RepairPipeline(self.tw).run()
+
+        self.assertTrue(report.elapsed > 0)
+        self.assertEqual(report.throughput, report.parents / report.elapsed)
+
+
+class TestExportAsync(unittest.TestCase):
+    def test_raises_if_task_fails(self):
+        tw = MagicMock()
+        tw._get_command_args.return_value = [
+            sys.executable,
+            '-c',
+            'import sys; sys.exit(2)',
+        ]
+
+        with self.assertRaises(TaskWarriorException):
+            asyncio.run(export_async(tw, [], asyncio.Semaphore(1)))
+
+    def test_table_is_built_from_the_streamed_lines(self):
+        tasks = [
+            {
+                'uuid': '3f0a43d0-a713-4ebe-9e5c-b1facf49f078',
+                'status': 'completed',
+                # Longer than the lines asyncio reads by default
+                'annotations': [{'description': 'x' * 100000}],
+            },
+            {
+                'uuid': '6d3c1d1b-7a1c-4e8a-9a51-7f4d1f6c2b10',
+                'status': 'pending',
+            },
+        ]
+        output = '\n'.join(json.dumps(task) for task in tasks)
+        tw = MagicMock()
+        tw._get_command_args.return_value = [
+            sys.executable,
+            '-c',
+            'import sys; sys.stdout.write({!r})'.format(output),
+        ]
+
+        table = asyncio.run(
+            export_table_async(tw, [], asyncio.Semaphore(1))
+        )
+
+        self.assertEqual(
+            [(row['uuid'], row['status']) for row in table],
+            [(task['uuid'], task['status']) for task in tasks],
+        )
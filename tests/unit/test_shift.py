@@ -0,0 +1,198 @@
+import unittest
+
+from taskwarrior_recurrence.clock import FixedClock
+from taskwarrior_recurrence.main import \
+    ProcessRecurrentTask, child_uuid, occurrence_key
+from taskwarrior_recurrence.memory import InMemoryTaskWarrior, serialize_date
+from taskwarrior_recurrence.shift import SeriesShift
+
+PARENT_UUID = '012339c8-a8fe-41da-82db-a990f989237e'
+
+
+class TestSeriesShift(unittest.TestCase):
+    def setUp(self):
+        self.tw = InMemoryTaskWarrior()
+        self.clock = FixedClock(
+            self.tw.convert_datetime_string('20370708T000000Z')
+        )
+
+    def shift(self, due):
+        return SeriesShift(
+            self.tw,
+            PARENT_UUID,
+            self.tw.convert_datetime_string(due),
+            clock=self.clock,
+        ).run()
+
+    def live_children(self):
+        return sorted(
+            self.tw.tasks.filter(rparent=PARENT_UUID, status='pending'),
+            key=lambda task: task['due'],
+        )
+
+    def test_periodic_children_are_moved_to_their_occurrence(self):
+        self.tw.add_recurrent_task({
+            "uuid": PARENT_UUID,
+            "description": "Weekly meeting",
+            "due": "20370706T090000Z",
+            "r": "1w",
+            "rtype": "periodic",
+            "rahead": "2w",
+            "runtil": "1d",
+        }, clock=self.clock)
+        children = self.live_children()
+        self.assertEqual(len(children), 4)
+
+        tasks = self.shift('20370708T090000Z')
+
+        # The parent, the moved children and the deleted old ones
+        self.assertEqual(len(tasks), 9)
+        parent_task = self.tw.tasks.get(uuid=PARENT_UUID)
+        self.assertEqual(
+            serialize_date(parent_task['due']),
+            '20370708T090000Z',
+        )
+        shifted = self.live_children()
+        self.assertEqual(
+            [task['uuid'] for task in shifted],
+            [
+                child_uuid(PARENT_UUID, occurrence_key(task['due']))
+                for task in shifted
+            ],
+        )
+        self.assertEqual(
+            [
+                self.tw.tasks.get(uuid=task['uuid'])['status']
+                for task in children
+            ],
+            ['deleted'] * 4,
+        )
+        self.assertEqual(parent_task['rlastinstance'], shifted[-1]['uuid'])
+        self.assertEqual(
+            [
+                (serialize_date(task['due']), task['rexpiry'])
+                for task in shifted
+            ],
+            [
+                ('20370708T090000Z', '20370709T090000Z'),
+                ('20370715T090000Z', '20370716T090000Z'),
+                ('20370722T090000Z', '20370723T090000Z'),
+                ('20370729T090000Z', '20370730T090000Z'),
+            ],
+        )
+        self.assertTrue(
+            all(task['rspec'].startswith(
+                'recurring;periodic;1w;20370708T090000Z;'
+            ) for task in shifted)
+        )
+
+    def test_completion_after_a_shift_finds_the_moved_children(self):
+        self.tw.add_recurrent_task({
+            "uuid": PARENT_UUID,
+            "description": "Weekly meeting",
+            "due": "20370706T090000Z",
+            "r": "1w",
+            "rtype": "periodic",
+            "rahead": "2w",
+        }, clock=self.clock)
+        self.shift('20370708T090000Z')
+        shifted = self.live_children()
+
+        self.tw.execute_command([shifted[0]['uuid'], 'done'])
+        ProcessRecurrentTask(
+            self.tw.tasks.get(uuid=shifted[0]['uuid']),
+            clock=self.clock,
+        ).synthetize_next_child()
+
+        self.assertEqual(
+            [task['uuid'] for task in self.live_children()],
+            [task['uuid'] for task in shifted[1:]],
+        )
+        parent_task = self.tw.tasks.get(uuid=PARENT_UUID)
+        self.assertIn(
+            parent_task['rlastinstance'],
+            [task['uuid'] for task in shifted[1:]],
+        )
+
+    def test_children_of_the_new_series_are_kept(self):
+        self.tw.add_recurrent_task({
+            "uuid": PARENT_UUID,
+            "description": "Weekly meeting",
+            "due": "20370706T090000Z",
+            "r": "1w",
+            "rtype": "periodic",
+        }, clock=self.clock)
+        child_task = self.live_children()[0]
+
+        # Moving it back a week makes the old child its second occurrence
+        self.shift('20370629T090000Z')
+
+        self.assertEqual(
+            [
+                (serialize_date(task['due']), task['uuid'])
+                for task in self.live_children()
+            ],
+            [
+                (
+                    '20370629T090000Z',
+                    child_uuid(PARENT_UUID, '20370629T090000Z'),
+                ),
+                ('20370706T090000Z', child_task['uuid']),
+            ],
+        )
+        self.assertTrue(
+            self.tw.tasks.get(uuid=child_task['uuid'])['rspec'].startswith(
+                'recurring;periodic;1w;20370629T090000Z;'
+            )
+        )
+
+    def test_wait_keeps_the_offset_of_the_parent(self):
+        self.tw.add_recurrent_task({
+            "uuid": PARENT_UUID,
+            "description": "Weekly meeting",
+            "due": "20370709T090000Z",
+            "rwait": "20370708T090000Z",
+            "r": "1w",
+            "rtype": "periodic",
+        }, clock=self.clock)
+
+        self.shift('20370710T090000Z')
+
+        parent_task = self.tw.tasks.get(uuid=PARENT_UUID)
+        self.assertEqual(parent_task['rwait'], '20370709T090000Z')
+        child_task = self.tw.tasks.get(uuid=parent_task['rlastinstance'])
+        self.assertEqual(serialize_date(child_task['due']), '20370710T090000Z')
+        self.assertEqual(
+            serialize_date(child_task['wait']),
+            '20370709T090000Z',
+        )
+
+    def test_chained_child_is_moved_with_the_parent(self):
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": PARENT_UUID,
+            "description": "Chained task",
+            "due": "20370709T090000Z",
+            "r": "3d",
+            "rtype": "chained",
+        }, clock=self.clock)
+
+        self.shift('20370708T090000Z')
+
+        child_task = self.tw.tasks.get(uuid=parent_task['rlastinstance'])
+        self.assertEqual(serialize_date(child_task['due']), '20370708T090000Z')
+
+    def test_closed_children_arent_moved(self):
+        parent_task = self.tw.add_recurrent_task({
+            "uuid": PARENT_UUID,
+            "description": "Weekly meeting",
+            "due": "20370706T090000Z",
+            "r": "1w",
+            "rtype": "periodic",
+        }, clock=self.clock)
+        self.tw.execute_command([parent_task['rlastinstance'], 'done'])
+
+        tasks = self.shift('20370708T090000Z')
+
+        self.assertEqual(len(tasks), 1)
+        child_task = self.tw.tasks.get(uuid=parent_task['rlastinstance'])
+        self.assertEqual(serialize_date(child_task['due']), '20370706T090000Z')
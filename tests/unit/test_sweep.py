@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import patch, MagicMock, call
+
+from taskwarrior_recurrence.sweep import Sweeper
+
+
+class TestSweeper(unittest.TestCase):
+    def setUp(self):
+        self.tw = MagicMock()
+        self.executor = MagicMock()
+        self.parent_uuid = '012339c8-a8fe-41da-82db-a990f989237e'
+        self.expired = [{'uuid': 'a'}, {'uuid': 'b'}]
+        self.deleted = [
+            {
+                'uuid': 'a',
+                'rparent': self.parent_uuid,
+                'status': 'deleted',
+                'due': '20180708T010000Z',
+            },
+            {
+                'uuid': 'b',
+                'rparent': self.parent_uuid,
+                'status': 'deleted',
+                'due': '20180715T010000Z',
+            },
+        ]
+        self.stream_export_patch = patch(
+            'taskwarrior_recurrence.sweep.stream_export',
+            side_effect=lambda tw, filter_args, fields: iter(self.expired),
+        )
+        self.stream_export = self.stream_export_patch.start()
+        self.export_uuids_patch = patch(
+            'taskwarrior_recurrence.sweep.export_uuids',
+            side_effect=lambda tw, uuids, fields: iter(self.deleted),
+        )
+        self.export_uuids = self.export_uuids_patch.start()
+        self.prt_patch = patch(
+            'taskwarrior_recurrence.sweep.ProcessRecurrentTask'
+        )
+        self.prt = self.prt_patch.start()
+        self.sweeper = Sweeper(self.tw, executor=self.executor)
+
+    def tearDown(self):
+        self.stream_export_patch.stop()
+        self.export_uuids_patch.stop()
+        self.prt_patch.stop()
+
+    def test_deletes_expired_children_in_bulk(self):
+        self.assertEqual(self.sweeper.run(), ['a', 'b'])
+
+        self.assertIn('rexpiry.before:now', self.stream_export.call_args[0][1])
+        self.tw.execute_command.assert_called_once_with(
+            ['a', 'b', 'delete'],
+            config_override={'hooks': 'off'},
+        )
+
+    def test_synthetizes_the_last_child_of_each_parent(self):
+        self.sweeper.run()
+
+        self.assertEqual(self.prt.call_count, 1)
+        self.assertEqual(self.prt.call_args[0][0]['uuid'], 'b')
+        plan = self.prt.return_value.plan_next_child.call_args[0][0]
+        self.executor.execute.assert_called_once_with(plan)
+
+    def test_nothing_expired(self):
+        self.expired = []
+
+        self.assertEqual(self.sweeper.run(), [])
+        self.assertFalse(self.tw.execute_command.called)
+        self.assertFalse(self.executor.execute.called)
+
+    def test_uses_usable_index(self):
+        index = MagicMock()
+        index.stale = False
+        index.expired.return_value = ['a', 'b']
+        self.sweeper = Sweeper(self.tw, index=index, executor=self.executor)
+
+        self.sweeper.run()
+
+        self.assertFalse(self.stream_export.called)
+        self.assertEqual(
+            index.update.mock_calls,
+            [call(self.deleted[0]), call(self.deleted[1])],
+        )
+
+    def test_holds_the_lock(self):
+        lock = MagicMock()
+        self.sweeper = Sweeper(self.tw, lock=lock, executor=self.executor)
+
+        self.sweeper.run()
+
+        self.assertTrue(lock.hold.return_value.__enter__.called)
@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+from taskwarrior_recurrence.table import TaskTable, parse_date
+
+
+class TestTaskTable(unittest.TestCase):
+    def setUp(self):
+        self.parent_task_data = {
+            "entry": "20180701T194712Z",
+            "uuid": "012339c8-a8fe-41da-82db-a990f989237e",
+            "modified": "20180706T085429Z",
+            "status": "recurring",
+            "description": "This is a periodic recurring task",
+            "due": "20180708T010000Z",
+            "r": "1w",
+            "rtype": "periodic",
+            "rlastinstance": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+        }
+        self.task_data = {
+            "entry": "20180702T194712Z",
+            "uuid": "3f0a43d0-a713-4ebe-9e5c-b1facf49f078",
+            "modified": "20180708T085429Z",
+            "status": "completed",
+            "description": "This is a periodic recurring task",
+            "end": "20180708T085429Z",
+            "due": "20180708T010000Z",
+            "r": "1w",
+            "rparent": "012339c8-a8fe-41da-82db-a990f989237e",
+        }
+        self.table = TaskTable()
+        self.table.append(self.parent_task_data)
+        self.table.append(self.task_data)
+
+    def test_parse_date_returns_epoch_seconds(self):
+        self.assertEqual(parse_date('20180708T010000Z'), 1531011600)
+
+    def test_table_has_one_row_per_task(self):
+        self.assertEqual(len(self.table), 2)
+
+    def test_uuids_are_stored_in_16_bytes(self):
+        self.assertEqual(len(self.table.uuid), 32)
+        self.assertEqual(
+            self.table.get(1, 'rparent'),
+            self.parent_task_data['uuid'],
+        )
+
+    def test_missing_values_are_returned_as_none(self):
+        self.assertEqual(self.table.get(0, 'rparent'), None)
+        self.assertEqual(self.table.get(0, 'end'), None)
+        self.assertEqual(self.table.get(1, 'rtype'), None)
+
+    def test_rows_decode_the_columns(self):
+        rows = list(self.table)
+        self.assertEqual(rows[0]['status'], 'recurring')
+        self.assertEqual(rows[0]['r'], '1w')
+        self.assertEqual(rows[0]['rtype'], 'periodic')
+        self.assertEqual(rows[1]['due'], 1531011600)
+        self.assertEqual(rows[1]['uuid'], self.task_data['uuid'])
+
+    def test_strings_are_interned(self):
+        self.assertEqual(self.table.r[0], self.table.r[1])
+
+    def test_find_returns_row_by_uuid(self):
+        row = self.table.find(self.task_data['uuid'])
+        self.assertEqual(row.index, 1)
+
+    def test_find_returns_none_if_task_doesnt_exist(self):
+        self.assertEqual(
+            self.table.find('3f0aaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa'),
+            None,
+        )
+
+    def test_find_sees_rows_appended_after_indexing(self):
+        self.table.find(self.task_data['uuid'])
+        task_data = dict(self.task_data)
+        task_data['uuid'] = '3f0aaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa'
+        self.table.append(task_data)
+        self.assertEqual(self.table.find(task_data['uuid']).index, 2)
+
+    @patch('taskwarrior_recurrence.table.stream_export')
+    def test_from_export_streams_the_export(self, exportMock):
+        exportMock.return_value = iter([self.parent_task_data, self.task_data])
+        tw = MagicMock()
+
+        table = TaskTable.from_export(tw, ['rparent.any:'])
+
+        exportMock.assert_called_with(tw, ['rparent.any:'])
+        self.assertEqual(len(table), 2)
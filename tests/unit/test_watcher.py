@@ -0,0 +1,291 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+from taskwarrior_recurrence.watcher import \
+    Watcher, InotifyNotifier, PollingNotifier
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.tw = MagicMock()
+        self.notifier = MagicMock()
+        self.executor = MagicMock()
+        self.parent_uuid = '012339c8-a8fe-41da-82db-a990f989237e'
+        self.live = [
+            {
+                'uuid': '3f0a43d0-a713-4ebe-9e5c-b1facf49f078',
+                'rparent': self.parent_uuid,
+            },
+        ]
+        self.closed = []
+        self.parents = [
+            {'uuid': self.parent_uuid, 'modified': '20180801T010000Z'},
+        ]
+        self.parent_data = []
+
+        self.stream_export_patch = patch(
+            'taskwarrior_recurrence.watcher.stream_export',
+            side_effect=self.fake_stream_export,
+        )
+        self.stream_export = self.stream_export_patch.start()
+        self.export_uuids_patch = patch(
+            'taskwarrior_recurrence.watcher.export_uuids',
+            side_effect=self.fake_export_uuids,
+        )
+        self.export_uuids = self.export_uuids_patch.start()
+        self.prt_patch = patch(
+            'taskwarrior_recurrence.watcher.ProcessRecurrentTask'
+        )
+        self.prt = self.prt_patch.start()
+
+        self.watcher = Watcher(
+            self.tw,
+            self.temp_dir,
+            notifier=self.notifier,
+            executor=self.executor,
+        )
+
+    def tearDown(self):
+        self.stream_export_patch.stop()
+        self.export_uuids_patch.stop()
+        self.prt_patch.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def fake_stream_export(self, tw, filter_args, fields):
+        if filter_args == ['status:recurring']:
+            return iter(self.parents)
+        return iter(self.live)
+
+    def fake_export_uuids(self, tw, uuids, filter_args=[], fields=None):
+        if filter_args:
+            return iter(self.closed)
+        return iter(self.parent_data)
+
+    def test_first_run_only_stores_the_snapshot(self):
+        self.assertEqual(self.watcher.process(), 0)
+
+        self.assertFalse(self.prt.called)
+        self.assertEqual(
+            self.watcher.load_snapshot(),
+            {
+                'children': {self.live[0]['uuid']: self.parent_uuid},
+                'parents': {self.parent_uuid: '20180801T010000Z'},
+            },
+        )
+
+    def test_snapshot_without_parents_is_loaded(self):
+        with open(self.watcher.path, 'w') as f:
+            json.dump({'a': self.parent_uuid}, f)
+
+        self.assertEqual(
+            self.watcher.load_snapshot(),
+            {'children': {'a': self.parent_uuid}, 'parents': None},
+        )
+        self.closed = [
+            {
+                'uuid': 'a',
+                'rparent': self.parent_uuid,
+                'end': '20180808T010000Z',
+            },
+        ]
+        self.assertEqual(self.watcher.process(), 1)
+        self.assertFalse(self.prt.return_value.propagate_spec.called)
+
+    def test_modified_parent_updates_its_children(self):
+        self.watcher.process()
+        self.parents[0]['modified'] = '20180802T010000Z'
+        self.parent_data = [{
+            'uuid': self.parent_uuid,
+            'status': 'recurring',
+            'modified': '20180802T010000Z',
+        }]
+
+        self.assertEqual(self.watcher.process(), 0)
+
+        parent_task = self.prt.call_args[0][0]
+        self.assertEqual(parent_task['uuid'], self.parent_uuid)
+        self.assertTrue(self.prt.return_value.propagate_spec.called)
+        self.assertFalse(self.prt.return_value.delete_child_task.called)
+        self.assertEqual(
+            self.watcher.load_snapshot()['parents'],
+            {self.parent_uuid: '20180802T010000Z'},
+        )
+
+    def test_deleted_parent_deletes_its_children(self):
+        self.watcher.process()
+        self.parents = []
+        self.parent_data = [{
+            'uuid': self.parent_uuid,
+            'status': 'deleted',
+            'modified': '20180802T010000Z',
+        }]
+
+        self.assertEqual(self.watcher.process(), 0)
+
+        self.assertEqual(
+            self.export_uuids.call_args[0][1],
+            [self.parent_uuid],
+        )
+        self.assertTrue(self.prt.return_value.propagate_spec.called)
+        self.assertFalse(self.prt.return_value.delete_child_task.called)
+        # Without hooks, or the on-exit hook of each child would wait for
+        # the lock held by the watcher
+        self.tw.execute_command.assert_called_once_with(
+            [self.live[0]['uuid'], 'delete'],
+            config_override={'hooks': 'off'},
+        )
+        snapshot = self.watcher.load_snapshot()
+        self.assertEqual(snapshot['parents'], {})
+        self.assertEqual(snapshot['children'], {})
+
+    def test_unchanged_parents_arent_processed(self):
+        self.watcher.process()
+
+        self.watcher.process()
+
+        self.assertFalse(self.prt.called)
+
+    def test_closed_child_gets_its_successor(self):
+        self.watcher.process()
+        self.closed = [
+            {
+                'uuid': self.live[0]['uuid'],
+                'rparent': self.parent_uuid,
+                'status': 'completed',
+                'end': '20180808T010000Z',
+            },
+        ]
+        self.live = []
+
+        self.assertEqual(self.watcher.process(), 1)
+
+        self.assertEqual(
+            self.export_uuids.call_args[0][1],
+            [self.closed[0]['uuid']],
+        )
+        child_task = self.prt.call_args[0][0]
+        self.assertEqual(child_task['uuid'], self.closed[0]['uuid'])
+        plan = self.prt.return_value.plan_next_child.call_args[0][0]
+        self.executor.execute.assert_called_once_with(plan)
+        self.assertEqual(self.watcher.load_snapshot()['children'], {})
+
+    def test_only_last_closed_child_of_each_parent_is_processed(self):
+        self.watcher.save_snapshot({'a': self.parent_uuid})
+        self.closed = [
+            {
+                'uuid': 'a',
+                'rparent': self.parent_uuid,
+                'end': '20180808T010000Z',
+            },
+            {
+                'uuid': 'b',
+                'rparent': self.parent_uuid,
+                'end': '20180809T010000Z',
+            },
+        ]
+
+        self.assertEqual(self.watcher.process(), 1)
+
+        self.assertEqual(self.prt.call_count, 1)
+        self.assertEqual(self.prt.call_args[0][0]['uuid'], 'b')
+
+    def test_unchanged_children_arent_processed(self):
+        self.watcher.process()
+
+        self.assertEqual(self.watcher.process(), 0)
+        self.assertFalse(self.export_uuids.called)
+
+    def test_debounce_waits_till_writes_stop(self):
+        self.notifier.wait.side_effect = [True, True, False]
+
+        self.watcher._debounce()
+
+        self.assertEqual(self.notifier.wait.call_count, 3)
+
+    def test_debounce_stops_after_max_delay(self):
+        self.watcher.max_delay = 0
+        self.notifier.wait.return_value = True
+
+        self.watcher._debounce()
+
+        self.assertFalse(self.notifier.wait.called)
+
+    def test_run_processes_each_batch(self):
+        self.notifier.wait.side_effect = [True, False, True, False]
+
+        with patch.object(self.watcher, 'process') as process:
+            self.watcher.run(batches=2)
+
+        self.assertEqual(process.call_count, 3)
+        self.assertEqual(self.notifier.clear.call_count, 3)
+
+    def test_writes_of_a_batch_dont_trigger_another(self):
+        notifier = PollingNotifier(self.temp_dir, interval=0.01)
+        self.watcher.notifier = notifier
+
+        def process():
+            with open(os.path.join(self.temp_dir, 'pending.data'), 'w') as f:
+                f.write('[]')
+
+        with patch.object(self.watcher, 'process', side_effect=process):
+            self.watcher.run(batches=0)
+
+        self.assertFalse(notifier.wait(0.05))
+
+
+class TestNotifiers(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name):
+        with open(os.path.join(self.temp_dir, name), 'w') as f:
+            f.write(json.dumps({}))
+
+    def test_polling_notifier_detects_writes(self):
+        notifier = PollingNotifier(self.temp_dir, interval=0.01)
+        self.assertFalse(notifier.wait(0.02))
+
+        self.write('pending.data')
+        self.assertTrue(notifier.wait(0.02))
+
+    def test_inotify_notifier_ignores_other_files(self):
+        try:
+            notifier = InotifyNotifier(self.temp_dir)
+        except OSError:
+            self.skipTest('inotify is not available')
+        self.addCleanup(notifier.close)
+
+        self.write('recurrence.snapshot')
+        self.assertFalse(notifier.wait(0.05))
+
+        self.write('completed.data')
+        self.assertTrue(notifier.wait(1))
+
+    def test_polling_notifier_clear_drops_the_writes(self):
+        notifier = PollingNotifier(self.temp_dir, interval=0.01)
+
+        self.write('pending.data')
+        notifier.clear()
+
+        self.assertFalse(notifier.wait(0.02))
+
+    def test_inotify_notifier_clear_drops_the_writes(self):
+        try:
+            notifier = InotifyNotifier(self.temp_dir)
+        except OSError:
+            self.skipTest('inotify is not available')
+        self.addCleanup(notifier.close)
+
+        self.write('pending.data')
+        self.write('completed.data')
+        notifier.clear()
+
+        self.assertFalse(notifier.wait(0.05))
@@ -0,0 +1,44 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from taskwarrior_recurrence.watermark import Watermark
+
+
+class TestWatermark(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.watermark = Watermark(self.temp_dir, 'parent_children')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_load_returns_none_before_first_run(self):
+        self.assertEqual(self.watermark.load(), None)
+
+    @patch('taskwarrior_recurrence.watermark.time.time')
+    def test_save_stores_start_minus_margin(self, time_mock):
+        time_mock.return_value = 1533690060
+        self.watermark.start()
+        time_mock.return_value = 1533699999
+        self.watermark.save()
+
+        self.assertEqual(self.watermark.load(), '20180808T010000Z')
+
+    def test_watermarks_are_stored_by_name(self):
+        other = Watermark(self.temp_dir, 'children_parents')
+        self.watermark.start()
+        self.watermark.save()
+
+        self.assertEqual(other.load(), None)
+        other.start()
+        other.save()
+        self.assertNotEqual(self.watermark.load(), None)
+
+    def test_corrupt_file_is_ignored(self):
+        with open(os.path.join(self.temp_dir, 'recurrence.watermark'),
+                  'w') as f:
+            f.write('{')
+        self.assertEqual(self.watermark.load(), None)
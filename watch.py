@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+import argparse
+from taskwarrior_recurrence.backend import CachedTaskWarrior
+from taskwarrior_recurrence.index import open_index
+from taskwarrior_recurrence.lock import RecurrenceLock
+from taskwarrior_recurrence.watcher import \
+    Watcher, open_notifier, DEFAULT_DEBOUNCE, DEFAULT_MAX_DELAY
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Synthesize the recurrent children when the data '
+        'files change, instead of in the hooks',
+    )
+    parser.add_argument('taskrc')
+    parser.add_argument('data')
+    parser.add_argument(
+        '--debounce',
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help='Seconds without writes before processing them',
+    )
+    parser.add_argument(
+        '--max-delay',
+        type=float,
+        default=DEFAULT_MAX_DELAY,
+        help='Maximum seconds to wait for the writes to stop',
+    )
+    parser.add_argument(
+        '--poll',
+        action='store_true',
+        help='Check the modification time of the data files instead of '
+        'using inotify',
+    )
+    args = parser.parse_args()
+
+    tw = CachedTaskWarrior(
+        taskrc_location=args.taskrc,
+        data_location=args.data,
+    )
+    watcher = Watcher(
+        tw,
+        args.data,
+        notifier=open_notifier(args.data, poll=args.poll),
+        debounce=args.debounce,
+        max_delay=args.max_delay,
+        index=open_index(args.data),
+        lock=RecurrenceLock(args.data),
+    )
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.notifier.close()
+
+
+if __name__ == "__main__":
+    main()